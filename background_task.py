@@ -0,0 +1,34 @@
+from PyQt5.QtCore import QThread, pyqtSignal
+
+
+class BackgroundTask(QThread):
+    """
+    Run a long job off the GUI thread.
+    The job is called as fn(progress_callback, is_canceled); progress is forwarded through
+    the progress signal and the result or error message through succeeded / failed, all
+    delivered on the GUI thread. Jobs that produce results incrementally can emit them
+    through partial_result.
+    """
+    progress = pyqtSignal(int)
+    partial_result = pyqtSignal(object)
+    succeeded = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, fn, parent=None):
+        super().__init__(parent)
+        self._fn = fn
+        self._canceled = False
+
+    def cancel(self):
+        self._canceled = True
+
+    def is_canceled(self):
+        return self._canceled
+
+    def run(self):
+        try:
+            result = self._fn(self.progress.emit, self.is_canceled)
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.succeeded.emit(result)
@@ -0,0 +1,280 @@
+import os
+import json
+import argparse
+import cv2
+import numpy as np
+
+# 預設相機參數資料夾與檔名格式 (intrinsic_<name>.json / extrinsics_<name>.json)
+CAMERA_DATA_DIR = "data"
+INTRINSICS_PREFIX = "intrinsic_"
+EXTRINSICS_PREFIX = "extrinsics_"
+
+
+class CameraModel:
+    def __init__(self, camera_matrix, dist_coeffs, extrinsic, name=""):
+        """
+        Pinhole camera with OpenCV (k1, k2, p1, p2[, k3[, k4, k5, k6]]) distortion.
+        All matrices are precomputed once as float64 arrays so that projecting
+        points never touches the calibration JSON again.
+
+        :param camera_matrix: 3x3 intrinsic matrix K.
+        :param dist_coeffs: Distortion coefficients (any shape holding 4, 5 or 8 values).
+        :param extrinsic: 3x4 [R|t] world-to-camera matrix.
+        :param name: Display name of the calibration (e.g. "middle").
+        """
+        self.name = name
+        self.intrinsics_path = None
+        self.extrinsics_path = None
+        # 校正檔中的候選外參 (extrinsics / reprojection_errors)，active_candidate 為 None 代表 best_extrinsic
+        self.candidate_extrinsics = np.zeros((0, 3, 4), dtype=np.float64)
+        self.candidate_errors = np.zeros(0, dtype=np.float64)
+        self.active_candidate = None
+        self.K = np.asarray(camera_matrix, dtype=np.float64).reshape(3, 3)
+        self.dist_coeffs = np.asarray(dist_coeffs, dtype=np.float64).ravel()
+        self.set_extrinsic(extrinsic)
+        self._best_extrinsic = self.extrinsic()
+
+    def set_extrinsic(self, extrinsic):
+        """Replace [R|t] and recompute every derived matrix."""
+        ext = np.asarray(extrinsic, dtype=np.float64).reshape(3, 4)
+        self.R = ext[:, :3].copy()
+        self.t = ext[:, 3].copy()
+        self.rvec, _ = cv2.Rodrigues(self.R)
+        self.tvec = self.t.reshape(3, 1)
+        self.P = self.K @ ext  # full 3x4 projection matrix
+
+        # 畸變係數補齊為 8 個 (k1, k2, p1, p2, k3, k4, k5, k6)，方便向量化計算
+        coeffs = np.zeros(8, dtype=np.float64)
+        n = min(len(self.dist_coeffs), 8)
+        coeffs[:n] = self.dist_coeffs[:n]
+        self._dist8 = coeffs
+
+    @classmethod
+    def from_json_data(cls, intrinsics, extrinsics, name=""):
+        """
+        Build a camera from already parsed calibration dicts.
+        Follows the original lookup order: camera_matrix from the intrinsics file when
+        available (otherwise from the extrinsics file), dist_coeffs and best_extrinsic
+        from the extrinsics file.
+        """
+        if intrinsics is not None:
+            camera_matrix = intrinsics["camera_matrix"]
+        else:
+            camera_matrix = extrinsics["camera_matrix"]
+        model = cls(camera_matrix, extrinsics["dist_coeffs"], extrinsics["best_extrinsic"], name=name)
+        if extrinsics.get("extrinsics"):
+            model.candidate_extrinsics = np.asarray(extrinsics["extrinsics"], dtype=np.float64).reshape(-1, 3, 4)
+            errors = extrinsics.get("reprojection_errors") or [np.nan] * len(model.candidate_extrinsics)
+            model.candidate_errors = np.asarray(errors, dtype=np.float64)
+        return model
+
+    @classmethod
+    def from_json_files(cls, intrinsics_path, extrinsics_path, name=""):
+        """Load a camera from an intrinsics JSON (optional) and an extrinsics JSON."""
+        intrinsics = None
+        if intrinsics_path and os.path.exists(intrinsics_path):
+            with open(intrinsics_path, 'r') as fp:
+                intrinsics = json.load(fp)
+        with open(extrinsics_path, 'r') as fp:
+            extrinsics = json.load(fp)
+        model = cls.from_json_data(intrinsics, extrinsics, name=name)
+        model.intrinsics_path = intrinsics_path
+        model.extrinsics_path = extrinsics_path
+        return model
+
+    def extrinsic(self):
+        """Return the current 3x4 [R|t] matrix."""
+        return np.hstack([self.R, self.t.reshape(3, 1)])
+
+    def replace(self, camera_matrix=None, dist_coeffs=None, extrinsic=None):
+        """Return a copy of this camera with some parameters swapped out."""
+        model = CameraModel(
+            self.K if camera_matrix is None else camera_matrix,
+            self.dist_coeffs if dist_coeffs is None else dist_coeffs,
+            self.extrinsic() if extrinsic is None else extrinsic,
+            name=self.name,
+        )
+        model.intrinsics_path = self.intrinsics_path
+        model.extrinsics_path = self.extrinsics_path
+        model.candidate_extrinsics = self.candidate_extrinsics
+        model.candidate_errors = self.candidate_errors
+        model._best_extrinsic = self._best_extrinsic
+        model.active_candidate = self.active_candidate if extrinsic is None else None
+        return model
+
+    def with_candidate(self, index):
+        """
+        Return a copy of this camera using candidate extrinsic `index`.
+        :param index: Index into candidate_extrinsics, or None to go back to best_extrinsic.
+        """
+        if index is None:
+            model = self.replace(extrinsic=self._best_extrinsic)
+        else:
+            model = self.replace(extrinsic=self.candidate_extrinsics[index])
+        model.active_candidate = index
+        return model
+
+    def project(self, points3d):
+        """
+        Vectorized projection of world points to pixel coordinates.
+        Equivalent to cv2.projectPoints but accepts any leading shape, e.g. a single
+        frame [N, 3] or a whole sequence [T, N, 3]. NaN inputs stay NaN.
+
+        :param points3d: Array of shape (..., 3).
+        :return: float64 array of shape (..., 2).
+        """
+        pts = np.asarray(points3d, dtype=np.float64)
+        cam = pts @ self.R.T + self.t
+        z = cam[..., 2]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x = cam[..., 0] / z
+            y = cam[..., 1] / z
+        return self._distort_and_map(x, y)
+
+    def project_with_extrinsics(self, points3d, extrinsics):
+        """
+        Project the same points through many [R|t] matrices in one vectorized pass.
+
+        :param points3d: Array of shape (..., 3), e.g. a whole sequence [T, N, 3].
+        :param extrinsics: Array of shape (C, 3, 4).
+        :return: float64 array of shape (C, ..., 2).
+        """
+        pts = np.asarray(points3d, dtype=np.float64)
+        ext = np.asarray(extrinsics, dtype=np.float64).reshape(-1, 3, 4)
+        flat = pts.reshape(-1, 3)
+        cam = np.einsum('cij,pj->cpi', ext[:, :, :3], flat) + ext[:, None, :, 3]
+        z = cam[..., 2]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x = cam[..., 0] / z
+            y = cam[..., 1] / z
+        projected = self._distort_and_map(x, y)
+        return projected.reshape((len(ext),) + pts.shape[:-1] + (2,))
+
+    def _distort_and_map(self, x, y):
+        """Apply lens distortion to normalized coordinates and map through K."""
+        k1, k2, p1, p2, k3, k4, k5, k6 = self._dist8
+        r2 = x * x + y * y
+        radial = 1 + r2 * (k1 + r2 * (k2 + r2 * k3))
+        if k4 or k5 or k6:
+            radial = radial / (1 + r2 * (k4 + r2 * (k5 + r2 * k6)))
+        xy = x * y
+        xd = x * radial + 2 * p1 * xy + p2 * (r2 + 2 * x * x)
+        yd = y * radial + p1 * (r2 + 2 * y * y) + 2 * p2 * xy
+
+        K = self.K
+        out = np.empty(x.shape + (2,), dtype=np.float64)
+        out[..., 0] = K[0, 0] * xd + K[0, 1] * yd + K[0, 2]
+        out[..., 1] = K[1, 1] * yd + K[1, 2]
+        return out
+
+
+def find_calibrations(data_dir=CAMERA_DATA_DIR):
+    """
+    Find every intrinsic_<name>.json / extrinsics_<name>.json pair in data_dir.
+
+    :return: Dict mapping name -> (intrinsics_path or None, extrinsics_path).
+    """
+    if not os.path.isdir(data_dir):
+        return {}
+    found = {}
+    for file in sorted(os.listdir(data_dir)):
+        if file.startswith(EXTRINSICS_PREFIX) and file.endswith(".json"):
+            name = file[len(EXTRINSICS_PREFIX):-len(".json")]
+            intrinsics_path = os.path.join(data_dir, f"{INTRINSICS_PREFIX}{name}.json")
+            found[name] = (
+                intrinsics_path if os.path.exists(intrinsics_path) else None,
+                os.path.join(data_dir, file),
+            )
+    return found
+
+
+def load_camera_models(data_dir=CAMERA_DATA_DIR):
+    """
+    Load and cache every calibration found in data_dir.
+
+    :return: Dict mapping name -> CameraModel. Calibrations that fail to load are skipped.
+    """
+    models = {}
+    for name, (intrinsics_path, extrinsics_path) in find_calibrations(data_dir).items():
+        try:
+            models[name] = CameraModel.from_json_files(intrinsics_path, extrinsics_path, name=name)
+            print(f"Cached camera '{name}' from {extrinsics_path}")
+        except Exception as e:
+            print(f"Failed to load camera '{name}': {str(e)}")
+    return models
+
+
+def score_candidate_extrinsics(camera, points3d, pixel2d, frame_offset=0):
+    """
+    Score every candidate extrinsic of `camera` against 2D pixel data.
+    The whole 3D sequence is projected through all candidates at once; the score is the
+    mean pixel distance to the 2D keypoints over all matched (frame, joint) pairs.
+
+    Frame alignment follows the projection window: pixel frame f is compared with
+    3D frame f + frame_offset. Pixel points at (0, 0) are treated as missing, since
+    PixelData stores NaN as 0.
+
+    :param camera: CameraModel with candidate_extrinsics.
+    :param points3d: 3D sequence (frames, joints, 3).
+    :param pixel2d: 2D sequence (frames, joints, 2 or 3); only x, y are used.
+    :param frame_offset: 3D frame index minus pixel frame index.
+    :return: (mean_errors, matched_count) where mean_errors has shape (C,).
+    """
+    if len(camera.candidate_extrinsics) == 0:
+        raise ValueError("Camera has no candidate extrinsics.")
+    if points3d.shape[1] != pixel2d.shape[1]:
+        raise ValueError(f"Joint count mismatch: 3D data has {points3d.shape[1]} joints, pixel data has {pixel2d.shape[1]}.")
+
+    # 對齊兩組資料的幀範圍
+    start = max(0, -frame_offset)
+    end = min(pixel2d.shape[0], points3d.shape[0] - frame_offset)
+    if end <= start:
+        raise ValueError("3D data and pixel data do not overlap with the current frame offset.")
+    pts3d = points3d[start + frame_offset:end + frame_offset]
+    pts2d = np.asarray(pixel2d[start:end, :, :2], dtype=np.float64)
+
+    projected = camera.project_with_extrinsics(pts3d, camera.candidate_extrinsics)  # (C, T, J, 2)
+    dist = np.linalg.norm(projected - pts2d[None], axis=-1)  # (C, T, J)
+    valid = np.isfinite(pts2d).all(axis=-1) & (pts2d != 0).any(axis=-1)
+    valid = valid[None] & np.isfinite(dist)
+    counts = valid.sum(axis=(1, 2))
+    with np.errstate(invalid='ignore'):
+        mean_errors = np.where(valid, dist, 0.0).sum(axis=(1, 2)) / counts
+    mean_errors[counts == 0] = np.inf
+    return mean_errors, int(counts.max())
+
+
+def format_candidate_scores(camera, mean_errors):
+    """Return one text line per candidate, best (lowest clip error) first."""
+    lines = []
+    for i in np.argsort(mean_errors):
+        lines.append(f"#{i}: clip error {mean_errors[i]:.2f} px (calibration error {camera.candidate_errors[i]:.4f})")
+    return lines
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Score all candidate extrinsics of a calibration against pixel 2D data')
+    parser.add_argument('--extrinsics', type=str, required=True,
+                        help='Extrinsics JSON with "extrinsics" and "reprojection_errors"')
+    parser.add_argument('--intrinsics', type=str, required=False,
+                        help='Intrinsics JSON (optional, overrides camera_matrix)')
+    parser.add_argument('--points', type=str, required=True,
+                        help='3D data file (.npy/.csv) with shape (frames, joints, 3)')
+    parser.add_argument('--pixel', type=str, required=True,
+                        help='Pixel 2D data file (.npy/.csv) for the same camera')
+    parser.add_argument('--offset', type=int, default=0,
+                        help='Frame offset (3D frame = pixel frame + offset)')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    from points_data import load_points_array, load_pixel_array
+
+    args = parse_args()
+    camera = CameraModel.from_json_files(args.intrinsics, args.extrinsics)
+    points3d = load_points_array(args.points)
+    pixel2d = load_pixel_array(args.pixel)
+    mean_errors, matched = score_candidate_extrinsics(camera, points3d, pixel2d, args.offset)
+    print(f"Scored {len(mean_errors)} candidates over {matched} matched points:")
+    for line in format_candidate_scores(camera, mean_errors):
+        print(f"  {line}")
@@ -0,0 +1,54 @@
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, QPushButton, QLabel, QComboBox, QSpinBox
+from video_encoder import CODEC_CHOICES, PRESET_CHOICES, FALLBACK_FOURCC, encoder_options, ffmpeg_available
+
+
+class EncoderSettingsDialog(QDialog):
+    def __init__(self, options, parent=None):
+        """
+        Edit the export encoder options (see video_encoder.encoder_options).
+        :param options: Current options dict.
+        """
+        super().__init__(parent)
+        self.setWindowTitle("Encoder Settings")
+
+        layout = QVBoxLayout()
+        form = QFormLayout()
+        self.codec_combo = QComboBox()
+        self.codec_combo.setEditable(True)  # 可輸入其他 ffmpeg 編碼器，例如 h264_nvenc
+        self.codec_combo.addItems(CODEC_CHOICES)
+        self.codec_combo.setCurrentText(options['codec'])
+        form.addRow("Codec:", self.codec_combo)
+
+        self.preset_combo = QComboBox()
+        self.preset_combo.addItems(PRESET_CHOICES)
+        self.preset_combo.setCurrentText(options['preset'])
+        form.addRow("Preset:", self.preset_combo)
+
+        self.crf_spin = QSpinBox()
+        self.crf_spin.setRange(0, 51)
+        self.crf_spin.setValue(options['crf'])
+        form.addRow("CRF (lower = better quality):", self.crf_spin)
+
+        self.threads_spin = QSpinBox()
+        self.threads_spin.setRange(0, 64)
+        self.threads_spin.setSpecialValueText("Auto")
+        self.threads_spin.setValue(options['threads'])
+        form.addRow("Threads:", self.threads_spin)
+        layout.addLayout(form)
+
+        if not ffmpeg_available():
+            layout.addWidget(QLabel(f"ffmpeg not found: exports use OpenCV ({FALLBACK_FOURCC}) and ignore these settings."))
+
+        ok_btn = QPushButton("OK")
+        ok_btn.clicked.connect(self.accept)
+        cancel_btn = QPushButton("Cancel")
+        cancel_btn.clicked.connect(self.reject)
+        btns = QHBoxLayout()
+        btns.addWidget(ok_btn)
+        btns.addWidget(cancel_btn)
+        layout.addLayout(btns)
+        self.setLayout(layout)
+
+    def options(self):
+        return encoder_options(self.codec_combo.currentText().strip(), self.preset_combo.currentText(),
+                               self.crf_spin.value(), self.threads_spin.value())
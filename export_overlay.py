@@ -0,0 +1,178 @@
+import os
+import argparse
+import time
+import cv2
+from camera_model import CameraModel, load_camera_models
+from points_data import load_points_array, load_pixel_array
+from projection_cache import project_sequence
+from overlay_drawing import JOINT_PAIRS_MAP, DATASET_COLORS, PIXEL2D_COLOR, OverlayRenderer
+from video_export import export_overlay_video, iter_range_frames
+from export_ranges import load_repetition_ranges, clip_ranges, range_output_path
+from parallel_export import export_overlay_segments
+from video_encoder import add_encoder_arguments, encoder_options_from_args
+
+# 沒有影片時的虛擬黑畫面設定 (與 BlackVideoPlayer 相同)
+DEFAULT_BLACK_SIZE = (1920, 1080)
+DEFAULT_BLACK_FPS = 30
+# 每隔多少幀印一次進度
+PROGRESS_PRINT_INTERVAL = 500
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Headless overlay export: draw 3D/2D data on a video, same output as Export Video in the GUI')
+    parser.add_argument('--video', type=str, required=False,
+                        help='Source video; omit to draw on black frames')
+    parser.add_argument('--points', type=str, nargs='*', default=[],
+                        help='3D data files (.npy/.csv) with shape (frames, joints, 3)')
+    parser.add_argument('--pixel', type=str, nargs='*', default=[],
+                        help='Pixel 2D data files (.npy/.csv) already in video coordinates')
+    parser.add_argument('--camera', type=str, default='middle',
+                        help='Calibration name in data/ (intrinsic_<name>.json / extrinsics_<name>.json)')
+    parser.add_argument('--extrinsics', type=str, required=False,
+                        help='Extrinsics JSON (overrides --camera)')
+    parser.add_argument('--intrinsics', type=str, required=False,
+                        help='Intrinsics JSON used with --extrinsics (optional, overrides camera_matrix)')
+    parser.add_argument('--offset', type=int, default=0,
+                        help='Frame offset (3D frame = video frame + offset)')
+    parser.add_argument('--no-skeleton', action='store_true',
+                        help='Draw joints only, without skeleton lines')
+    parser.add_argument('--trails', type=int, default=0,
+                        help='Draw joint trails over this many frames (0 = off)')
+    parser.add_argument('--fps', type=float, default=DEFAULT_BLACK_FPS,
+                        help='Frame rate when no video is given')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Render threads, or processes with --segments (defaults to the CPU count)')
+    parser.add_argument('--segments', type=int, default=None,
+                        help='Split the export into this many segments rendered by separate processes; '
+                             're-running after a crash skips finished segments')
+    parser.add_argument('--range', type=int, nargs=2, action='append', metavar=('START', 'END'),
+                        help='Export only frames START..END (inclusive); repeat for several ranges')
+    parser.add_argument('--excel', type=str, required=False,
+                        help='DataCollection Excel whose "Repetition N Start/End" columns give the ranges')
+    parser.add_argument('--sheet', type=str, default=None,
+                        help='Sheet of --excel to read (default: first sheet)')
+    parser.add_argument('--per-range', action='store_true',
+                        help='Write one file per range (<output>_<label>.mp4) instead of one concatenated file')
+    parser.add_argument('--output', type=str, required=False,
+                        help='Output .mp4 (defaults to the GUI export name)')
+    add_encoder_arguments(parser)
+    return parser.parse_args()
+
+
+def load_camera(args):
+    if args.extrinsics:
+        return CameraModel.from_json_files(args.intrinsics, args.extrinsics)
+    camera = load_camera_models().get(args.camera)
+    if camera is None:
+        raise ValueError(f"Camera parameters not found for perspective: {args.camera}")
+    return camera
+
+
+def build_renderer(camera, points_files, pixel_files, frame_offset=0, show_skeleton=True, trail_length=0):
+    """
+    Build the same OverlayRenderer layers as ProjectionWindow3.build_overlay_renderer from files.
+
+    :return: (renderer, max number of data frames)
+    """
+    layers = []
+    max_frames = 0
+    for path in pixel_files:
+        arr = load_pixel_array(path)
+        max_frames = max(max_frames, arr.shape[0])
+        layers.append({
+            'points': arr, 'color': PIXEL2D_COLOR,
+            'joint_pairs': JOINT_PAIRS_MAP.get(arr.shape[1]) if show_skeleton else None,
+        })
+    for i, path in enumerate(points_files):
+        points = load_points_array(path)
+        max_frames = max(max_frames, points.shape[0])
+        layers.append({
+            'points': project_sequence(camera, points), 'color': DATASET_COLORS[i % len(DATASET_COLORS)],
+            'frame_offset': frame_offset,
+            'joint_pairs': JOINT_PAIRS_MAP.get(points.shape[1]) if show_skeleton else None,
+            'trails': trail_length > 0,
+        })
+    return OverlayRenderer(layers, trail_length), max_frames
+
+
+def default_output_name(video_path, points_files, show_skeleton):
+    """Same default file name as the GUI export dialog."""
+    video_name = os.path.basename(video_path) if video_path else "virtual_black_video"
+    showing_files = [os.path.basename(p) for p in points_files]
+    showing_files_str = '+'.join(showing_files) if showing_files else 'none'
+    skeleton_status = 'true' if show_skeleton else 'false'
+    return f"exported_{video_name}+{showing_files_str}+{skeleton_status}.mp4"
+
+
+def main():
+    args = parse_args()
+    show_skeleton = not args.no_skeleton
+    encoder = encoder_options_from_args(args)
+    camera = load_camera(args)
+    renderer, max_frames = build_renderer(camera, args.points, args.pixel, args.offset, show_skeleton, args.trails)
+
+    if args.video:
+        cap = cv2.VideoCapture(args.video)
+        if not cap.isOpened():
+            raise IOError(f"Cannot open video file: {args.video}")
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+    else:
+        if max_frames == 0:
+            raise ValueError("Either --video or at least one data file is required.")
+        fps = args.fps
+        width, height = DEFAULT_BLACK_SIZE
+        total_frames = max_frames
+
+    ranges = [(start, end + 1, f"frames_{start}_{end}") for start, end in (args.range or [])]
+    if args.excel:
+        ranges += load_repetition_ranges(args.excel, args.sheet if args.sheet is not None else 0)
+    ranges = clip_ranges(ranges, total_frames) if ranges else [(0, total_frames, "all")]
+    if not ranges:
+        raise ValueError("The requested ranges contain no frames.")
+
+    output_path = args.output or default_output_name(args.video, args.points, show_skeleton)
+    if args.per_range:
+        outputs = [(range_output_path(output_path, label), [(start, end)]) for start, end, label in ranges]
+    else:
+        outputs = [(output_path, [(start, end) for start, end, _ in ranges])]
+    frame_count = sum(end - start for start, end, _ in ranges)
+    print(f"Exporting: fps={fps}, width={width}, height={height}, total_frames={total_frames}, "
+          f"{frame_count} frames in {len(ranges)} range(s) -> {len(outputs)} file(s)")
+
+    start = time.perf_counter()
+
+    def on_progress(frames_written):
+        if frames_written % PROGRESS_PRINT_INTERVAL == 0:
+            print(f"  {frames_written} frames")
+
+    if args.segments:
+        reported = set()
+
+        def on_segment_progress(done, total):
+            if done not in reported:
+                reported.add(done)
+                print(f"  {done}/{total} segments")
+        for path, frame_ranges in outputs:
+            reported.clear()
+            export_overlay_segments(args.video, renderer, path, fps, (width, height), total_frames,
+                                    num_segments=args.segments, max_workers=args.workers,
+                                    progress_callback=on_segment_progress, encoder=encoder,
+                                    frame_ranges=frame_ranges)
+            print(f"Exported {path}")
+        print(f"Done in {time.perf_counter() - start:.1f}s")
+        return
+    for path, frame_ranges in outputs:
+        frames = iter_range_frames(args.video, frame_ranges, width, height)
+        written = export_overlay_video(frames, renderer, path, fps, (width, height), total_frames,
+                                       num_workers=args.workers, progress_callback=on_progress, encoder=encoder)
+        print(f"Exported {written} frames to {path}")
+    print(f"Done in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import os
+import re
+import pandas as pd
+
+# DataCollection Excel 的重複次數欄位，例如 "Repetition 3 Start" / "Repetition 3 End" (與 slice_video.py 相同)
+REPETITION_COLUMN = re.compile(r'^Repetition\s+(\d+)\s+(Start|End)$')
+
+
+def repetition_sheet_names(excel_path):
+    """Sheet names of a DataCollection workbook (one sheet per game)."""
+    return pd.ExcelFile(excel_path).sheet_names
+
+
+def load_repetition_ranges(excel_path, sheet_name=0):
+    """
+    Read the "Repetition N Start/End" columns of a DataCollection sheet.
+    Start and End are inclusive video frame numbers, as used by slice_video.py.
+
+    :param excel_path: DataCollection_<code>.xlsx path.
+    :param sheet_name: Sheet name or index.
+    :return: List of (start, end_exclusive, label) in row then repetition order,
+             label matching the slice_video.py clip names (row<r>_rep<n>_frames_<start>_<end>).
+    """
+    df = pd.read_excel(excel_path, sheet_name=sheet_name)
+    rep_nums = set()
+    for col in df.columns:
+        match = REPETITION_COLUMN.match(str(col).strip())
+        if match:
+            rep_nums.add(int(match.group(1)))
+
+    ranges = []
+    for row_idx, row in df.iterrows():
+        for rep in sorted(rep_nums):
+            start = row.get(f"Repetition {rep} Start")
+            end = row.get(f"Repetition {rep} End")
+            if pd.notna(start) and pd.notna(end) and int(end) >= int(start):
+                start_frame, end_frame = int(start), int(end)
+                ranges.append((start_frame, end_frame + 1, f"row{row_idx + 1}_rep{rep}_frames_{start_frame}_{end_frame}"))
+    return ranges
+
+
+def clip_ranges(ranges, total_frames):
+    """Clip (start, end_exclusive, label) ranges to [0, total_frames) and drop empty ones."""
+    clipped = []
+    for start, end, label in ranges:
+        start, end = max(0, start), min(total_frames, end)
+        if end > start:
+            clipped.append((start, end, label))
+    return clipped
+
+
+def range_output_path(output_path, label):
+    """Output file for one range: <name>_<label>.mp4 next to output_path."""
+    base, ext = os.path.splitext(output_path)
+    return f"{base}_{label}{ext or '.mp4'}"
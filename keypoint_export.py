@@ -0,0 +1,153 @@
+import os
+import re
+import argparse
+import numpy as np
+from projection_cache import PROJECTION_CHUNK_FRAMES
+
+
+def camera_depth(camera, points3d):
+    """Depth [T, N] of every point along the camera's optical axis (NaN for missing joints)."""
+    points3d = np.asarray(points3d)
+    return points3d @ camera.R[2] + camera.t[2]
+
+
+def keypoint_visibility(camera, points3d, projected, width, height):
+    """
+    Visibility mask [T, N]: joint present, in front of the camera and projected inside the image.
+
+    :param camera: CameraModel used for projected.
+    :param points3d: 3D sequence [T, N, 3].
+    :param projected: Its projection [T, N, 2].
+    :param width: Image width in pixels.
+    :param height: Image height in pixels.
+    """
+    x, y = projected[..., 0], projected[..., 1]
+    with np.errstate(invalid='ignore'):
+        inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        in_front = camera_depth(camera, points3d) > 0
+    return inside & in_front
+
+
+def _output_array(shape, dtype, fill, work_dir, name):
+    """Output array filled with fill: in memory, or a .npy memmap in work_dir for sequences larger than RAM."""
+    if work_dir is None:
+        return np.full(shape, fill, dtype=dtype)
+    out = np.lib.format.open_memmap(os.path.join(work_dir, name + '.npy'), mode='w+', dtype=dtype, shape=shape)
+    for start in range(0, shape[0], PROJECTION_CHUNK_FRAMES):
+        out[start:start + PROJECTION_CHUNK_FRAMES] = fill
+    return out
+
+
+def _array_name(name, used):
+    """File-name-safe, unique array name for a dataset."""
+    base = re.sub(r'\W+', '_', os.path.splitext(name)[0]).strip('_') or 'dataset'
+    candidate, i = base, 2
+    while candidate in used:
+        candidate, i = f"{base}_{i}", i + 1
+    used.add(candidate)
+    return candidate
+
+
+def export_keypoints(output_path, datasets, camera, size, frame_offset=0, frame_count=None, work_dir=None):
+    """
+    Write projected 2D keypoints and visibility masks of several datasets.
+
+    .npz: one archive with <name>_keypoints (float32 [frames, joints, 2], NaN = missing),
+          <name>_visible (bool [frames, joints]), optional <name>_joint_names, plus
+          camera, image_size and frame_offset.
+    .npy: <base>_<name>.npy and <base>_<name>_visible.npy per dataset (no suffix with a single dataset).
+
+    :param output_path: Target .npz or .npy path.
+    :param datasets: List of dicts with 'name', 'points' (3D [T, N, 3], anything sliceable
+                     on the frame axis) and optional 'projected' (cached [T, N, 2]) and 'joint_names'.
+    :param camera: CameraModel.
+    :param size: (width, height) of the video.
+    :param frame_offset: Data frame = video frame + frame_offset.
+    :param frame_count: If given, arrays are indexed by video frame (0 .. frame_count - 1);
+                        otherwise by data frame.
+    :param work_dir: Optional directory for disk-backed (memmap) output arrays, for sequences
+                     larger than RAM; None keeps them in memory.
+    :return: List of written file paths.
+    """
+    width, height = size
+    arrays = {}
+    used = set()
+    for dataset in datasets:
+        points3d = dataset['points']
+        projected = dataset.get('projected')
+        num_frames, num_joints = points3d.shape[0], points3d.shape[1]
+        # 輸出幀 f 對應資料幀 f + offset (與投影視窗相同的 offset 慣例)，沒有資料的幀維持 NaN / False
+        offset = frame_offset if frame_count is not None else 0
+        out_frames = frame_count if frame_count is not None else num_frames
+        name = _array_name(dataset['name'], used)
+        keypoints = _output_array((out_frames, num_joints, 2), np.float32, np.nan, work_dir, f"{name}_keypoints")
+        visible = _output_array((out_frames, num_joints), bool, False, work_dir, f"{name}_visible")
+        # 逐段投影與判斷可見性，不建立整段的 float64 暫存陣列
+        first, last = max(0, offset), min(num_frames, out_frames + offset)
+        for start in range(first, last, PROJECTION_CHUNK_FRAMES):
+            end = min(start + PROJECTION_CHUNK_FRAMES, last)
+            block = np.asarray(points3d[start:end])
+            if projected is None:
+                block_2d = camera.project(block).astype(np.float32)
+            else:
+                block_2d = np.asarray(projected[start:end], dtype=np.float32)
+            keypoints[start - offset:end - offset] = block_2d
+            visible[start - offset:end - offset] = keypoint_visibility(camera, block, block_2d, width, height)
+        arrays[name] = (keypoints, visible, dataset.get('joint_names'))
+
+    written = []
+    base, ext = os.path.splitext(output_path)
+    if ext.lower() == '.npz':
+        contents = {
+            'camera': np.array(camera.name), 'image_size': np.array(size),
+            'frame_offset': np.array(frame_offset), 'video_frame_indexed': np.array(frame_count is not None),
+        }
+        for name, (keypoints, visible, joint_names) in arrays.items():
+            contents[f"{name}_keypoints"] = keypoints
+            contents[f"{name}_visible"] = visible
+            if joint_names is not None:
+                contents[f"{name}_joint_names"] = np.array(joint_names)
+        np.savez(output_path, **contents)
+        written.append(output_path)
+    else:
+        for name, (keypoints, visible, _) in arrays.items():
+            stem = base if len(arrays) == 1 else f"{base}_{name}"
+            np.save(stem + '.npy', keypoints)
+            np.save(stem + '_visible.npy', visible)
+            written += [stem + '.npy', stem + '_visible.npy']
+    return written
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Export projected 2D keypoints (frames, joints, 2) and visibility masks')
+    parser.add_argument('--points', type=str, nargs='+', required=True,
+                        help='3D data files (.npy/.csv) with shape (frames, joints, 3)')
+    parser.add_argument('--camera', type=str, default='middle',
+                        help='Calibration name in data/')
+    parser.add_argument('--extrinsics', type=str, required=False,
+                        help='Extrinsics JSON (overrides --camera)')
+    parser.add_argument('--intrinsics', type=str, required=False,
+                        help='Intrinsics JSON used with --extrinsics')
+    parser.add_argument('--size', type=int, nargs=2, default=(1920, 1080), metavar=('WIDTH', 'HEIGHT'),
+                        help='Image size used for the visibility mask')
+    parser.add_argument('--offset', type=int, default=0,
+                        help='Frame offset (3D frame = video frame + offset)')
+    parser.add_argument('--frames', type=int, default=None,
+                        help='Video frame count; when given, arrays are indexed by video frame')
+    parser.add_argument('--output', type=str, required=True,
+                        help='Output .npz (all datasets) or .npy')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    from camera_model import CameraModel, load_camera_models
+    from points_data import load_points_array
+
+    args = parse_args()
+    if args.extrinsics:
+        camera = CameraModel.from_json_files(args.intrinsics, args.extrinsics)
+    else:
+        camera = load_camera_models()[args.camera]
+    datasets = [{'name': os.path.basename(path), 'points': load_points_array(path)} for path in args.points]
+    for path in export_keypoints(args.output, datasets, camera, tuple(args.size), args.offset, args.frames):
+        print(f"Saved {path}")
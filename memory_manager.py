@@ -0,0 +1,100 @@
+import time
+from collections import OrderedDict
+from memory_usage import read_mapped_regions, array_resident_bytes
+
+# 預設記憶體預算 (MB)，超過時依最久未使用的順序釋放可重建的資料
+DEFAULT_MEMORY_BUDGET_MB = 2048
+
+
+class MemoryManager:
+    def __init__(self, budget_bytes=DEFAULT_MEMORY_BUDGET_MB * 1024 * 1024):
+        """
+        Session-wide accounting of cached data with least-recently-used eviction.
+
+        Every cache registers its entries with a function returning the entry's arrays
+        (measured as resident bytes, so memory-mapped arrays only count the pages in RAM)
+        and, if the data can be rebuilt later, an evict function that drops it.
+
+        :param budget_bytes: Memory budget for all registered entries; None disables eviction.
+        """
+        self.budget_bytes = budget_bytes
+        self._entries = OrderedDict()  # key -> entry dict, least recently used first
+        self._last_sizes = {}
+
+    def register(self, key, category, label, arrays_fn, evict_fn=None):
+        """
+        Add or replace an entry.
+
+        :param key: Hashable entry key, e.g. ('points', 3).
+        :param category: Group shown in the memory panel, e.g. "3D data".
+        :param label: Entry name shown in the memory panel.
+        :param arrays_fn: arrays_fn() -> iterable of numpy arrays (None entries are skipped).
+        :param evict_fn: evict_fn() frees the data so it is reloaded or recomputed on next use;
+                         None for data that is only accounted.
+        """
+        self._entries[key] = {'category': category, 'label': label, 'arrays_fn': arrays_fn,
+                              'evict_fn': evict_fn, 'last_used': time.monotonic()}
+        self._entries.move_to_end(key)
+
+    def unregister(self, key):
+        self._entries.pop(key, None)
+        self._last_sizes.pop(key, None)
+
+    def touch(self, *keys):
+        """Mark entries as used now."""
+        now = time.monotonic()
+        for key in keys:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry['last_used'] = now
+                self._entries.move_to_end(key)
+
+    def measure(self):
+        """Resident bytes of every entry {key: bytes}, with one /proc/self/smaps read for all of them."""
+        regions = read_mapped_regions()
+        sizes = {}
+        for key, entry in self._entries.items():
+            sizes[key] = sum(array_resident_bytes(arr, regions) for arr in entry['arrays_fn']() if arr is not None)
+        self._last_sizes = sizes
+        return sizes
+
+    def last_size(self, key):
+        """Entry size from the most recent measure() (0 if unknown)."""
+        return self._last_sizes.get(key, 0)
+
+    def enforce(self, protected=(), budget_bytes=None):
+        """
+        Evict least-recently-used evictable entries until the total fits the budget.
+
+        :param protected: Keys that must not be evicted (e.g. data currently on screen).
+        :param budget_bytes: Override the budget for this call (0 frees everything not protected).
+        :return: List of evicted keys.
+        """
+        budget = self.budget_bytes if budget_bytes is None else budget_bytes
+        sizes = self.measure()
+        total = sum(sizes.values())
+        evicted = []
+        if budget is None or total <= budget:
+            return evicted
+        for key, entry in list(self._entries.items()):
+            if total <= budget:
+                break
+            if entry['evict_fn'] is None or key in protected or sizes.get(key, 0) == 0:
+                continue
+            entry['evict_fn']()
+            total -= sizes[key]
+            self._last_sizes[key] = 0
+            evicted.append(key)
+            print(f"Memory budget: evicted {entry['label']} ({entry['category']})")
+        return evicted
+
+    def snapshot(self):
+        """
+        Rows for the memory panel from the most recent measure(), least recently used first.
+        :return: List of dicts with key, category, label, bytes, evictable and idle (seconds since last use).
+        """
+        now = time.monotonic()
+        return [{'key': key, 'category': entry['category'], 'label': entry['label'],
+                 'bytes': self._last_sizes.get(key, 0), 'evictable': entry['evict_fn'] is not None,
+                 'idle': now - entry['last_used']}
+                for key, entry in self._entries.items()]
@@ -0,0 +1,73 @@
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QSpinBox, QTreeWidget, QTreeWidgetItem
+from PyQt5.QtCore import pyqtSignal
+from memory_usage import format_bytes, process_memory_bytes
+
+
+class MemoryPanel(QDialog):
+    # 使用者修改預算 (MB) 或要求立即釋放時送出
+    budget_changed = pyqtSignal(int)
+    trim_requested = pyqtSignal()
+
+    def __init__(self, manager, parent=None):
+        """
+        Non-modal breakdown of the memory used by every cache registered with a MemoryManager.
+        Call refresh() after manager.measure() to update it.
+        """
+        super().__init__(parent)
+        self.setWindowTitle("Memory Usage")
+        self.resize(520, 420)
+        self.manager = manager
+
+        layout = QVBoxLayout()
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+
+        self.tree = QTreeWidget()
+        self.tree.setHeaderLabels(["Data", "In RAM", "Idle", "Evictable"])
+        self.tree.setColumnWidth(0, 240)
+        layout.addWidget(self.tree)
+
+        controls = QHBoxLayout()
+        controls.addWidget(QLabel("Budget (MB):"))
+        self.budget_spin = QSpinBox()
+        self.budget_spin.setRange(64, 1024 * 1024)
+        self.budget_spin.setSingleStep(256)
+        self.budget_spin.setValue((manager.budget_bytes or 0) // (1024 * 1024))
+        self.budget_spin.editingFinished.connect(lambda: self.budget_changed.emit(self.budget_spin.value()))
+        controls.addWidget(self.budget_spin)
+        trim_btn = QPushButton("Free Unused Now")
+        trim_btn.clicked.connect(self.trim_requested.emit)
+        controls.addWidget(trim_btn)
+        close_btn = QPushButton("Close")
+        close_btn.clicked.connect(self.close)
+        controls.addWidget(close_btn)
+        layout.addLayout(controls)
+        self.setLayout(layout)
+
+    def refresh(self):
+        rows = self.manager.snapshot()
+        categories = {}
+        for row in rows:
+            categories.setdefault(row['category'], []).append(row)
+
+        self.tree.clear()
+        total = 0
+        for category, entries in categories.items():
+            entries = [row for row in entries if row['bytes'] > 0]  # 未載入/已釋放的項目不列出
+            category_bytes = sum(row['bytes'] for row in entries)
+            total += category_bytes
+            parent = QTreeWidgetItem([f"{category} ({len(entries)})", format_bytes(category_bytes), "", ""])
+            # 最大的項目排在前面
+            for row in sorted(entries, key=lambda r: r['bytes'], reverse=True):
+                QTreeWidgetItem(parent, [row['label'], format_bytes(row['bytes']), f"{row['idle']:.0f} s",
+                                         "yes" if row['evictable'] else "no"])
+            self.tree.addTopLevelItem(parent)
+        self.tree.expandAll()
+
+        text = f"Tracked: {format_bytes(total)}"
+        if self.manager.budget_bytes is not None:
+            text += f" of {format_bytes(self.manager.budget_bytes)} budget"
+        process_bytes = process_memory_bytes()
+        if process_bytes is not None:
+            text += f" | Process: {format_bytes(process_bytes)}"
+        self.summary_label.setText(text)
@@ -0,0 +1,85 @@
+import mmap
+import numpy as np
+
+try:
+    import psutil
+except ImportError:  # psutil 為選用套件，沒有時改讀 /proc
+    psutil = None
+
+SMAPS_PATH = '/proc/self/smaps'
+STATM_PATH = '/proc/self/statm'
+
+
+def format_bytes(num_bytes):
+    """Human readable size, e.g. 1.5 GB."""
+    size = float(num_bytes)
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def is_memory_mapped(array):
+    """True when the array (or a view of it) is backed by a memory-mapped file."""
+    while array is not None:
+        if isinstance(array, (np.memmap, mmap.mmap)):
+            return True
+        array = getattr(array, 'base', None)
+    return False
+
+
+def read_mapped_regions():
+    """
+    (start, end, rss_bytes) of every mapping of this process, from /proc/self/smaps.
+    Returns None where smaps is not available (non-Linux).
+    """
+    regions = []
+    try:
+        with open(SMAPS_PATH) as f:
+            start = end = None
+            for line in f:
+                first = line.split(None, 1)[0]
+                if '-' in first and not first.endswith(':'):
+                    start, end = (int(x, 16) for x in first.split('-'))
+                elif first == 'Rss:' and start is not None:
+                    regions.append((start, end, int(line.split()[1]) * 1024))
+    except OSError:
+        return None
+    return regions
+
+
+def array_resident_bytes(array, regions=None):
+    """
+    Bytes of the array currently in RAM.
+    In-memory arrays count fully; memory-mapped arrays count only the pages the OS has
+    paged in (needs /proc/self/smaps, otherwise 0 is reported).
+
+    :param array: numpy array.
+    :param regions: Output of read_mapped_regions(), to share one smaps read between arrays.
+    """
+    if not is_memory_mapped(array):
+        return array.nbytes
+    if regions is None:
+        regions = read_mapped_regions()
+    if not regions:
+        return 0
+    address = array.__array_interface__['data'][0]
+    stop = address + array.nbytes
+    resident = 0
+    for start, end, rss in regions:
+        if start < stop and end > address:
+            # 部分重疊的映射依比例估算
+            overlap = min(end, stop) - max(start, address)
+            resident += rss * overlap // (end - start)
+    return resident
+
+
+def process_memory_bytes():
+    """Resident set size of this process, or None when it cannot be determined."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open(STATM_PATH) as f:
+            return int(f.read().split()[1]) * mmap.PAGESIZE
+    except (OSError, IndexError, ValueError):
+        return None
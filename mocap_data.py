@@ -3,38 +3,28 @@ import pandas as pd
 from PyQt5.QtWidgets import QProgressDialog, QMessageBox
 from PyQt5.QtCore import QCoreApplication
 
+# 欄位至少要有這麼多個有效值才保留 (過濾只出現片刻的 marker)
+DEFAULT_VALID_THRESHOLD = 600
+
+
 class RawMocapData:
-    def __init__(self, df, type_list):
+    def __init__(self, df, type_list, threshold=DEFAULT_VALID_THRESHOLD):
         """
         Initialize the RawMocapData object.
 
         :param df: The pandas DataFrame containing the 3D data.
         :param type_list: List of column types from the DataFrame. This list should ideally correspond to df.columns.
+        :param threshold: Minimum number of valid values for a column to be kept.
         """
         
-        # Determine which columns to keep based on having at least 100 non-empty data points
-        columns_to_keep = []
-        original_column_names = df.columns.tolist()
-
-        threshold = 600
-        
-        for col_name_from_df in original_column_names:
-            series = df[col_name_from_df]
-            if series.dtype == 'object':
-                # For object type, count non-null and non-empty strings as valid
-                valid_count = series.dropna().astype(str).str.strip().replace('', np.nan).dropna().count()
-            else:
-                # For numeric types, just count non-null values
-                valid_count = series.count() # pandas .count() excludes NaN
+        # Determine which columns to keep based on having at least `threshold` non-empty data points
+        valid_counts = self._count_valid(df)
+        keep_mask = valid_counts >= threshold
 
-            if valid_count >= threshold:
-                columns_to_keep.append(col_name_from_df)
-        
-        if len(columns_to_keep) < len(original_column_names):
-            dropped_columns = set(original_column_names) - set(columns_to_keep)
-            print(f"Dropping {len(dropped_columns)} empty columns because they have less than {threshold} valid data points.")
-            df_filtered = df[columns_to_keep] # Create a new DataFrame with only the desired columns
-            filtered_type_list = columns_to_keep # Update type_list to reflect the kept columns
+        if not keep_mask.all():
+            print(f"Dropping {int((~keep_mask).sum())} empty columns because they have less than {threshold} valid data points.")
+            df_filtered = df.loc[:, keep_mask] # Create a new DataFrame with only the desired columns
+            filtered_type_list = df_filtered.columns.tolist() # Update type_list to reflect the kept columns
         else:
             df_filtered = df
             filtered_type_list = type_list # No columns dropped, use the original type_list
@@ -45,21 +35,37 @@ class RawMocapData:
         # Group columns and get sorted joint names and original df column indices
         self._sorted_joint_names, original_df_col_indices, self._joint_name_to_indices = self._group_columns(filtered_type_list)
         
-        # Reshape data into [T, N, 3] NumPy array
+        # Reshape data into [T, N, 3] float32 array with a single gather of the X/Y/Z columns.
+        # Missing markers stay NaN (not 0) so they are never drawn at the origin.
         self.num_raw_joints = len(self._sorted_joint_names) # N is the number of included joints
-        self.data_array = np.zeros((self.total_frames, self.num_raw_joints, 3), dtype=float)
+        # (joints without all of X/Y/Z keep their slot at the end and stay missing)
+        num_complete = len(original_df_col_indices)
+        xyz_indices = np.asarray(original_df_col_indices, dtype=np.intp).reshape(-1)
+        self.data_array = np.full((self.total_frames, self.num_raw_joints, 3), np.nan, dtype=np.float32)
+        self.data_array[:, :num_complete] = df_filtered.iloc[:, xyz_indices].to_numpy(dtype=np.float32).reshape(
+            self.total_frames, num_complete, 3)
 
-        for n_idx, (x_col_idx, y_col_idx, z_col_idx) in enumerate(original_df_col_indices):
-            self.data_array[:, n_idx, 0] = df_filtered.iloc[:, x_col_idx].values
-            self.data_array[:, n_idx, 1] = df_filtered.iloc[:, y_col_idx].values
-            self.data_array[:, n_idx, 2] = df_filtered.iloc[:, z_col_idx].values
-        
-        # Replace NaN values with 0.0
-        self.data_array = np.nan_to_num(self.data_array, nan=0.0)
+        # 有效遮罩 (X/Y/Z 皆非 NaN)，以 bit 壓縮成 [T, ceil(N/8)]，每幀只需解壓不必掃描 NaN
+        self.valid_bits = np.packbits(~np.isnan(self.data_array).any(axis=2), axis=1)
 
         print(f"Reshaped data to {self.data_array.shape} (Frames, Joints, XYZ).")
         print(f"Number of raw joints identified: {self.num_raw_joints}")
 
+    @staticmethod
+    def _count_valid(df):
+        """
+        Number of valid values per column as a numpy array.
+        Numeric columns count non-NaN values; object columns count non-null, non-blank strings.
+        """
+        counts = df.notna().sum().to_numpy().copy()
+        object_positions = np.flatnonzero((df.dtypes == object).to_numpy())
+        if len(object_positions):
+            objects = df.iloc[:, object_positions]
+            stripped = np.char.strip(objects.to_numpy().astype(str))
+            valid = objects.notna().to_numpy() & (stripped != '')
+            counts[object_positions] = valid.sum(axis=0)
+        return counts
+
     
     def get_total_frame(self):
         return self.total_frames
@@ -79,7 +85,8 @@ class RawMocapData:
         """
         return self._joint_name_to_indices.get(joint_name)
     
-    def _group_columns(self, type_list):
+    @staticmethod
+    def _group_columns(type_list):
         """
         Groups columns by joint name and prepares data for reshaping.
         Sorts joint names and creates mappings to their indices in the reshaped array.
@@ -163,6 +170,57 @@ class RawMocapData:
             raise IndexError("Frame index out of range.")
         return self.data_array[frame]
 
+    def get_frames(self, start, end):
+        """
+        3D data of frames [start, end) in [frames, N, 3] format.
+        :param start: First frame index.
+        :param end: End frame index (exclusive).
+        """
+        return self.data_array[max(0, start):end]
+
+    def resident_arrays(self):
+        """Arrays this object keeps in memory, for memory accounting."""
+        return [self.data_array, self.valid_bits]
+
+    def valid_mask(self, frame, indices=None):
+        """
+        Validity of the joints in one frame (True = marker present).
+        :param frame: Frame index.
+        :param indices: Optional joint index array; None returns all joints.
+        :return: bool array [N] or [len(indices)].
+        """
+        mask = np.unpackbits(self.valid_bits[frame], count=self.num_raw_joints).view(bool)
+        return mask if indices is None else mask[indices]
+
+    def get_valid_joints(self, frame, indices=None):
+        """
+        Only the joints present in one frame.
+        :param frame: Frame index.
+        :param indices: Optional joint index array to choose from; None uses all joints.
+        :return: (joint indices [K], 3D points [K, 3]) of the valid joints.
+        """
+        if indices is None:
+            indices = np.arange(self.num_raw_joints)
+        indices = np.asarray(indices, dtype=np.intp)
+        valid_indices = indices[self.valid_mask(frame, indices)]
+        return valid_indices, self.get_joints_by_indices(frame, valid_indices)
+
+    def get_joint_index_array(self, joint_name_list):
+        """
+        把 joint 名稱 list 轉成 data_array 中的 index array (不存在的名稱略過)，
+        可在選擇改變時計算一次，之後每幀使用 get_joints_by_indices。
+        """
+        return np.array([self._joint_name_to_indices[name] for name in joint_name_list
+                         if name in self._joint_name_to_indices], dtype=np.intp)
+
+    def get_joints_by_indices(self, frame, indices):
+        """
+        根據 frame index 和 joint index array 回傳對應的 3D 資料（[len(indices),3]），一次 NumPy gather。
+        :param frame: 幀索引
+        :param indices: data_array 中的 joint index array
+        """
+        return self.data_array[frame, indices]
+
     def get_joints_by_names(self, frame, joint_name_list):
         """
         根據 frame index 和 joint 名稱 list 回傳對應的 3D 資料（[N,3]）。
@@ -170,5 +228,5 @@ class RawMocapData:
         :param joint_name_list: 關節名稱 list
         :return: shape = (len(joint_name_list), 3) 的 numpy array
         """
-        indices = [self._joint_name_to_indices[name] for name in joint_name_list if name in self._joint_name_to_indices]
-        return self.data_array[frame, indices, :] if indices else np.zeros((0,3))
\ No newline at end of file
+        indices = self.get_joint_index_array(joint_name_list)
+        return self.get_joints_by_indices(frame, indices) if len(indices) else np.zeros((0,3))
\ No newline at end of file
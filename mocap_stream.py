@@ -0,0 +1,406 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from mocap_data import RawMocapData, DEFAULT_VALID_THRESHOLD
+from motive_csv import iter_motive_positions
+from points_data import _count_csv_rows
+
+# 串流模式的磁碟資料目錄 (可用環境變數 MOCAP_STORE_DIR 指定)
+MOCAP_STORE_DIR = os.environ.get('MOCAP_STORE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'projection_window', 'mocap'))
+MOCAP_STORE_VERSION = 1
+# 每個 chunk 檔案的幀數；記憶體中最多保留 DEFAULT_WINDOW_CHUNKS 個，並預先讀取播放位置後面的 DEFAULT_PREFETCH_CHUNKS 個
+DEFAULT_CHUNK_FRAMES = 1024
+DEFAULT_WINDOW_CHUNKS = 8
+DEFAULT_PREFETCH_CHUNKS = 2
+# 單次讀取的幀數上限；超過時報錯而不是默默把整段資料讀入記憶體 (匯出請以區塊讀取)
+MAX_SLICE_FRAMES = 16 * DEFAULT_CHUNK_FRAMES
+# 超過此大小的 Motive CSV 預設以串流模式載入
+STREAMING_MIN_CSV_BYTES = 1024 * 1024 * 1024
+
+META_FILE = 'meta.json'
+VALID_BITS_FILE = 'valid_bits.npy'
+PROJECTION_PREFIX = 'projection_'
+
+
+def _chunk_file(index):
+    return f"chunk_{index:06d}.npy"
+
+
+def _store_signature(filename, threshold, chunk_frames):
+    stat = os.stat(filename)
+    return {'source': os.path.abspath(filename), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+            'threshold': threshold, 'chunk_frames': chunk_frames, 'version': MOCAP_STORE_VERSION}
+
+
+def _store_prefix(filename, store_dir=None):
+    """Common prefix of every store of one CSV, named after the hash of its absolute path."""
+    source = os.path.abspath(filename)
+    stem = os.path.splitext(os.path.basename(source))[0]
+    key = hashlib.sha1(source.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(store_dir or MOCAP_STORE_DIR, f"{stem}_{key}")
+
+
+def mocap_store_path(filename, threshold=DEFAULT_VALID_THRESHOLD, chunk_frames=DEFAULT_CHUNK_FRAMES, store_dir=None):
+    """
+    Store directory of a Motive CSV for its current size/mtime and the conversion settings.
+    A modified CSV gets a new directory, so rebuilding never deletes chunks of a store that is still open.
+    """
+    signature = _store_signature(filename, threshold, chunk_frames)
+    digest = hashlib.sha1(json.dumps(signature, sort_keys=True).encode('utf-8')).hexdigest()[:8]
+    return f"{_store_prefix(filename, store_dir)}_{digest}"
+
+
+def _read_store_meta(path):
+    try:
+        with open(os.path.join(path, META_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def build_mocap_store(filename, store_dir=None, threshold=DEFAULT_VALID_THRESHOLD, chunk_frames=DEFAULT_CHUNK_FRAMES,
+                      progress_callback=None, is_canceled=None):
+    """
+    Convert a Motive CSV once into a chunked on-disk store for StreamingRawMocapData.
+    The CSV is read block by block, so the capture never has to fit in RAM:
+    pass 1 writes the position columns chunk by chunk and counts valid values per column,
+    pass 2 applies the same column filtering and joint grouping as RawMocapData and rewrites
+    every chunk as float32 [frames, N, 3] plus its packed validity mask.
+    meta.json is written last, so an interrupted conversion is never opened.
+
+    :param filename: Motive CSV path.
+    :param store_dir: Parent directory of the stores (defaults to MOCAP_STORE_DIR).
+    :param threshold: Minimum number of valid values for a column to be kept.
+    :param chunk_frames: Frames per chunk file.
+    :param progress_callback: progress_callback(percent) called while converting.
+    :param is_canceled: is_canceled() -> bool, checked between chunks.
+    :return: Store path, or None when canceled.
+    :raises ValueError: When the CSV is not a Motive export or contains no frames.
+    """
+    path = mocap_store_path(filename, threshold, chunk_frames, store_dir)
+    signature = _store_signature(filename, threshold, chunk_frames)
+    tmp_path = f"{path}.{os.getpid()}_{threading.get_ident()}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    try:
+        expected_frames = max(1, _count_csv_rows(filename))
+        names, chunks = iter_motive_positions(filename, chunk_frames)
+
+        # Pass 1: CSV -> 原始欄位 chunk，同時統計每欄有效值數量
+        valid_counts = np.zeros(len(names), dtype=np.int64)
+        total_frames = 0
+        num_chunks = 0
+        for block in chunks:
+            if is_canceled is not None and is_canceled():
+                return None
+            np.save(os.path.join(tmp_path, f"raw_{_chunk_file(num_chunks)}"), block)
+            valid_counts += np.count_nonzero(~np.isnan(block), axis=0)
+            total_frames += len(block)
+            num_chunks += 1
+            if progress_callback is not None:
+                progress_callback(min(80, 80 * total_frames // expected_frames))
+        if total_frames == 0:
+            raise ValueError(f"No frames found in {filename}.")
+
+        # 欄位過濾與關節分組和 RawMocapData 相同
+        keep_positions = np.flatnonzero(valid_counts >= threshold)
+        if len(keep_positions) < len(names):
+            print(f"Dropping {len(names) - len(keep_positions)} empty columns because they have less than {threshold} valid data points.")
+        kept_names = [names[i] for i in keep_positions]
+        sorted_joint_names, kept_xyz, joint_name_to_index = RawMocapData._group_columns(kept_names)
+        num_raw_joints = len(sorted_joint_names)
+        num_complete = len(kept_xyz)
+        xyz_positions = keep_positions[np.asarray(kept_xyz, dtype=np.intp).reshape(-1)]
+
+        # Pass 2: 重排成 [frames, N, 3] 並建立有效遮罩
+        valid_bits = []
+        for index in range(num_chunks):
+            if is_canceled is not None and is_canceled():
+                return None
+            raw_path = os.path.join(tmp_path, f"raw_{_chunk_file(index)}")
+            block = np.load(raw_path)
+            frames = np.full((len(block), num_raw_joints, 3), np.nan, dtype=np.float32)
+            frames[:, :num_complete] = block[:, xyz_positions].reshape(len(block), num_complete, 3)
+            np.save(os.path.join(tmp_path, _chunk_file(index)), frames)
+            valid_bits.append(np.packbits(~np.isnan(frames).any(axis=2), axis=1))
+            os.remove(raw_path)
+            if progress_callback is not None:
+                progress_callback(80 + 20 * (index + 1) // num_chunks)
+        np.save(os.path.join(tmp_path, VALID_BITS_FILE), np.concatenate(valid_bits))
+
+        meta = {'signature': signature, 'total_frames': total_frames, 'num_raw_joints': num_raw_joints,
+                'num_chunks': num_chunks, 'joint_names': sorted_joint_names,
+                'joint_name_to_index': joint_name_to_index}
+        with open(os.path.join(tmp_path, META_FILE), 'w') as f:
+            json.dump(meta, f)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    print(f"Converted {filename} to {num_chunks} chunks ({total_frames} frames x {num_raw_joints} joints) in {path}")
+    return path
+
+
+def load_streaming_mocap(filename, store_dir=None, threshold=DEFAULT_VALID_THRESHOLD, progress_callback=None,
+                         is_canceled=None, keep=(), **kwargs):
+    """
+    Open a Motive CSV as StreamingRawMocapData, converting it first when it has no
+    up-to-date store (same path, size, mtime and threshold). Stores of older versions of
+    the same CSV are deleted after a conversion.
+
+    :param keep: Store paths that must not be deleted (e.g. the one currently open).
+    :param kwargs: Passed to StreamingRawMocapData (window_chunks, prefetch_chunks).
+    :return: StreamingRawMocapData, or None when the conversion was canceled.
+    """
+    path = mocap_store_path(filename, threshold, DEFAULT_CHUNK_FRAMES, store_dir)
+    if _read_store_meta(path) is None:
+        path = build_mocap_store(filename, store_dir, threshold, DEFAULT_CHUNK_FRAMES, progress_callback, is_canceled)
+        if path is None:
+            return None
+        keep = {os.path.abspath(p) for p in keep} | {os.path.abspath(path)}
+        prefix = _store_prefix(filename, store_dir)
+        parent = os.path.dirname(prefix)
+        for name in os.listdir(parent):
+            stale = os.path.join(parent, name)
+            if stale.startswith(prefix + '_') and not stale.endswith('.tmp') and os.path.abspath(stale) not in keep:
+                print(f"Removing stale streaming store {stale}")
+                shutil.rmtree(stale, ignore_errors=True)
+    return StreamingRawMocapData(path, **kwargs)
+
+
+def clear_mocap_stores(store_dir=None, keep=()):
+    """
+    Delete the streaming stores.
+
+    :param keep: Store paths to keep (e.g. the one currently open).
+    :return: (stores removed, bytes freed).
+    """
+    store_dir = store_dir or MOCAP_STORE_DIR
+    keep = {os.path.abspath(path) for path in keep}
+    removed, freed = 0, 0
+    if not os.path.isdir(store_dir):
+        return removed, freed
+    for name in os.listdir(store_dir):
+        path = os.path.join(store_dir, name)
+        if not os.path.isdir(path) or os.path.abspath(path) in keep:
+            continue
+        size = sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+        shutil.rmtree(path, ignore_errors=True)
+        if not os.path.exists(path):
+            removed += 1
+            freed += size
+    return removed, freed
+
+
+class StreamedFrames:
+    """
+    Read-only [T, N, 3] stand-in for RawMocapData.data_array that reads only the chunks
+    it is indexed with. Supports an int or slice on the frame axis (optionally followed by
+    joint/axis indices); slices are limited to MAX_SLICE_FRAMES frames and np.asarray()
+    raises, so the whole capture is never read into memory by accident.
+    """
+    ndim = 3
+    dtype = np.dtype(np.float32)
+
+    def __init__(self, data, joint_indices=None):
+        """
+        :param data: StreamingRawMocapData.
+        :param joint_indices: Optional joint subset; the view is then [T, len(joint_indices), 3].
+        """
+        self._data = data
+        self._joint_indices = None if joint_indices is None else np.asarray(joint_indices)
+        num_joints = data.num_raw_joints if joint_indices is None else len(self._joint_indices)
+        self.shape = (data.total_frames, num_joints, 3)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        rest = ()
+        if isinstance(key, tuple):
+            key, rest = key[0], key[1:]
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1:
+                frames = self._data.get_frames(start, stop)
+            else:
+                frame_indices = np.arange(start, stop, step)
+                if len(frame_indices) == 0:
+                    frames = np.empty((0, self._data.num_raw_joints, 3), dtype=self.dtype)
+                else:
+                    first = frame_indices.min()
+                    frames = self._data.get_frames(first, frame_indices.max() + 1)[frame_indices - first]
+            if self._joint_indices is not None:
+                frames = frames[:, self._joint_indices]
+            return frames[(slice(None),) + rest]
+        frame = int(key)
+        if frame < 0:
+            frame += len(self)
+        frame = self._data[frame]
+        if self._joint_indices is not None:
+            frame = frame[self._joint_indices]
+        return frame[rest]
+
+    def __array__(self, dtype=None, copy=None):
+        raise TypeError(f"Streamed mocap data ({self.shape[0]} frames) cannot be converted to one array; "
+                        f"read it in blocks of at most {MAX_SLICE_FRAMES} frames.")
+
+
+class StreamingRawMocapData(RawMocapData):
+    def __init__(self, store_path, window_chunks=DEFAULT_WINDOW_CHUNKS, prefetch_chunks=DEFAULT_PREFETCH_CHUNKS):
+        """
+        RawMocapData backed by a chunked on-disk store (see build_mocap_store), for captures
+        larger than RAM. Frames are served from a sliding window of recently used chunks;
+        whenever a chunk is used, the next prefetch_chunks chunks are read in a background
+        thread so playback does not wait for the disk.
+
+        :param store_path: Store directory written by build_mocap_store.
+        :param window_chunks: Chunks kept in memory (least recently used are dropped).
+        :param prefetch_chunks: Chunks read ahead of the requested one.
+        """
+        meta = _read_store_meta(store_path)
+        if meta is None:
+            raise ValueError(f"{store_path} is not a streaming mocap store.")
+        self.store_path = store_path
+        self.total_frames = meta['total_frames']
+        self.num_raw_joints = meta['num_raw_joints']
+        self.chunk_frames = meta['signature']['chunk_frames']
+        self.num_chunks = meta['num_chunks']
+        self._sorted_joint_names = meta['joint_names']
+        self._joint_name_to_indices = meta['joint_name_to_index']
+        # 有效遮罩很小 (每幀 ceil(N/8) bytes)，整個讀入記憶體
+        self.valid_bits = np.load(os.path.join(store_path, VALID_BITS_FILE))
+        self.data_array = self.frames()
+
+        self.window_chunks = max(1, window_chunks)
+        self.prefetch_chunks = max(0, min(prefetch_chunks, self.window_chunks - 1))
+        self._chunks = OrderedDict()  # chunk index -> [frames, N, 3], least recently used first
+        self._pending = {}  # chunk index -> Future of a prefetch
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._closed = False
+        print(f"Streaming {self.total_frames} frames x {self.num_raw_joints} joints from {store_path}")
+
+    def _load_chunk(self, index):
+        chunk = np.load(os.path.join(self.store_path, _chunk_file(index)))
+        chunk.setflags(write=False)  # 快取共用
+        with self._lock:
+            self._chunks[index] = chunk
+            self._chunks.move_to_end(index)
+            self._pending.pop(index, None)
+            while len(self._chunks) > self.window_chunks:
+                self._chunks.popitem(last=False)
+        return chunk
+
+    def _get_chunk(self, index):
+        with self._lock:
+            chunk = self._chunks.get(index)
+            if chunk is not None:
+                self._chunks.move_to_end(index)
+            future = self._pending.get(index)
+            # 預先讀取播放位置後面的 chunk
+            prefetch_end = index if self._closed else min(index + 1 + self.prefetch_chunks, self.num_chunks)
+            for ahead in range(index + 1, prefetch_end):
+                if ahead not in self._chunks and ahead not in self._pending:
+                    self._pending[ahead] = self._executor.submit(self._load_chunk, ahead)
+        if chunk is None:
+            chunk = future.result() if future is not None else self._load_chunk(index)
+        return chunk
+
+    def __getitem__(self, frame):
+        """
+        Get the 3D data for a specific frame.
+        :param frame: Frame index.
+        :return: 3D data for the frame in [N, 3] (Joints, XYZ) format.
+        """
+        if frame < 0 or frame >= self.total_frames:
+            raise IndexError("Frame index out of range.")
+        return self._get_chunk(frame // self.chunk_frames)[frame % self.chunk_frames]
+
+    def get_frames(self, start, end):
+        start, end = max(0, start), min(end, self.total_frames)
+        if end <= start:
+            return np.empty((0, self.num_raw_joints, 3), dtype=np.float32)
+        if end - start > MAX_SLICE_FRAMES:
+            raise ValueError(f"Reading {end - start} streamed frames at once (limit {MAX_SLICE_FRAMES}); "
+                             f"use iter_blocks() or project_to_file() for whole-capture work.")
+        first, last = start // self.chunk_frames, (end - 1) // self.chunk_frames
+        offset = first * self.chunk_frames
+        if first == last:
+            return self._get_chunk(first)[start - offset:end - offset]
+        return np.concatenate([self._get_chunk(i) for i in range(first, last + 1)])[start - offset:end - offset]
+
+    def get_joints_by_indices(self, frame, indices):
+        return self[frame][indices]
+
+    def frames(self, joint_indices=None):
+        """StreamedFrames view [T, N, 3], or [T, len(joint_indices), 3] for a joint subset."""
+        return StreamedFrames(self, joint_indices)
+
+    def iter_blocks(self):
+        """
+        Yield (start_frame, frames) for every chunk in order, read straight from the store
+        (memory-mapped) without touching the playback window.
+        """
+        for index in range(self.num_chunks):
+            yield index * self.chunk_frames, np.load(os.path.join(self.store_path, _chunk_file(index)), mmap_mode='r')
+
+    def project_to_file(self, camera, progress_callback=None):
+        """
+        Whole-capture projection [T, N, 2] float32 through camera, written chunk by chunk to
+        projection_<camera digest>.npy in the store and returned memory-mapped (read-only).
+        The file is reused while the camera stays the same; projections for other cameras are removed.
+
+        :param camera: CameraModel.
+        :param progress_callback: Optional callable(done_frames, total_frames).
+        """
+        digest = hashlib.sha1()
+        for values in (camera.K, camera.dist_coeffs, camera.R, camera.t):
+            digest.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+        name = f"{PROJECTION_PREFIX}{digest.hexdigest()[:16]}.npy"
+        path = os.path.join(self.store_path, name)
+        if not os.path.exists(path):
+            print(f"Projecting {self.total_frames} streamed frames to {path}")
+            tmp_path = f"{path}.{os.getpid()}_{threading.get_ident()}.tmp"
+            out = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32,
+                                            shape=(self.total_frames, self.num_raw_joints, 2))
+            for start, block in self.iter_blocks():
+                out[start:start + len(block)] = camera.project(block)
+                if progress_callback:
+                    progress_callback(start + len(block), self.total_frames)
+            out.flush()
+            del out
+            os.replace(tmp_path, path)
+            # 每個 store 只保留目前相機的投影檔
+            for entry in os.scandir(self.store_path):
+                if entry.name.startswith(PROJECTION_PREFIX) and entry.name != name:
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        pass
+        return np.load(path, mmap_mode='r')
+
+    def resident_arrays(self):
+        return [self.valid_bits]
+
+    def cached_chunks(self):
+        """Chunks currently in the sliding window."""
+        with self._lock:
+            return list(self._chunks.values())
+
+    def release_cache(self):
+        """Drop the sliding window; chunks are read again on next use."""
+        with self._lock:
+            self._chunks.clear()
+
+    def close(self):
+        """Stop the prefetch thread and drop the window (frames can still be read, without prefetching)."""
+        with self._lock:
+            self._closed = True
+        self._executor.shutdown(wait=False)
+        self.release_cache()
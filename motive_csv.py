@@ -0,0 +1,113 @@
+import csv
+import numpy as np
+import pandas as pd
+
+# Motive 匯出的 CSV：第一行為 take 資訊，接著 (略過空行後) 五行標頭
+# Type (Bone/Marker...)、Name (Skeleton 001:Hip...)、ID、Rotation/Position、Axis (X/Y/Z)
+MOTIVE_HEADER_ROWS = 5
+TYPE_ROW, NAME_ROW, ID_ROW, PROPERTY_ROW, AXIS_ROW = range(MOTIVE_HEADER_ROWS)
+
+
+def read_motive_header(filename):
+    """
+    Parse the Motive header rows once.
+
+    :return: (header_rows, body_start) where header_rows is a list of the five header rows
+             (lists of cells) and body_start is the physical line number where the data begins.
+    """
+    header_rows = []
+    with open(filename, newline='', encoding='utf-8', errors='replace') as f:
+        reader = csv.reader(f)
+        skipped_info = False
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue  # 與 pandas 相同，略過空行
+            if not skipped_info:
+                skipped_info = True  # 第一行 Format Version / Take Name 等資訊
+                continue
+            header_rows.append(row)
+            if len(header_rows) == MOTIVE_HEADER_ROWS:
+                return header_rows, reader.line_num
+    raise ValueError(f"{filename} is not a Motive CSV export (expected {MOTIVE_HEADER_ROWS} header rows).")
+
+
+def _header_cell(header_rows, level, column):
+    """Header cell, named like pandas does for empty multi-row header cells."""
+    row = header_rows[level]
+    value = row[column] if column < len(row) else ''
+    return value if value != '' else f"Unnamed: {column}_level_{level}"
+
+
+def position_columns(header_rows, property_name="Position"):
+    """
+    Column indices and names of every Position X/Y/Z column.
+
+    :return: (indices, names) with names formatted as f"{ID}:{Name}({Type})_{Axis}",
+             e.g. '1:Skeleton 001:Hip(Bone)_X'.
+    """
+    width = max(len(row) for row in header_rows)
+    indices, names = [], []
+    for column in range(width):
+        if _header_cell(header_rows, PROPERTY_ROW, column) != property_name:
+            continue
+        joint = (f"{_header_cell(header_rows, ID_ROW, column)}:{_header_cell(header_rows, NAME_ROW, column)}"
+                 f"({_header_cell(header_rows, TYPE_ROW, column)})")
+        indices.append(column)
+        names.append(f"{joint}_{_header_cell(header_rows, AXIS_ROW, column)}")
+    return indices, names
+
+
+def _read_position_body(filename, body_start, indices, dtype):
+    """pandas C-parser read of the position columns; falls back to per-column conversion for non-numeric cells."""
+    read_args = dict(skiprows=body_start, header=None, usecols=indices, engine='c')
+    try:
+        return pd.read_csv(filename, dtype=dtype, **read_args)
+    except ValueError:
+        # 含有非數值的欄位時改為逐欄轉換，非數值視為 NaN
+        return pd.read_csv(filename, dtype=str, **read_args).apply(pd.to_numeric, errors='coerce')
+
+
+def read_motive_positions(filename, dtype=np.float32):
+    """
+    Read only the Position X/Y/Z columns of a Motive CSV export.
+    The header is parsed once; the numeric body is read by the pandas C parser restricted
+    to the position columns (usecols) straight into a float array, without a MultiIndex.
+
+    :param filename: Motive CSV path.
+    :param dtype: Output dtype.
+    :return: (names, data) with data of shape (frames, len(names)); empty cells are NaN.
+    :raises ValueError: When the file has no Motive header or no position columns.
+    """
+    header_rows, body_start = read_motive_header(filename)
+    indices, names = position_columns(header_rows)
+    if not indices:
+        raise ValueError(f"No Position columns found in {filename}.")
+    body = _read_position_body(filename, body_start, indices, dtype)
+    # usecols 依檔案中的欄位順序回傳，indices 已是遞增順序
+    data = body.to_numpy(dtype=dtype, copy=False)
+    print(f"Read {data.shape[0]} frames x {len(names)} position columns from {filename}")
+    return names, data
+
+
+def iter_motive_positions(filename, chunk_frames, dtype=np.float32):
+    """
+    Like read_motive_positions, but yields the body in blocks of chunk_frames rows so that
+    files larger than RAM can be converted (see mocap_stream.build_mocap_store).
+
+    :return: (names, iterator of float arrays [<= chunk_frames, len(names)]).
+    :raises ValueError: When the file has no Motive header or no position columns; while iterating,
+                        when a position cell is not numeric.
+    """
+    header_rows, body_start = read_motive_header(filename)
+    indices, names = position_columns(header_rows)
+    if not indices:
+        raise ValueError(f"No Position columns found in {filename}.")
+
+    def chunks():
+        try:
+            for chunk in pd.read_csv(filename, dtype=dtype, skiprows=body_start, header=None, usecols=indices,
+                                     engine='c', chunksize=chunk_frames):
+                yield chunk.to_numpy(dtype=dtype, copy=False)
+        except ValueError:
+            raise ValueError(f"{filename} contains non-numeric position values; load it without streaming.")
+    return names, chunks()
@@ -0,0 +1,272 @@
+import cv2
+import numpy as np
+
+# 轉成 int32 前的座標上限，避免相機後方或極遠的點溢位
+MAX_PIXEL_COORD = 1 << 20
+
+# 定義關鍵點連接對，用於繪製骨架
+# 17 keypoints
+JOINT_PAIRS_17kp = [
+    (0, 1), (1, 2), (2, 3),
+    (0, 4), (4, 5), (5, 6),
+    (0, 7), (7, 8), (8, 9), (9, 10),
+    (8, 11), (11, 12), (12, 13),
+    (8, 14), (14, 15), (15, 16)
+]
+
+# 24 keypoints
+JOINT_PAIRS_24kp = [
+    (0, 1), (0, 2), (0, 3),  # 骨盆到髋部
+    (1, 4), (4, 7), (7, 10),  # 左腿
+    (2, 5), (5, 8), (8, 11),  # 右腿
+    (3, 6), (6, 9), (9, 12), (12, 15),  # 脊柱到头
+    (9, 13), (13, 16), (16, 18), (18, 20), (20, 22),  # 左臂
+    (9, 14), (14, 17), (17, 19), (19, 21), (21, 23)   # 右臂
+]
+
+# 骨架連接對的映射表
+JOINT_PAIRS_MAP = {
+    17: JOINT_PAIRS_17kp,
+    24: JOINT_PAIRS_24kp,
+}
+
+# 3D資料檔案依載入順序輪流使用的顏色 (BGR)
+DATASET_COLORS = [
+    (0, 0, 255),    # 紅色 (BGR)
+    (0, 255, 0),    # 綠色 (BGR)
+    (255, 0, 0),    # 藍色 (BGR)
+    (0, 255, 255),  # 黃色 (BGR)
+    (255, 0, 255),  # 洋紅色 (BGR)
+    (255, 255, 0),  # 青色 (BGR)
+    (128, 0, 128),  # 紫色 (BGR)
+    (0, 165, 255),  # 橙色 (BGR)
+    (0, 128, 0),    # 深綠色 (BGR)
+    (0, 0, 128),    # 深紅色 (BGR)
+]
+
+# 2D 關鍵點 (Pixel2D) 的顯示顏色 (BGR)
+PIXEL2D_COLOR = (34, 139, 230)
+RAW_MOCAP_COLOR = (255, 255, 255)
+
+
+def draw_joint_trails(frame_bgr, projected_seq, frame_idx, trail_length, color, joint_indices=None, thickness=1):
+    """
+    Draw each joint's path over the last `trail_length` frames.
+    The history is a slice of the cached whole-sequence projection, so there is no
+    per-frame bookkeeping and all joints go through a single cv2.polylines call.
+
+    :param frame_bgr: Frame to draw on (modified in place).
+    :param projected_seq: Cached projection [T, N, 2] (NaN for missing joints).
+    :param frame_idx: Index of the current frame in projected_seq.
+    :param trail_length: Number of frames in the trail, including the current one.
+    :param color: BGR color.
+    :param joint_indices: Optional index array selecting a subset of joints.
+    :return: frame_bgr
+    """
+    if not 0 <= frame_idx < projected_seq.shape[0]:
+        return frame_bgr
+    start = max(0, frame_idx - trail_length + 1)
+    window = projected_seq[start:frame_idx + 1]
+    if joint_indices is not None:
+        window = window[:, joint_indices]
+    if window.shape[0] < 2 or window.shape[1] == 0:
+        return frame_bgr
+
+    tracks = np.swapaxes(window, 0, 1)  # (N, n, 2)
+    valid = np.isfinite(tracks).all(axis=2)
+    tracks = np.ascontiguousarray(np.clip(np.nan_to_num(tracks), -MAX_PIXEL_COORD, MAX_PIXEL_COORD), dtype=np.int32)
+    if valid.all():
+        polylines = list(tracks)
+    else:
+        # 缺失的幀直接略過，軌跡在有效點之間連接
+        polylines = [track[mask] for track, mask in zip(tracks, valid) if mask.sum() >= 2]
+    if polylines:
+        cv2.polylines(frame_bgr, polylines, False, color, thickness)
+    return frame_bgr
+
+
+_DISK_OFFSETS = {}
+
+
+def _disk_offsets(radius):
+    """Cached (dy, dx) offsets of all pixels in a filled disk of the given radius."""
+    offsets = _DISK_OFFSETS.get(radius)
+    if offsets is None:
+        dy, dx = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+        inside = dx * dx + dy * dy <= radius * radius
+        offsets = (dy[inside].astype(np.int64), dx[inside].astype(np.int64))
+        _DISK_OFFSETS[radius] = offsets
+    return offsets
+
+
+def cluster_points(pts2d, cell_size):
+    """
+    Merge points that fall into the same cell_size x cell_size pixel cell into their centroid.
+    Used as level-of-detail when the frame is shown zoomed out and nearby markers would
+    collapse into the same screen pixel anyway.
+    """
+    if cell_size <= 1 or len(pts2d) == 0:
+        return pts2d
+    cells = np.floor_divide(pts2d, cell_size).astype(np.int64)
+    cells -= cells.min(axis=0)
+    keys = cells[:, 1] * (cells[:, 0].max() + 1) + cells[:, 0]
+    _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    cx = np.bincount(inverse, weights=pts2d[:, 0]) / counts
+    cy = np.bincount(inverse, weights=pts2d[:, 1]) / counts
+    return np.stack([cx, cy], axis=1)
+
+
+def stamp_points(frame_bgr, pts2d, color, radius=4, cell_size=1):
+    """
+    Draw filled dots for all points in one vectorized raster pass, writing directly into
+    the frame array instead of calling cv2.circle per point.
+
+    :param frame_bgr: Frame to draw on (modified in place, must be C-contiguous).
+    :param pts2d: Pixel coordinates [N, 2]; NaN rows are skipped.
+    :param color: BGR color.
+    :param radius: Dot radius in frame pixels.
+    :param cell_size: Level-of-detail cell size; > 1 clusters nearby points first.
+    :return: frame_bgr
+    """
+    pts = np.asarray(pts2d, dtype=np.float64)
+    pts = pts[np.isfinite(pts).all(axis=1)]
+    pts = cluster_points(pts, cell_size)
+    if len(pts) == 0:
+        return frame_bgr
+
+    h, w = frame_bgr.shape[:2]
+    pts = np.clip(pts, -MAX_PIXEL_COORD, MAX_PIXEL_COORD).astype(np.int64)
+    x, y = pts[:, 0], pts[:, 1]
+    dy, dx = _disk_offsets(radius)
+
+    # 完全在畫面內的點直接用線性位移；靠近邊界的點再逐像素檢查
+    inner = (x >= radius) & (x < w - radius) & (y >= radius) & (y < h - radius)
+    linear = ((y[inner] * w + x[inner])[:, None] + (dy * w + dx)[None, :]).ravel()
+    border = ~inner & (x >= 0) & (x < w) & (y >= 0) & (y < h)
+    if border.any():
+        ys = (y[border, None] + dy[None, :]).ravel()
+        xs = (x[border, None] + dx[None, :]).ravel()
+        keep = (xs >= 0) & (xs < w) & (ys >= 0) & (ys < h)
+        linear = np.concatenate([linear, ys[keep] * w + xs[keep]])
+
+    flat = frame_bgr.reshape(-1, frame_bgr.shape[2])
+    for channel, value in enumerate(color):
+        flat[:, channel][linear] = value
+    return frame_bgr
+
+
+def draw_skeleton_lines(frame_bgr, pts2d, joint_pairs, color, thickness=2):
+    """
+    Draw bones whose two joints are both valid and inside the frame, in one cv2.polylines call.
+
+    :param frame_bgr: Frame to draw on (modified in place).
+    :param pts2d: Integer pixel coordinates [N, 2].
+    :param joint_pairs: List of (i, j) joint index pairs.
+    :param color: BGR color of the joints; bones use a darker shade.
+    :param thickness: Line thickness.
+    :return: frame_bgr
+    """
+    pairs = np.asarray(joint_pairs, dtype=np.int64).reshape(-1, 2)
+    pairs = pairs[(pairs < len(pts2d)).all(axis=1)]
+    if len(pairs) == 0:
+        return frame_bgr
+    h, w = frame_bgr.shape[:2]
+    x, y = pts2d[:, 0], pts2d[:, 1]
+    inside = (x >= 0) & (x < w) & (y >= 0) & (y < h)
+    pairs = pairs[inside[pairs[:, 0]] & inside[pairs[:, 1]]]
+    if len(pairs) == 0:
+        return frame_bgr
+    line_color = tuple(int(c * 0.7) for c in color)  # Darker shade for lines
+    cv2.polylines(frame_bgr, list(np.ascontiguousarray(pts2d[pairs], dtype=np.int32)), False, line_color, thickness)
+    return frame_bgr
+
+
+def draw_points_and_skeleton(frame_bgr, pts, color, joint_pairs=None, lod_cell_size=1, valid=None):
+    """
+    Draw one frame of one dataset: joint dots, then the skeleton on top.
+
+    :param frame_bgr: Frame to draw on (modified in place).
+    :param pts: Pixel coordinates [N, >=2]; rows containing NaN are skipped.
+    :param color: BGR color.
+    :param joint_pairs: Optional bone list; None draws points only.
+    :param lod_cell_size: > 1 clusters points closer than that many pixels (level of detail).
+    :param valid: Optional precomputed bool mask [N] of joints to draw (skips the NaN scan).
+    :return: frame_bgr
+    """
+    pts = np.asarray(pts)
+    if valid is None:
+        valid = ~np.isnan(pts).any(axis=1)
+    if not valid.any():
+        return frame_bgr
+    projected = np.clip(pts[valid, :2], -MAX_PIXEL_COORD, MAX_PIXEL_COORD).astype(np.int64)
+    stamp_points(frame_bgr, projected, color, radius=4, cell_size=lod_cell_size)
+    if joint_pairs:
+        # 無效關節放在畫面外，骨架會自動略過
+        coords = np.full((len(pts), 2), -1, dtype=np.int64)
+        coords[valid] = projected
+        draw_skeleton_lines(frame_bgr, coords, joint_pairs, color)
+    return frame_bgr
+
+
+def format_timestamp(seconds):
+    hours = int(seconds // 3600)
+    minutes = int((seconds % 3600) // 60)
+    secs = int(seconds % 60)
+    return f"{hours:02}:{minutes:02}:{secs:02}"
+
+
+def draw_frame_info(frame_bgr, frame_idx, total_frames, fps):
+    """Draw the exported-video timer and frame number in the top-left corner."""
+    timer_text = f"{format_timestamp(frame_idx / fps)} / {format_timestamp(total_frames / fps)}"
+    frame_text = f"Frame: {frame_idx} / {total_frames}"
+    cv2.putText(frame_bgr, timer_text, (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+    cv2.putText(frame_bgr, frame_text, (20, 80), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+    return frame_bgr
+
+
+class OverlayRenderer:
+    def __init__(self, layers=(), trail_length=0):
+        """
+        Immutable snapshot of everything needed to draw the overlay on a video frame.
+        It only holds references to precomputed arrays and never touches GUI state,
+        so one instance can be shared by several export threads.
+
+        :param layers: Iterable of dicts, drawn in order, with keys
+                       'points' (whole-sequence pixel coordinates [T, N, >=2], NaN = missing),
+                       'color' (BGR tuple) and optional
+                       'frame_offset' (data frame = video frame + offset, default 0),
+                       'joint_pairs' (bone list or None),
+                       'joint_indices' (index array selecting a subset of joints),
+                       'trails' (draw joint trails, default False),
+                       'lod' (cluster points when the frame is displayed zoomed out),
+                       'valid_bits' (np.packbits validity mask [T, ceil(N/8)], e.g. RawMocapData.valid_bits).
+        :param trail_length: Trail length in frames for layers with 'trails'.
+        """
+        self.layers = [dict(layer) for layer in layers]
+        self.trail_length = trail_length
+
+    def render(self, frame_bgr, frame_idx, display_scale=1.0):
+        """
+        Draw all layers for video frame frame_idx onto frame_bgr (BGR, modified in place).
+        display_scale < 1 means the frame is shown shrunk; layers with 'lod' then merge nearby points.
+        """
+        for layer in self.layers:
+            points = layer['points']
+            current_idx = frame_idx + layer.get('frame_offset', 0)
+            if not 0 <= current_idx < points.shape[0]:
+                continue
+            joint_indices = layer.get('joint_indices')
+            if layer.get('trails') and self.trail_length > 0:
+                draw_joint_trails(frame_bgr, points, current_idx, self.trail_length, layer['color'], joint_indices)
+            pts = points[current_idx] if joint_indices is None else points[current_idx, joint_indices]
+            valid = None
+            valid_bits = layer.get('valid_bits')
+            if valid_bits is not None:
+                valid = np.unpackbits(valid_bits[current_idx], count=points.shape[1]).view(bool)
+                if joint_indices is not None:
+                    valid = valid[joint_indices]
+            lod_cell_size = 1
+            if layer.get('lod') and 0 < display_scale < 1:
+                lod_cell_size = int(round(1 / display_scale))
+            draw_points_and_skeleton(frame_bgr, pts, layer['color'], layer.get('joint_pairs'), lod_cell_size, valid)
+        return frame_bgr
@@ -0,0 +1,334 @@
+import os
+import json
+import shutil
+import hashlib
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from tempfile import NamedTemporaryFile
+import cv2
+import numpy as np
+from software_renderer import OrbitCamera, render_scene
+from overlay_drawing import OverlayRenderer
+from video_export import export_overlay_video, iter_video_frames, iter_black_frames
+from video_encoder import VideoEncoder
+
+# 分段匯出的設定檔；內容相符時沿用已完成的分段 (中斷後可續傳)
+SEGMENT_MANIFEST = "manifest.json"
+# 寫入 .npy 與計算雜湊時每次處理的幀數
+BLOCK_FRAMES = 4096
+
+
+def split_frame_range(start, end, num_segments):
+    """
+    Split [start, end) into at most num_segments contiguous (start, end) ranges of near-equal size.
+    """
+    total = max(0, end - start)
+    num_segments = max(1, min(num_segments, total))
+    bounds = np.linspace(start, end, num_segments + 1).round().astype(int)
+    return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+def split_frame_ranges(frame_ranges, num_segments):
+    """
+    Split several (start, end) ranges into about num_segments pieces in total, each range
+    getting a share proportional to its length (at least one).
+    """
+    total = sum(max(0, end - start) for start, end in frame_ranges)
+    pieces = []
+    for start, end in frame_ranges:
+        if end > start:
+            share = max(1, int(round(num_segments * (end - start) / max(total, 1))))
+            pieces += split_frame_range(start, end, share)
+    return pieces
+
+
+def concat_videos(segment_paths, output_path, encoder=None):
+    """
+    Join video segments in order into output_path.
+    Uses the ffmpeg concat demuxer without re-encoding when ffmpeg is available
+    (same approach as Merge_group_csv.merge_video_ffmpeg), otherwise re-reads the
+    segments with OpenCV and re-encodes them into one file with VideoEncoder(**encoder).
+    """
+    if shutil.which('ffmpeg'):
+        with NamedTemporaryFile('w', suffix='.txt', delete=False) as tmp:
+            for path in segment_paths:
+                tmp.write(f"file '{os.path.abspath(path)}'\n")
+            concat_list = tmp.name
+        cmd = [
+            'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
+            '-f', 'concat', '-safe', '0', '-i', concat_list,
+            '-c', 'copy', output_path
+        ]
+        try:
+            subprocess.check_call(cmd)
+            return
+        except subprocess.CalledProcessError as e:
+            print(f"ffmpeg concat failed ({e}), falling back to OpenCV")
+        finally:
+            os.remove(concat_list)
+
+    out = None
+    for path in segment_paths:
+        cap = cv2.VideoCapture(path)
+        if out is None:
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+            out = VideoEncoder(output_path, fps, size, **(encoder or {}))
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            out.write(frame)
+        cap.release()
+    if out is not None:
+        out.release()
+
+
+def run_segment_jobs(job_fn, jobs, max_workers=None, progress_callback=None, is_canceled=None, poll_interval=0.1):
+    """
+    Run job_fn(job) for every job in a process pool.
+
+    :param job_fn: Module-level (picklable) function rendering one segment.
+    :param jobs: List of picklable job descriptions.
+    :param max_workers: Pool size (defaults to the CPU count).
+    :param progress_callback: Called as progress_callback(done, total) every poll_interval
+                              seconds, so a GUI caller can process events while waiting.
+    :param is_canceled: Optional callable; when it returns True pending jobs are dropped.
+    :return: True if every job finished, False if canceled.
+    """
+    # spawn: 子行程不繼承 GUI 行程的 Qt 狀態
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as pool:
+        pending = {pool.submit(job_fn, job) for job in jobs}
+        while pending:
+            finished, pending = wait(pending, timeout=poll_interval, return_when=FIRST_COMPLETED)
+            for future in finished:
+                future.result()  # 重新拋出子行程中的例外
+            if progress_callback is not None:
+                progress_callback(len(jobs) - len(pending), len(jobs))
+            if is_canceled is not None and is_canceled():
+                for future in pending:
+                    future.cancel()
+                return False
+    return True
+
+
+def _render_3d_segment(job):
+    """Render frames [start, end) of the 3D view into one segment file (runs in a worker process)."""
+    datasets = []
+    for d in job['datasets']:
+        datasets.append(dict(d, points=np.load(d['points_path'], mmap_mode='r')))
+    camera = OrbitCamera(**job['camera'])
+    width, height = job['size']
+    out = VideoEncoder(job['path'], job['fps'], (width, height), **(job['encoder'] or {}))
+    for frame_idx in range(job['start'], job['end']):
+        current_idx = frame_idx + job['frame_offset']
+        scene = []
+        for d in datasets:
+            if 0 <= current_idx < d['points'].shape[0]:
+                scene.append({'points': d['points'][current_idx], 'color': d['color'], 'joint_pairs': d.get('joint_pairs')})
+        image = render_scene(scene, camera, width, height)
+        cv2.putText(image, f"3D - Frame {frame_idx}", (10, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        out.write(image)
+    out.release()
+    return job['path']
+
+
+def export_3d_animation(datasets, camera, frame_count, output_path, fps=30, size=(960, 720), frame_offset=0,
+                        max_workers=None, progress_callback=None, is_canceled=None, encoder=None):
+    """
+    Headless parallel export of the software-rendered 3D view as one mp4.
+    The frame range is split into segments that are rendered offscreen by a process pool
+    and then joined in order.
+
+    :param datasets: List of dicts with 'points' ([T, N, 3] whole sequence), 'color' and optional 'joint_pairs'.
+    :param camera: OrbitCamera defining the view.
+    :param frame_count: Number of frames to export (frame 0 .. frame_count - 1).
+    :param output_path: Target .mp4 path.
+    :param fps: Output frame rate.
+    :param size: (width, height) of the output video.
+    :param frame_offset: Dataset frame index = video frame index + frame_offset.
+    :param max_workers: Process pool size (defaults to the CPU count).
+    :param progress_callback: Called as progress_callback(done_segments, total_segments).
+    :param is_canceled: Optional callable returning True to abort.
+    :param encoder: Optional video_encoder.encoder_options dict.
+    :return: True on success, False if canceled.
+    """
+    work_dir = output_path + ".parts"
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        # 資料集寫成 .npy，子行程以 mmap 讀取，避免每個 job 都 pickle 整段序列
+        shared = []
+        for i, d in enumerate(datasets):
+            points_path = os.path.join(work_dir, f"dataset_{i}.npy")
+            _save_blockwise(points_path, d['points'], np.float32)
+            shared.append({'points_path': points_path, 'color': tuple(d['color']), 'joint_pairs': d.get('joint_pairs')})
+
+        camera_params = {
+            'target': tuple(camera.target), 'azimuth': camera.azimuth, 'elevation': camera.elevation,
+            'distance': camera.distance, 'fov': camera.fov,
+        }
+        workers = max_workers or os.cpu_count() or 1
+        # 分段數多於行程數，讓進度更新較平滑、負載較平均
+        ranges = split_frame_range(0, frame_count, workers * 4)
+        jobs = []
+        for i, (start, end) in enumerate(ranges):
+            jobs.append({
+                'datasets': shared, 'camera': camera_params, 'size': tuple(size), 'fps': fps,
+                'frame_offset': frame_offset, 'start': start, 'end': end, 'encoder': encoder,
+                'path': os.path.join(work_dir, f"segment_{i:04d}.mp4"),
+            })
+        print(f"Exporting 3D view: {frame_count} frames in {len(jobs)} segments with {workers} processes")
+        if not run_segment_jobs(_render_3d_segment, jobs, workers, progress_callback, is_canceled):
+            return False
+        concat_videos([job['path'] for job in jobs], output_path, encoder)
+        return True
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _save_blockwise(path, points, dtype=None):
+    """
+    Write a [T, ...] sequence to an .npy file BLOCK_FRAMES frames at a time, so memory-mapped
+    or streamed sequences larger than RAM are never materialized (same file as np.save).
+    """
+    out = np.lib.format.open_memmap(path, mode='w+', dtype=np.dtype(dtype or points.dtype), shape=tuple(points.shape))
+    for start in range(0, points.shape[0], BLOCK_FRAMES):
+        out[start:start + BLOCK_FRAMES] = points[start:start + BLOCK_FRAMES]
+    out.flush()
+    del out
+
+
+def _layers_digest(renderer):
+    """Hash of everything that changes the overlay pixels, used to detect stale segments."""
+    digest = hashlib.sha1(repr(renderer.trail_length).encode())
+    for layer in renderer.layers:
+        points = layer['points']
+        digest.update(repr((points.shape, np.dtype(points.dtype).str)).encode())
+        # 分段雜湊，memmap 或串流資料不會整段複製進記憶體
+        for start in range(0, points.shape[0], BLOCK_FRAMES):
+            digest.update(np.ascontiguousarray(points[start:start + BLOCK_FRAMES]).tobytes())
+        rest = {k: v for k, v in layer.items() if k != 'points'}
+        if rest.get('joint_indices') is not None:
+            rest['joint_indices'] = np.asarray(rest['joint_indices']).tolist()
+        if rest.get('valid_bits') is not None:
+            digest.update(np.ascontiguousarray(rest.pop('valid_bits')).tobytes())
+        digest.update(repr(sorted(rest.items())).encode())
+    return digest.hexdigest()
+
+
+def _prepare_segment_dir(work_dir, manifest):
+    """
+    Make work_dir ready for the segments described by manifest.
+    :return: True if an earlier run with the same manifest left segments to reuse.
+    """
+    manifest_path = os.path.join(work_dir, SEGMENT_MANIFEST)
+    manifest = json.loads(json.dumps(manifest))
+    if os.path.isfile(manifest_path):
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                if json.load(f) == manifest:
+                    return True
+        except (OSError, ValueError):
+            pass
+        print(f"Discarding segments from a different export in {work_dir}")
+    shutil.rmtree(work_dir, ignore_errors=True)
+    os.makedirs(work_dir)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return False
+
+
+def _render_overlay_segment(job):
+    """Seek to frame job['start'], draw the overlay on [start, end) and write one segment file (runs in a worker process)."""
+    layers = []
+    for layer in job['layers']:
+        layer = dict(layer)
+        layer['points'] = np.load(layer.pop('points_path'), mmap_mode='r')
+        layers.append(layer)
+    renderer = OverlayRenderer(layers, job['trail_length'])
+    width, height = job['size']
+    if job['video_path']:
+        frames = iter_video_frames(job['video_path'], job['start'], job['end'])
+    else:
+        frames = iter_black_frames(width, height, job['start'], job['end'])
+    # 先寫到暫存檔，完整寫完才改名，續傳時只看正式檔名是否存在
+    tmp_path = job['path'][:-len('.mp4')] + '.partial.mp4'
+    export_overlay_video(frames, renderer, tmp_path, job['fps'], (width, height), job['total_frames'], num_workers=1,
+                         encoder=job['encoder'])
+    os.replace(tmp_path, job['path'])
+    return job['path']
+
+
+def export_overlay_segments(video_path, renderer, output_path, fps, size, total_frames, num_segments=None,
+                            max_workers=None, progress_callback=None, is_canceled=None, encoder=None,
+                            frame_ranges=None):
+    """
+    Export the overlay video by splitting the frame ranges into segments that are decoded
+    (each worker seeks its own reader), drawn and encoded in separate processes, then joined
+    without re-encoding (see concat_videos).
+
+    Segments are kept in output_path + ".segments" until the final file is written, so
+    re-running the same export after a crash or cancel only renders the missing segments.
+
+    :param video_path: Source video, or None to draw on black frames.
+    :param renderer: overlay_drawing.OverlayRenderer snapshot.
+    :param output_path: Target .mp4 path.
+    :param fps: Output frame rate.
+    :param size: (width, height) of the frames.
+    :param total_frames: Frame count of the source (shown in the timer text).
+    :param num_segments: Segment count (defaults to 4 per worker process).
+    :param max_workers: Process pool size (defaults to the CPU count).
+    :param progress_callback: Called as progress_callback(done_segments, total_segments).
+    :param is_canceled: Optional callable returning True to abort.
+    :param encoder: Optional video_encoder.encoder_options dict; segments must share it for concat.
+    :param frame_ranges: (start, end) ranges to export back to back (defaults to the whole video).
+    :return: True on success, False if canceled.
+    """
+    workers = max_workers or os.cpu_count() or 1
+    ranges = split_frame_ranges(frame_ranges or [(0, total_frames)], num_segments or workers * 4)
+    work_dir = output_path + ".segments"
+    source = None
+    if video_path:
+        source = {'path': os.path.abspath(video_path), 'bytes': os.path.getsize(video_path),
+                  'mtime': os.path.getmtime(video_path)}
+    manifest = {
+        'source': source, 'fps': fps, 'size': list(size), 'total_frames': total_frames,
+        'ranges': ranges, 'overlay': _layers_digest(renderer), 'encoder': encoder,
+    }
+    resuming = _prepare_segment_dir(work_dir, manifest)
+
+    # 資料層寫成 .npy，子行程以 mmap 讀取
+    shared_layers = []
+    for i, layer in enumerate(renderer.layers):
+        points_path = os.path.join(work_dir, f"layer_{i}.npy")
+        _save_blockwise(points_path, layer['points'])
+        shared = {k: v for k, v in layer.items() if k != 'points'}
+        shared['points_path'] = points_path
+        shared_layers.append(shared)
+
+    jobs = []
+    for i, (start, end) in enumerate(ranges):
+        jobs.append({
+            'video_path': video_path, 'layers': shared_layers, 'trail_length': renderer.trail_length,
+            'fps': fps, 'size': tuple(size), 'total_frames': total_frames, 'start': start, 'end': end,
+            'encoder': encoder, 'path': os.path.join(work_dir, f"segment_{i:04d}.mp4"),
+        })
+    todo = [job for job in jobs if not os.path.isfile(job['path'])]
+    skipped = len(jobs) - len(todo)
+    if resuming:
+        print(f"Resuming export: {skipped} of {len(jobs)} segments already finished")
+    frame_count = sum(end - start for start, end in ranges)
+    print(f"Exporting overlay: {frame_count} frames in {len(jobs)} segments with {workers} processes")
+
+    def on_progress(done, _total):
+        if progress_callback is not None:
+            progress_callback(skipped + done, len(jobs))
+
+    if todo and not run_segment_jobs(_render_overlay_segment, todo, workers, on_progress, is_canceled):
+        print(f"Export canceled; finished segments are kept in {work_dir} and reused by the next export to {output_path}")
+        return False
+    concat_videos([job['path'] for job in jobs], output_path, encoder)
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return True
@@ -1,5 +1,6 @@
 import os
 import numpy as np
+from points_data import load_pixel_array
 from PyQt5.QtWidgets import QDialog, QVBoxLayout, QPushButton, QLabel, QFileDialog, QHBoxLayout
 
 class PixelFileDialog(QDialog):
@@ -60,23 +61,7 @@ class PixelData:
     def _load_pixel_file(path):
         if not path:
             return None
-        ext = os.path.splitext(path)[1].lower()
-        if ext == '.npy':
-            arr = np.load(path)
-        elif ext == '.csv':
-            import pandas as pd
-            df = pd.read_csv(path)
-            arr = df.values
-            num_cols = arr.shape[1]
-            if num_cols % 3 != 0:
-                raise ValueError(f"CSV file has {num_cols} columns, not a multiple of 3.")
-            num_joints = num_cols // 3
-            arr = arr.reshape(-1, num_joints, 3)
-        else:
-            raise ValueError(f"Unsupported file type: {ext}")
-        # Clean NaN to 0
-        arr = np.nan_to_num(arr, nan=0)
-        return arr
+        return load_pixel_array(path)
 
     def has_center(self):
         return self.center_data is not None
@@ -0,0 +1,308 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+# 3D 資料檔案的副檔名
+POINTS_EXTENSIONS = ('.npy', '.csv')
+# 背景載入時，累積多少個檔案或經過多少秒就交給 GUI 更新一次
+LOAD_BATCH_SIZE = 16
+LOAD_BATCH_INTERVAL = 0.5
+# CSV 解析結果的 float32 .npy 快取目錄 (可用環境變數 POINTS_CACHE_DIR 指定)
+POINTS_CACHE_DIR = os.environ.get('POINTS_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'projection_window', 'points'))
+
+
+def load_points_array(filename, mmap_mode='r', use_cache=True):
+    """
+    載入3D資料檔案 (NPY/CSV)，回傳 shape = (frames, joints, 3) 的 numpy array。
+    不依賴 Qt，可在背景執行緒或命令列工具中使用。
+    NPY 預設以唯讀記憶體映射開啟，只有實際讀到的幀才會載入記憶體；
+    CSV 第一次解析後寫入 float32 .npy 快取 (見 load_csv_cached)，之後直接映射快取。
+
+    :param filename: .npy 或 .csv 檔案路徑
+    :param mmap_mode: np.load 的 mmap_mode；None 表示整個讀入記憶體
+    :param use_cache: CSV 是否使用 .npy 快取
+    :return: numpy array (frames, joints, 3)
+    :raises ValueError: 檔案類型或資料形狀不符合時
+    """
+    file_extension = os.path.splitext(filename)[1].lower()
+
+    if file_extension == ".npy":
+        data = np.load(filename, mmap_mode=mmap_mode)
+        print(f"Loaded NPY data shape: {data.shape}")
+    elif file_extension == ".csv":
+        if use_cache:
+            data = load_csv_cached(filename, mmap_mode=mmap_mode)
+        else:
+            data = parse_points_csv(filename)
+        print(f"Loaded CSV data shape: {data.shape}")
+    else:
+        raise ValueError("Unsupported file type. Please select a .npy or .csv file.")
+
+    # 檢查載入的資料是否符合預期形狀 (frames, joints, 3)
+    if len(data.shape) != 3 or data.shape[2] != 3:
+        raise ValueError(f"Unexpected data shape: {data.shape}. Expected 3D array (frames, joints, 3) with 3 coordinates per joint.")
+    return data
+
+
+def parse_points_csv(filename):
+    """解析 3D 資料 CSV (每一行一幀，每三欄為一個關鍵點的 XYZ)，回傳 (frames, joints, 3)"""
+    # 根據之前查看的 extract_17_keypoint_from_csv.py 邏輯，
+    # 假設 CSV 檔案的格式是每一行代表一幀，每三個列代表一個關鍵點的XYZ座標
+    df = pd.read_csv(filename)
+    # 確保所有列都是數值類型，非數值的轉換為NaN
+    df = df.apply(pd.to_numeric, errors='coerce')
+
+    # 從列名中解析出關鍵點數量，例如 '0_x', '0_y', '0_z', '1_x', ...
+    num_cols = df.shape[1]
+    if num_cols % 3 != 0:
+        raise ValueError(f"CSV file has {num_cols} columns, which is not a multiple of 3. Expected (joints * 3).")
+    num_joints = num_cols // 3
+
+    # 將 DataFrame 重塑為 (frames, joints, 3)
+    # 注意：這裡需要確保df的順序是按照x,y,z順序排列
+    return df.values.reshape(-1, num_joints, 3)
+
+
+def _cache_paths(filename, cache_dir):
+    """(.npy, .json) 快取路徑，以來源檔案的絕對路徑雜湊命名"""
+    source = os.path.abspath(filename)
+    stem = os.path.splitext(os.path.basename(source))[0]
+    key = hashlib.sha1(source.encode('utf-8')).hexdigest()[:16]
+    base = os.path.join(cache_dir, f"{stem}_{key}")
+    return base + '.npy', base + '.json'
+
+
+def _source_signature(filename):
+    stat = os.stat(filename)
+    return {'source': os.path.abspath(filename), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _cache_is_valid(meta_path, signature):
+    try:
+        with open(meta_path) as f:
+            return json.load(f) == signature
+    except (OSError, ValueError):
+        return False
+
+
+def load_csv_cached(filename, mmap_mode='r', cache_dir=None):
+    """
+    Load a 3D CSV through a float32 .npy cache.
+    The cache is keyed by the CSV's absolute path and validated against its size and
+    mtime; a missing or stale entry is rebuilt from the CSV. When the cache directory is
+    not writable the parsed array is returned directly.
+
+    :param filename: CSV path.
+    :param mmap_mode: np.load mmap_mode for the cached array (None reads it fully).
+    :param cache_dir: Cache directory (defaults to POINTS_CACHE_DIR).
+    :return: float32 array (frames, joints, 3).
+    """
+    cache_dir = cache_dir or POINTS_CACHE_DIR
+    npy_path, meta_path = _cache_paths(filename, cache_dir)
+    signature = _source_signature(filename)
+    if _cache_is_valid(meta_path, signature):
+        try:
+            return np.load(npy_path, mmap_mode=mmap_mode)
+        except (OSError, ValueError):
+            pass
+    elif os.path.exists(meta_path):
+        print(f"Cache for {os.path.basename(filename)} is stale, rebuilding")
+
+    data = parse_points_csv(filename).astype(np.float32)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # 先寫入暫存檔再改名，並最後寫 .json，避免讀到寫到一半的快取
+        suffix = f".{os.getpid()}_{threading.get_ident()}.tmp"
+        with open(npy_path + suffix, 'wb') as f:
+            np.save(f, data)
+        os.replace(npy_path + suffix, npy_path)
+        with open(meta_path + suffix, 'w') as f:
+            json.dump(signature, f)
+        os.replace(meta_path + suffix, meta_path)
+    except OSError as e:
+        print(f"Cannot write CSV cache for {os.path.basename(filename)}: {e}")
+        return data
+    return np.load(npy_path, mmap_mode=mmap_mode)
+
+
+def clear_points_cache(cache_dir=None):
+    """
+    Delete every cached CSV array.
+
+    :return: (files removed, bytes freed). Files that cannot be removed (e.g. still mapped on Windows) are skipped.
+    """
+    cache_dir = cache_dir or POINTS_CACHE_DIR
+    removed, freed = 0, 0
+    if not os.path.isdir(cache_dir):
+        return removed, freed
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if not name.endswith(('.npy', '.json', '.tmp')) or not os.path.isfile(path):
+            continue
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError as e:
+            print(f"Cannot remove {path}: {e}")
+            continue
+        removed += 1
+        freed += size
+    return removed, freed
+
+
+def load_pixel_array(path):
+    """
+    載入 Pixel 2D 資料檔案 (NPY/CSV)，CSV 每三欄為一個關鍵點 (x, y, confidence)。
+    NaN 會轉成 0，與 GUI 顯示一致。不依賴 Qt。
+
+    :param path: .npy 或 .csv 檔案路徑
+    :return: numpy array (frames, joints, C)
+    :raises ValueError: 檔案類型或欄位數不符合時
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.npy':
+        arr = np.load(path)
+    elif ext == '.csv':
+        df = pd.read_csv(path)
+        arr = df.values
+        num_cols = arr.shape[1]
+        if num_cols % 3 != 0:
+            raise ValueError(f"CSV file has {num_cols} columns, not a multiple of 3.")
+        num_joints = num_cols // 3
+        arr = arr.reshape(-1, num_joints, 3)
+    else:
+        raise ValueError(f"Unsupported file type: {ext}")
+    # Clean NaN to 0
+    arr = np.nan_to_num(arr, nan=0)
+    return arr
+
+
+def read_npy_shape(path):
+    """Shape of a .npy array from its header only (the data is not read)."""
+    with open(path, 'rb') as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, _, _ = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, _, _ = np.lib.format.read_array_header_2_0(f)
+    return shape
+
+
+def _count_csv_rows(path):
+    """
+    Data rows of a CSV (non-blank lines after the header), counted without parsing.
+    Blank lines are skipped like pd.read_csv does; quoted newlines are not handled, so the
+    count is an estimate that _ensure_points_loaded corrects once the data is read.
+    """
+    lines = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            if line.strip(b'\r\n'):
+                lines += 1
+    return max(0, lines - 1)
+
+
+def read_points_metadata(filename, cache_dir=None):
+    """
+    讀取3D資料檔案的形狀而不載入資料：NPY 讀檔頭；CSV 有有效快取時讀快取檔頭，
+    否則以標頭欄位數與行數推算。
+
+    :param filename: .npy 或 .csv 檔案路徑
+    :return: dict with 'shape' (frames, joints, 3) and 'frame_count'
+    :raises ValueError: 檔案類型或資料形狀不符合時
+    """
+    file_extension = os.path.splitext(filename)[1].lower()
+    if file_extension == ".npy":
+        shape = read_npy_shape(filename)
+    elif file_extension == ".csv":
+        npy_path, meta_path = _cache_paths(filename, cache_dir or POINTS_CACHE_DIR)
+        if _cache_is_valid(meta_path, _source_signature(filename)):
+            shape = read_npy_shape(npy_path)
+        else:
+            with open(filename, 'r', errors='replace') as f:
+                header = next((line for line in f if line.strip('\r\n')), '')  # 與 pandas 相同，略過開頭空行
+                num_cols = len(header.split(','))
+            if num_cols % 3 != 0:
+                raise ValueError(f"CSV file has {num_cols} columns, which is not a multiple of 3. Expected (joints * 3).")
+            shape = (_count_csv_rows(filename), num_cols // 3, 3)
+    else:
+        raise ValueError("Unsupported file type. Please select a .npy or .csv file.")
+
+    if len(shape) != 3 or shape[2] != 3:
+        raise ValueError(f"Unexpected data shape: {shape}. Expected 3D array (frames, joints, 3) with 3 coordinates per joint.")
+    return {'shape': tuple(shape), 'frame_count': shape[0]}
+
+
+def find_data_files(folder_path, extensions=POINTS_EXTENSIONS):
+    """All files under folder_path (recursive) with one of the extensions, in sorted order."""
+    paths = []
+    for root, _, files in os.walk(folder_path):
+        for file in files:
+            if file.lower().endswith(extensions):
+                paths.append(os.path.join(root, file))
+    return sorted(paths)
+
+
+def load_files_parallel(paths, load_fn=load_points_array, max_workers=None, batch_callback=None,
+                        progress_callback=None, is_canceled=None,
+                        batch_size=LOAD_BATCH_SIZE, batch_interval=LOAD_BATCH_INTERVAL):
+    """
+    Load many files with a thread pool (np.load and the pandas CSV parser release the GIL for
+    most of their work) and hand the results over in input order, in batches.
+
+    :param paths: File paths to load.
+    :param load_fn: load_fn(path) -> data; exceptions are reported per file instead of aborting.
+    :param max_workers: Thread count (defaults to min(8, CPU count + 4)).
+    :param batch_callback: Called with a list of (path, data, error) tuples (data None on error)
+                           every batch_size files or batch_interval seconds.
+    :param progress_callback: Called as progress_callback(files_done).
+    :param is_canceled: Optional callable; when it returns True loading stops after the current files.
+    :return: Number of files handed over.
+    """
+    max_workers = max_workers or min(8, (os.cpu_count() or 1) + 4)
+    done = 0
+    batch = []
+    last_flush = time.perf_counter()
+
+    def flush():
+        nonlocal batch, last_flush
+        if batch and batch_callback is not None:
+            batch_callback(batch)
+        batch = []
+        last_flush = time.perf_counter()
+
+    def load(path):
+        try:
+            return path, load_fn(path), None
+        except Exception as e:
+            return path, None, e
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # 一次只送出有限數量的檔案，取消時不必等待整個資料夾
+        pending = []
+        remaining = iter(paths)
+        for path in remaining:
+            pending.append(pool.submit(load, path))
+            if len(pending) >= 2 * max_workers:
+                break
+        while pending:
+            if is_canceled is not None and is_canceled():
+                for future in pending:
+                    future.cancel()
+                break
+            batch.append(pending.pop(0).result())
+            next_path = next(remaining, None)
+            if next_path is not None:
+                pending.append(pool.submit(load, next_path))
+            done += 1
+            if progress_callback is not None:
+                progress_callback(done)
+            if len(batch) >= batch_size or time.perf_counter() - last_flush >= batch_interval:
+                flush()
+    flush()
+    return done
@@ -1,7 +1,14 @@
 import cv2
 import pandas as pd
 import os
+import sys
 import csv
+# 共用的影片編碼器位於專案根目錄
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+from video_encoder import VideoEncoder, encoder_options
+
+# 裁切影片的編碼設定 (有 ffmpeg 時使用，否則以 OpenCV mp4v 輸出)
+VIDEO_ENCODER = encoder_options()
 
 video_folder_map = {
 '01': '25.1.20_01',
@@ -21,19 +28,18 @@ video_folder_map = {
 '15': '25.1.21_15'
 }
 
-def crop_video(input_video_path: str, output_video_path: str, start_frame: int, end_frame: int):
-    """Use OpenCV to crop video."""
+def crop_video(input_video_path: str, output_video_path: str, start_frame: int, end_frame: int, encoder=None):
+    """Use OpenCV to read and the shared VideoEncoder to write the cropped video (encoder defaults to VIDEO_ENCODER)."""
     cap = cv2.VideoCapture(input_video_path)
     if not cap.isOpened():
         print(f"Error: Cannot open video file for cropping: {input_video_path}")
         return
 
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')  # Recommended: 'mp4v' or 'XVID'
     fps = cap.get(cv2.CAP_PROP_FPS)
     width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
 
-    out = cv2.VideoWriter(output_video_path, fourcc, fps, (width, height))
+    out = VideoEncoder(output_video_path, fps, (width, height), **(encoder or VIDEO_ENCODER))
     if not out.isOpened():
         print(f"Error: Cannot create output video file: {output_video_path}")
         cap.release()
@@ -3,7 +3,11 @@ import cv2
 import numpy as np
 import pandas as pd
 import re
+import sys
 import argparse
+# 共用的影片編碼器位於專案根目錄
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+from video_encoder import VideoEncoder, add_encoder_arguments, encoder_options_from_args
 
 # --- CONFIGURATION: point these to your folders + camera JSON ---
 def parse_args():
@@ -14,6 +18,7 @@ def parse_args():
                       help='museum/bowling/gallery/travel/boss/candy')
     parser.add_argument('--perspective', type=str, required=False,
                       help='C/L, default C')
+    add_encoder_arguments(parser)
     return parser.parse_args()
 
 args = parse_args()
@@ -150,8 +155,7 @@ for csv_name in sorted(os.listdir(csv_folder)):
     fps = cap.get(cv2.CAP_PROP_FPS)
     W   = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     H   = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(out_path, fourcc, fps, (W, H))
+    out = VideoEncoder(out_path, fps, (W, H), **encoder_options_from_args(args))
     print(f"       Video opened: {W}×{H}@{fps:.1f}fps → writing {out_path}")
 
     # project & write each frame
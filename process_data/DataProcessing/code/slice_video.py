@@ -1,6 +1,10 @@
 import cv2
 import os
+import sys
 import pandas as pd
+# 共用的影片編碼器位於專案根目錄
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+from video_encoder import VideoEncoder, encoder_options
 
 # --- CONFIGURATION ---
 video_code = '04'
@@ -17,6 +21,7 @@ sheet_video_map = {
     'Candy Shooter':   f'{video_code}_candy_{video_suffix}.mp4'
 }
 video_format = 'mp4'                     # File format
+encoder = encoder_options(codec='libx264', preset='veryfast', crf=23, threads=0)  # ffmpeg settings (OpenCV mp4v without ffmpeg)
 
 # --- SETUP ---
 for sheet_name, video_file in sheet_video_map.items():
@@ -30,7 +35,6 @@ for sheet_name, video_file in sheet_video_map.items():
     fps = cap.get(cv2.CAP_PROP_FPS)
     width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')  # Use 'XVID' for .avi if needed
 
     output_folder = os.path.join("./data/output", f"Clips_{video_file}") # output path
     os.makedirs(output_folder, exist_ok=True)
@@ -63,7 +67,7 @@ for sheet_name, video_file in sheet_video_map.items():
                     f"row{row_idx+1}_rep{rep}_frames_{start_frame}_{end_frame}.{video_format}"
                 )
 
-                out = cv2.VideoWriter(clip_filename, fourcc, fps, (width, height))
+                out = VideoEncoder(clip_filename, fps, (width, height), **encoder)
                 cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
 
                 for i in range(start_frame, end_frame + 1):
@@ -0,0 +1,65 @@
+import numpy as np
+
+# 每次投影的幀數上限，避免整段序列一次產生過大的 float64 暫存陣列
+PROJECTION_CHUNK_FRAMES = 4096
+
+
+def project_sequence(camera, points3d, chunk_frames=PROJECTION_CHUNK_FRAMES):
+    """
+    Project a whole 3D sequence [T, N, 3] to float32 pixel coordinates [T, N, 2].
+    NaN joints stay NaN so that callers can build validity masks from the result.
+    """
+    projected = np.empty(points3d.shape[:-1] + (2,), dtype=np.float32)
+    for start in range(0, points3d.shape[0], chunk_frames):
+        end = start + chunk_frames
+        projected[start:end] = camera.project(points3d[start:end])
+    return projected
+
+
+class ProjectionCache:
+    def __init__(self):
+        """
+        Whole-sequence 2D projections of 3D datasets for the current camera.
+        Entries are keyed by dataset and rebuilt automatically when the camera or the
+        underlying array changes, so per-frame drawing is a plain array slice.
+        """
+        self._camera = None
+        self._entries = {}  # key -> (points3d, projected)
+
+    def get(self, key, points3d, camera, project=project_sequence):
+        """
+        Return the cached [T, N, 2] projection of points3d through camera.
+
+        :param key: Hashable dataset key, e.g. ('points', file_index) or ('raw_mocap',).
+        :param points3d: 3D sequence [T, N, 3].
+        :param camera: CameraModel used for projection.
+        :param project: Called as project(camera, points3d) on a miss, e.g. to build a
+                        disk-backed projection of a sequence larger than RAM.
+        """
+        if camera is not self._camera:
+            self._entries.clear()
+            self._camera = camera
+        entry = self._entries.get(key)
+        if entry is None or entry[0] is not points3d:
+            entry = (points3d, project(camera, points3d))
+            self._entries[key] = entry
+        return entry[1]
+
+    def peek(self, key):
+        """Cached projection for key, or None (never computes one)."""
+        entry = self._entries.get(key)
+        return None if entry is None else entry[1]
+
+    def invalidate(self, key=None):
+        """Drop one entry, or every entry when key is None."""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def nbytes(self, key=None):
+        """Memory used by one cached projection, or by all of them when key is None."""
+        if key is None:
+            return sum(projected.nbytes for _, projected in self._entries.values())
+        entry = self._entries.get(key)
+        return 0 if entry is None else entry[1].nbytes
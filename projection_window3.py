@@ -9,42 +9,49 @@ from PyQt5.QtWidgets import (
     QFileDialog, QSlider, QSpinBox, QApplication, QMessageBox, QLineEdit, QGridLayout, QSizePolicy, QInputDialog, QMenuBar, QListWidget, QListWidgetItem, QCheckBox, QButtonGroup, QRadioButton
 )
 from PyQt5.QtGui import QImage, QPixmap, QGuiApplication
-from PyQt5.QtCore import Qt, QTimer, QCoreApplication
+from PyQt5.QtCore import Qt, QTimer, QCoreApplication, QEvent
 from video_player import VideoPlayer  
 from video_player_black import BlackVideoPlayer
 from mocap_data import RawMocapData
+from motive_csv import read_motive_positions
+from mocap_stream import StreamingRawMocapData, load_streaming_mocap, clear_mocap_stores, STREAMING_MIN_CSV_BYTES, MOCAP_STORE_DIR
 from pixel_data import PixelData, PixelFileDialog
+from camera_model import CameraModel, load_camera_models, score_candidate_extrinsics, format_candidate_scores
+from points_data import (
+    load_points_array, read_points_metadata, find_data_files, load_files_parallel, clear_points_cache, POINTS_CACHE_DIR
+)
+from projection_cache import ProjectionCache, project_sequence
+from memory_usage import format_bytes, is_memory_mapped, process_memory_bytes
+from memory_manager import MemoryManager
+from memory_panel import MemoryPanel
+from overlay_drawing import (
+    JOINT_PAIRS_MAP, DATASET_COLORS, PIXEL2D_COLOR, RAW_MOCAP_COLOR, OverlayRenderer, draw_points_and_skeleton, format_timestamp
+)
+from spatial_index import GridIndex
+from skeleton_view_3d import SkeletonView3D
+from parallel_export import export_3d_animation, export_overlay_segments
+from video_export import export_overlay_video, iter_range_frames
+from keypoint_export import export_keypoints
+from export_ranges import repetition_sheet_names, load_repetition_ranges, clip_ranges, range_output_path
+from background_task import BackgroundTask
+from video_encoder import encoder_options
+from encoder_settings_dialog import EncoderSettingsDialog
 
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 import matplotlib.pyplot as plt # Needed for initial Figure creation
 import datetime # Import datetime for timestamp
+import time
+import tempfile
+
+# 滑鼠點選關節的搜尋半徑 (螢幕像素)
+PICK_RADIUS_SCREEN_PX = 15
 
-# 定義關鍵點連接對，用於繪製骨架
-# 17 keypoints
-JOINT_PAIRS_17kp = [
-    (0, 1), (1, 2), (2, 3),
-    (0, 4), (4, 5), (5, 6),
-    (0, 7), (7, 8), (8, 9), (9, 10),
-    (8, 11), (11, 12), (12, 13),
-    (8, 14), (14, 15), (15, 16)
-]
-
-# 24 keypoints
-JOINT_PAIRS_24kp = [
-    (0, 1), (0, 2), (0, 3),  # 骨盆到髋部
-    (1, 4), (4, 7), (7, 10),  # 左腿
-    (2, 5), (5, 8), (8, 11),  # 右腿
-    (3, 6), (6, 9), (9, 12), (12, 15),  # 脊柱到头
-    (9, 13), (13, 16), (16, 18), (18, 20), (20, 22),  # 左臂
-    (9, 14), (14, 17), (17, 19), (19, 21), (21, 23)   # 右臂
-]
-
-# 骨架連接對的映射表
-JOINT_PAIRS_MAP = {
-    17: JOINT_PAIRS_17kp,
-    24: JOINT_PAIRS_24kp,
-}
+# 播放時 3D 面板的預設最高更新頻率 (Hz)
+DEFAULT_3D_PANEL_MAX_FPS = 10
+
+# 記憶體用量顯示的更新間隔 (毫秒)
+MEMORY_READOUT_INTERVAL_MS = 2000
 
 class ProjectionWindow3(QMainWindow):
     def __init__(self):
@@ -54,10 +61,9 @@ class ProjectionWindow3(QMainWindow):
         self.setFocusPolicy(Qt.StrongFocus)  # Added to capture key events
         self.setFocus()                       # Ensure window has focus
         self.player = None 
-        self.intrinsics = None
-        self.extrinsics = None
-        self.rvec = None
-        self.tvec = None
+        self.camera = None  # 當前使用的 CameraModel (K, dist, R, t, P 皆已預先計算)
+        self.camera_models = load_camera_models()  # 快取 data/ 中所有相機參數
+        self._pending_intrinsics = None  # 在外參之前載入的內參 (camera_matrix, 路徑)，載入外參時套用
         self.points3d = None
         self.frame_offset = 0
         self.points_frame_count = 0
@@ -76,12 +82,49 @@ class ProjectionWindow3(QMainWindow):
         self.raw_mocap_filename = ""
         self.raw_mocap_frame_count = 0
         self.show_raw_mocap_points = True # Control visibility of raw mocap points (and skeleton)
+        self.raw_mocap_lod_enabled = True # 縮小顯示時合併密集的原始 Mocap 點 (level of detail)
+        self._display_scale = 1.0 # 影片顯示縮放比例 (pixmap 寬 / 原始幀寬)
+        self._video_offset_x = 0
+        self._video_offset_y = 0
+
+        # 點選關節：每幀的空間索引 (滑鼠移到影片上時才建立) 與目前選取的關節
+        self._pick_index = None
+        self._pick_blocks = []
+        self.picked_joint = None  # (dataset key, joint index)
         
         # 添加多個3D資料檔案的支援
         self.loaded_points_files = []  # 存儲已加載的3D資料檔案資訊
         self.current_points_index = -1  # 當前選中的3D資料檔案索引
         self.visible_points_files = set()  # 存儲勾選顯示的檔案索引
         self.show_skeleton = True  # 控制是否顯示骨架連接線
+        self.projection_cache = ProjectionCache()  # 整段序列的2D投影快取
+        # 統計所有快取的記憶體，超過預算時釋放最久未使用且可重建的資料
+        self.memory_manager = MemoryManager()
+        self.memory_panel = None
+        self.memory_manager.register(
+            ('raw_mocap',), "Raw mocap", "Raw mocap data",
+            lambda: self.raw_mocap_data.resident_arrays() if self.raw_mocap_data is not None else [])
+        # 串流模式只保留播放位置附近的 chunk，釋放後會在需要時重新讀取
+        self.memory_manager.register(
+            ('raw_mocap_window',), "Raw mocap", "Streaming window",
+            lambda: self.raw_mocap_data.cached_chunks() if isinstance(self.raw_mocap_data, StreamingRawMocapData) else [],
+            lambda: self.raw_mocap_data.release_cache() if isinstance(self.raw_mocap_data, StreamingRawMocapData) else None)
+        self.memory_manager.register(
+            ('projection', 'raw_mocap'), "Projections", "Raw mocap",
+            lambda: [self.projection_cache.peek(('raw_mocap',))],
+            lambda: self.projection_cache.invalidate(('raw_mocap',)))
+        self.memory_manager.register(
+            ('video_frame',), "Video frames", "Decoded frame",
+            lambda: [getattr(self.player, 'cached_frame', None)], self._evict_cached_frame)
+        self.show_joint_trails = False  # 控制是否顯示關節軌跡
+        self.trail_length = 30  # 軌跡長度 (幀數)
+        self._export_task = None  # 背景執行中的影片匯出
+        self._load_task = None  # 背景執行中的資料夾載入
+        self.encoder_options = encoder_options()  # 匯出影片的編碼設定 (codec / preset / CRF / threads)
+        # 匯出範圍：入點/出點 (含) 或從 DataCollection Excel 匯入的多個範圍 (start, end_exclusive, label)
+        self.export_in_point = None
+        self.export_out_point = None
+        self.export_ranges = []
 
         # 添加 Pixel2D 数据相关
         self.loaded_pixel2d_files = []
@@ -102,19 +145,38 @@ class ProjectionWindow3(QMainWindow):
         self.figure_3d = Figure()
         self.ax_3d = self.figure_3d.add_subplot(111, projection='3d')
         self.canvas_3d = FigureCanvas(self.figure_3d)
+        self._init_3d_visualization_panel()
+        # 軟體渲染的 3D 檢視 (NumPy/OpenCV)，可取代 matplotlib 面板
+        self.skeleton_view_3d = SkeletonView3D()
+        self.use_software_3d_view = False
 
         self.init_ui()
         self.timer = QTimer()
         self.timer.timeout.connect(self.update_frame)
+
+        # 3D 面板節流：播放時以合併式 single-shot timer 限制更新頻率
+        self.panel_3d_max_fps = DEFAULT_3D_PANEL_MAX_FPS
+        self._3d_panel_pending_frame = None
+        self._3d_panel_last_update = 0.0
+        self._3d_panel_timer = QTimer()
+        self._3d_panel_timer.setSingleShot(True)
+        self._3d_panel_timer.timeout.connect(self._flush_3d_visualization_update)
+
+        # 定期更新記憶體用量 (播放時記憶體映射的頁面會陸續載入)
+        self.memory_timer = QTimer()
+        self.memory_timer.timeout.connect(self.update_memory_readout)
+        self.memory_timer.start(MEMORY_READOUT_INTERVAL_MS)
         
         # 初始化時自動加載內外參數
         self.update_camera_parameters()
         
         self.statusBar().showMessage(
-            "Shortcut: Space - Play/Pause, A - Prev Frame, D - Next Frame, Q - Back 1s, E - Forward 1s, W - Increase Offset, S - Decrease Offset, R - Locate Frame, F - Locate Time, Z - Copy Offset"
+            "Shortcut: Space - Play/Pause, A - Prev Frame, D - Next Frame, Q - Back 1s, E - Forward 1s, W - Increase Offset, S - Decrease Offset, R - Locate Frame, F - Locate Time, Z - Copy Offset, I/O - Export In/Out Point"
         )
         # Connect scroll event for debugging
         self.canvas_3d.mpl_connect('scroll_event', self.on_scroll)
+        # 每次完整重繪 (縮放、旋轉、改變大小) 後重新擷取 blitting 背景
+        self.canvas_3d.mpl_connect('draw_event', self._on_3d_canvas_draw)
 
     ########## UI Components ##########
     def init_ui(self):
@@ -143,6 +205,12 @@ class ProjectionWindow3(QMainWindow):
         self.raw_mocap_points_checkbox.setChecked(self.show_raw_mocap_points) # Initial state
         self.raw_mocap_points_checkbox.stateChanged.connect(self.on_raw_mocap_points_checkbox_changed)
         self.left_panel_layout.addWidget(self.raw_mocap_points_checkbox)
+
+        # 縮小顯示時的 level of detail
+        self.raw_mocap_lod_checkbox = QCheckBox("Cluster Dense Points When Zoomed Out")
+        self.raw_mocap_lod_checkbox.setChecked(self.raw_mocap_lod_enabled)
+        self.raw_mocap_lod_checkbox.stateChanged.connect(self.on_raw_mocap_lod_checkbox_changed)
+        self.left_panel_layout.addWidget(self.raw_mocap_lod_checkbox)
         
         # 新增原始 Mocap 點顯示模式選擇 Radio Buttons
         self.left_panel_layout.addWidget(self.radio_show_all_raw_mocap)
@@ -153,6 +221,8 @@ class ProjectionWindow3(QMainWindow):
         self.raw_mocap_display_mode_group.addButton(self.radio_show_custom_raw_mocap) # Add new radio button to group
         self.radio_show_all_raw_mocap.setChecked(True) # Default to 'Show All'
         self.raw_mocap_display_mode = 'all' # Initialize display mode
+        # 目前模式/勾選對應的 (joint 名稱, index array) 快取，模式或勾選改變時才重建
+        self._raw_mocap_selection = None
         self.raw_mocap_display_mode_group.buttonClicked.connect(self.on_raw_mocap_display_mode_changed)
 
         # 新增原始 Mocap 點列表
@@ -171,6 +241,12 @@ class ProjectionWindow3(QMainWindow):
         self.video_label.setMinimumSize(400, 300)
         self.video_label.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)  # Ensure full horizontal fill
         video_layout.addWidget(self.video_label)
+        self.video_label.setMouseTracking(True)
+        self.video_label.installEventFilter(self)
+        self.picked_joint_label = QLabel("")
+        self.picked_joint_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        self.picked_joint_label.hide()
+        video_layout.addWidget(self.picked_joint_label)
         self.info_label = QLabel(self.video_label) # 將 info_label 設置為 video_label 的子元件
         self.info_label.setAlignment(Qt.AlignLeft | Qt.AlignTop)
         self.info_label.setStyleSheet("background-color: rgba(0, 0, 0, 0.5); color: white; padding: 5px;")
@@ -185,6 +261,8 @@ class ProjectionWindow3(QMainWindow):
         #fixed_3d_viz_label.setStyleSheet("font-weight: bold; font-size: 13px;")
         #self.three_d_visualization_layout.addWidget(fixed_3d_viz_label)
         self.three_d_visualization_layout.addWidget(self.canvas_3d) # Add Matplotlib canvas
+        self.three_d_visualization_layout.addWidget(self.skeleton_view_3d)
+        self.skeleton_view_3d.hide()
         
         # 3D Data Files List (右側)
         self.right_panel_container_widget = QWidget() # 新增：用於控制右側面板顯示/隱藏的 QWidget
@@ -200,6 +278,11 @@ class ProjectionWindow3(QMainWindow):
         self.points_list.itemChanged.connect(self.on_points_checkbox_changed)
         self.points_list.itemDoubleClicked.connect(self.on_points_file_double_clicked)
         self.right_panel_container_layout.addWidget(self.points_list) # 將元件添加到新的佈局中
+
+        # 記憶體用量 (NPY 以記憶體映射開啟，只計算實際載入 RAM 的部分)
+        self.memory_label = QLabel("Memory: -")
+        self.memory_label.setWordWrap(True)
+        self.right_panel_container_layout.addWidget(self.memory_label)
         
         # 添加3D資料檔案的按鈕
         add_points_btn = QPushButton("Add 3D Data")
@@ -229,6 +312,20 @@ class ProjectionWindow3(QMainWindow):
         self.skeleton_checkbox.stateChanged.connect(self.on_skeleton_checkbox_changed)
         self.skeleton_checkbox.setMaximumWidth(250)
         self.right_panel_container_layout.addWidget(self.skeleton_checkbox) # 將元件添加到新的佈局中
+
+        # 關節軌跡顯示控制
+        trails_layout = QHBoxLayout()
+        self.trails_checkbox = QCheckBox("Show Joint Trails")
+        self.trails_checkbox.setChecked(self.show_joint_trails)
+        self.trails_checkbox.stateChanged.connect(self.on_trails_checkbox_changed)
+        self.trail_length_spin = QSpinBox()
+        self.trail_length_spin.setRange(2, 1000)
+        self.trail_length_spin.setValue(self.trail_length)
+        self.trail_length_spin.setSuffix(" frames")
+        self.trail_length_spin.valueChanged.connect(self.on_trail_length_changed)
+        trails_layout.addWidget(self.trails_checkbox)
+        trails_layout.addWidget(self.trail_length_spin)
+        self.right_panel_container_layout.addLayout(trails_layout)
         
         # 將視頻和3D資料列表添加到水平佈局
         content_layout.insertWidget(0, self.left_panel_container_widget, 1) # 左側佔1份空間
@@ -279,10 +376,15 @@ class ProjectionWindow3(QMainWindow):
         file_menu = menu_bar.addMenu("File")
         act_load_folder = file_menu.addAction("Load Folder (npy/csv)")
         act_load_raw_mocap = file_menu.addAction("Load Raw Mocap (csv)")
+        act_load_raw_mocap_streaming = file_menu.addAction("Load Raw Mocap (csv, streaming)")
         act_load_pixel = file_menu.addAction("Load Pixel (npy/csv)")
+        file_menu.addSeparator()
+        act_clear_cache = file_menu.addAction("Clear 3D Data Cache")
         act_load_folder.triggered.connect(self.load_folder)
-        act_load_raw_mocap.triggered.connect(self.load_raw_mocap_data)
+        act_load_raw_mocap.triggered.connect(lambda: self.load_raw_mocap_data())
+        act_load_raw_mocap_streaming.triggered.connect(lambda: self.load_raw_mocap_data(streaming=True))
         act_load_pixel.triggered.connect(self.load_pixel2d)
+        act_clear_cache.triggered.connect(self.clear_data_cache)
 
         # --- Add Locate controls ---
         go_menu   = menu_bar.addMenu("Go")
@@ -297,6 +399,8 @@ class ProjectionWindow3(QMainWindow):
         act_left = camera_menu.addAction("Switch Perspective (left)")
         act_middle.triggered.connect(self.update_camera_parameters)
         act_left.triggered.connect(self.update_camera_parameters_left)
+        act_eval_extrinsics = camera_menu.addAction("Evaluate Candidate Extrinsics")
+        act_eval_extrinsics.triggered.connect(self.evaluate_candidate_extrinsics)
 
         # Add video menu
         video_menu = menu_bar.addMenu("Video")
@@ -309,6 +413,24 @@ class ProjectionWindow3(QMainWindow):
         export_menu = menu_bar.addMenu("Export")
         act_export = export_menu.addAction("Export Video")
         act_export.triggered.connect(self.export_video)
+        act_export_segments = export_menu.addAction("Export Video (Parallel Segments)")
+        act_export_segments.triggered.connect(self.export_video_segments)
+        act_export_keypoints = export_menu.addAction("Export 2D Keypoints (NPY/NPZ)")
+        act_export_keypoints.triggered.connect(self.export_keypoints_2d)
+        act_export_3d_view = export_menu.addAction("Export 3D View Animation")
+        act_export_3d_view.triggered.connect(self.export_3d_view_animation)
+        export_menu.addSeparator()
+        act_in_point = export_menu.addAction("Set Export In Point (I)")
+        act_in_point.triggered.connect(self.set_export_in_point)
+        act_out_point = export_menu.addAction("Set Export Out Point (O)")
+        act_out_point.triggered.connect(self.set_export_out_point)
+        act_import_ranges = export_menu.addAction("Import Export Ranges from DataCollection Excel...")
+        act_import_ranges.triggered.connect(self.import_export_ranges)
+        act_clear_ranges = export_menu.addAction("Clear Export Ranges")
+        act_clear_ranges.triggered.connect(self.clear_export_ranges)
+        export_menu.addSeparator()
+        act_encoder_settings = export_menu.addAction("Encoder Settings...")
+        act_encoder_settings.triggered.connect(self.edit_encoder_settings)
         act_export_custom_joints = export_menu.addAction("Export Custom Joint List")
         act_export_custom_joints.triggered.connect(self.export_custom_joint_list)
 
@@ -334,6 +456,15 @@ class ProjectionWindow3(QMainWindow):
         self.action_toggle_video.triggered.connect(lambda: self.toggle_panel_visibility(self.video_panel_container_widget, self.action_toggle_video.isChecked())) # 更新為新的影片容器 Widget
         self.action_toggle_3d_mocap.triggered.connect(lambda: self.toggle_panel_visibility(self.three_d_visualization_container_widget, self.action_toggle_3d_mocap.isChecked()))
         self.action_toggle_3d_data.triggered.connect(lambda: self.toggle_panel_visibility(self.right_panel_container_widget, self.action_toggle_3d_data.isChecked()))
+        visibility_menu.addSeparator()
+        self.action_software_3d_view = visibility_menu.addAction("Fast 3D Viewer (All Datasets)")
+        self.action_software_3d_view.setCheckable(True)
+        self.action_software_3d_view.setChecked(self.use_software_3d_view)
+        self.action_software_3d_view.triggered.connect(self.set_software_3d_view)
+        act_3d_panel_rate = visibility_menu.addAction("3D Panel Update Rate...")
+        act_3d_panel_rate.triggered.connect(self.set_3d_panel_max_fps)
+        act_memory_panel = visibility_menu.addAction("Memory Usage...")
+        act_memory_panel.triggered.connect(self.show_memory_panel)
 
     def create_file_widgets(self, file_grid):
         # Simplified function to create all file loading buttons and labels
@@ -388,10 +519,17 @@ class ProjectionWindow3(QMainWindow):
             try:
                 with open(filename, 'r') as fp:
                     data = json.load(fp)
-                self.intrinsics = data
+                camera_matrix = np.asarray(data["camera_matrix"], dtype=np.float64).reshape(3, 3)
+                if self.camera is None:
+                    # 還沒有外參：先保留內參，載入外參時再建立相機
+                    self._pending_intrinsics = (camera_matrix, filename)
+                else:
+                    self.camera = self.camera.replace(camera_matrix=camera_matrix)
+                    self.camera.intrinsics_path = filename
                 self.loaded_intrinsics_filename = os.path.basename(filename)
                 print(f"Loaded Intrinsics from {filename}")
                 self.update_loaded_files_label()
+                self.update_frame()
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Failed to load intrinsics:\n{str(e)}")
 
@@ -402,15 +540,23 @@ class ProjectionWindow3(QMainWindow):
             try:
                 with open(filename, 'r') as fp:
                     data = json.load(fp)
-                self.extrinsics = data
-                best_ext = np.array(data["best_extrinsic"])
-                rotation_3x3 = best_ext[:, :3]
-                translation_vec = best_ext[:, 3].reshape(3,1)
-                self.rvec, _ = cv2.Rodrigues(rotation_3x3)
-                self.tvec = translation_vec
+                camera = CameraModel.from_json_data(None, data, name=os.path.basename(filename))
+                if self._pending_intrinsics is not None:
+                    # 套用先前載入的內參
+                    camera_matrix, intrinsics_path = self._pending_intrinsics
+                    camera = camera.replace(camera_matrix=camera_matrix)
+                    camera.intrinsics_path = intrinsics_path
+                    self._pending_intrinsics = None
+                elif self.camera is not None and self.camera.intrinsics_path:
+                    # 保留目前已載入的內參
+                    camera = camera.replace(camera_matrix=self.camera.K)
+                    camera.intrinsics_path = self.camera.intrinsics_path
+                camera.extrinsics_path = filename
+                self.camera = camera
                 self.loaded_extrinsics_filename = os.path.basename(filename)
                 print(f"Loaded Extrinsics from {filename}")
                 self.update_loaded_files_label()
+                self.update_frame()
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Failed to load extrinsics:\n{str(e)}")
     
@@ -474,94 +620,70 @@ class ProjectionWindow3(QMainWindow):
                 return
 
         try:
-            data = None
-            file_extension = os.path.splitext(filename)[1].lower()
-            
-            if file_extension == ".npy":
-                data = np.load(filename)
-                print(f"Loaded NPY data shape: {data.shape}")
-            elif file_extension == ".csv":
-                # 根據之前查看的 extract_17_keypoint_from_csv.py 邏輯，
-                # 假設 CSV 檔案的格式是每一行代表一幀，每三個列代表一個關鍵點的XYZ座標
-                df = pd.read_csv(filename)
-                # 確保所有列都是數值類型，非數值的轉換為NaN
-                df = df.apply(pd.to_numeric, errors='coerce')
-                
-                # 從列名中解析出關鍵點數量，例如 '0_x', '0_y', '0_z', '1_x', ...
-                # 假設列名格式為 "joint_idx_axis"
-                num_cols = df.shape[1]
-                if num_cols % 3 != 0:
-                    QMessageBox.critical(self, "Error", f"CSV file has {num_cols} columns, which is not a multiple of 3. Expected (joints * 3).")
-                    return
-                num_joints = num_cols // 3
-                
-                # 將 DataFrame 重塑為 (frames, joints, 3)
-                # 首先將所有XYZ座標合併成一個大的一維陣列，然後重塑
-                # 注意：這裡需要確保df的順序是按照x,y,z順序排列
-                data = df.values.reshape(-1, num_joints, 3)
-                print(f"Loaded CSV data shape: {data.shape}")
-            else:
-                QMessageBox.critical(self, "Error", "Unsupported file type. Please select a .npy or .csv file.")
-                return
-            
-            # 檢查載入的資料是否符合預期形狀 (frames, joints, 3)
-            if data is not None and len(data.shape) == 3 and data.shape[2] == 3:
-                frame_count = data.shape[0]
-                print(f"Number of frames: {frame_count}")
-
-                # 如果沒有載入視頻，或者新增file have larger total frame，則創建虛擬視頻播放器
-                if self.player is None or frame_count > self.max_frame_3d:
-                    self.max_frame_3d = frame_count
-                    if self.player is not None:
-                        self.player.release()
-                    print(f"Creating virtual black video with {self.max_frame_3d} frame")
-                    self.player = BlackVideoPlayer(frame_count=self.max_frame_3d)
-                    self.recent_video_filename = "Virtual Black Video"
-                    self.recent_video_path = "Virtual Black Video"
-                    self.update_loaded_files_label()
-                    
-                # 創建檔案資訊字典
-                file_info = {
-                    'filename': os.path.basename(filename),
-                    'full_path': filename,
-                    'data': data,
-                    'frame_count': frame_count,
-                    'color': self.get_next_color(len(self.loaded_points_files))  # 為每個檔案分配不同顏色
-                }
-                print(f"Assigning color {file_info['color']} to {file_info['filename']}")
-                
-                # 添加到已加載檔案列表
-                self.loaded_points_files.append(file_info)
-                
-                # 根據 is_visible_by_default 決定是否勾選新加載的檔案
-                if is_visible_by_default:
-                    self.visible_points_files.add(len(self.loaded_points_files) - 1)
-                
-                # 更新列表顯示
-                self.update_points_list()
-                
-                # 如果是第一個檔案，自動選中
-                if len(self.loaded_points_files) == 1:
-                    self.current_points_index = 0
-                    self.points3d = data
-                    self.points_frame_count = frame_count
-                    self.frame_offset = 0
-                    if hasattr(self, 'offset_spin'):
-                        self.offset_spin.setValue(0)
-
-                # QMessageBox.information(self, "Success", f"3D data loaded: {os.path.basename(filename)} ({frame_count} frames)")
-                self.update_loaded_files_label()
-                self.update_frame()
-                
-                # 載入3D資料後顯示右側面板
-                self.toggle_panel_visibility(self.right_panel_container_widget, True)
-                self.action_toggle_3d_data.setChecked(True)
-            else:
-                QMessageBox.critical(self, "Error", f"Unexpected data shape: {data.shape}. Expected 3D array (frames, joints, 3) with 3 coordinates per joint.")
-                
+            data = load_points_array(filename)
+            self._add_points_data(filename, data, is_visible_by_default)
+            # 更新列表顯示
+            self.update_points_list()
+            # QMessageBox.information(self, "Success", f"3D data loaded: {os.path.basename(filename)} ({data.shape[0]} frames)")
+            self.update_loaded_files_label()
+            self.update_frame()
+
+            # 載入3D資料後顯示右側面板
+            self.toggle_panel_visibility(self.right_panel_container_widget, True)
+            self.action_toggle_3d_data.setChecked(True)
+
+        except ValueError as e:
+            QMessageBox.critical(self, "Error", str(e))
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to load 3D data:\n{str(e)}")
-    
+
+    def _add_points_data(self, filename, data, is_visible_by_default, shape=None):
+        """
+        把3D資料加入多檔案列表 (不更新列表與畫面，由呼叫端負責)。
+        data 為 None 時只登記 shape (延遲載入)，第一次勾選時才讀取資料，見 _ensure_points_loaded。
+        """
+        shape = data.shape if data is not None else tuple(shape)
+        frame_count = shape[0]
+        print(f"Number of frames: {frame_count}")
+
+        # 如果沒有載入視頻，或者新增file have larger total frame，則創建虛擬視頻播放器
+        if self.player is None or frame_count > self.max_frame_3d:
+            self.max_frame_3d = frame_count
+            if self.player is not None:
+                self.player.release()
+            print(f"Creating virtual black video with {self.max_frame_3d} frame")
+            self.player = BlackVideoPlayer(frame_count=self.max_frame_3d)
+            self.recent_video_filename = "Virtual Black Video"
+            self.recent_video_path = "Virtual Black Video"
+
+        # 創建檔案資訊字典
+        file_info = {
+            'filename': os.path.basename(filename),
+            'full_path': filename,
+            'data': data,  # None = 尚未載入
+            'shape': shape,
+            'frame_count': frame_count,
+            'color': self.get_next_color(len(self.loaded_points_files))  # 為每個檔案分配不同顏色
+        }
+        print(f"Assigning color {file_info['color']} to {file_info['filename']}")
+
+        # 添加到已加載檔案列表
+        self.loaded_points_files.append(file_info)
+        self._register_points_memory(len(self.loaded_points_files) - 1)
+
+        # 根據 is_visible_by_default 決定是否勾選新加載的檔案
+        if is_visible_by_default:
+            self.visible_points_files.add(len(self.loaded_points_files) - 1)
+
+        # 如果是第一個檔案，自動選中
+        if len(self.loaded_points_files) == 1:
+            self.current_points_index = 0
+            self.points3d = data
+            self.points_frame_count = frame_count
+            self.frame_offset = 0
+            if hasattr(self, 'offset_spin'):
+                self.offset_spin.setValue(0)
+
     def load_pixel2d(self):
         dialog = PixelFileDialog(self)
         if dialog.exec_():
@@ -570,6 +692,8 @@ class ProjectionWindow3(QMainWindow):
             name = "Pixel_" + (os.path.basename(dialog.center_path) if dialog.center_path else os.path.basename(dialog.left_path))
             data = PixelData(name, center_path=dialog.center_path, left_path=dialog.left_path)
             self.loaded_pixel2d_files.append(data)
+            self.memory_manager.register(('pixel', len(self.loaded_pixel2d_files) - 1), "Pixel 2D", name,
+                                         lambda: [data.center_data, data.left_data])
             self.visible_pixel2d_files.add(len(self.loaded_pixel2d_files) - 1)
             self.update_pixel2d_list()
             self.update_frame()
@@ -578,24 +702,13 @@ class ProjectionWindow3(QMainWindow):
 
     def get_next_color(self, index):
         """為每個3D資料檔案分配不同的顏色"""
-        colors = [
-            (0, 0, 255),    # 紅色 (BGR)
-            (0, 255, 0),    # 綠色 (BGR)
-            (255, 0, 0),    # 藍色 (BGR)
-            (0, 255, 255),  # 黃色 (BGR)
-            (255, 0, 255),  # 洋紅色 (BGR)
-            (255, 255, 0),  # 青色 (BGR)
-            (128, 0, 128),  # 紫色 (BGR)
-            (0, 165, 255),  # 橙色 (BGR)
-            (0, 128, 0),    # 深綠色 (BGR)
-            (0, 0, 128),    # 深紅色 (BGR)
-        ]
-        assigned_color = colors[index % len(colors)]
+        assigned_color = DATASET_COLORS[index % len(DATASET_COLORS)]
         print(f"Getting color for index {index}: {assigned_color} (BGR)")
         return assigned_color
     
     def update_points_list(self):
         """更新3D資料檔案列表顯示"""
+        self.points_list.blockSignals(True)
         self.points_list.clear()
         for i, file_info in enumerate(self.loaded_points_files):
             item = QListWidgetItem()
@@ -608,14 +721,72 @@ class ProjectionWindow3(QMainWindow):
                 item.setCheckState(Qt.Unchecked)
             
             # 設定顯示文字
-            item_text = f"{file_info['filename']} ({file_info['frame_count']} frames)"
             '''
             if i == self.current_points_index:
                 item_text += " [Active]"
             '''
-            item.setText(item_text)
-            
             self.points_list.addItem(item)
+        self.points_list.blockSignals(False)
+        self.update_memory_readout()
+
+    def update_memory_readout(self):
+        """套用記憶體預算，並更新列表中每個3D資料檔案的常駐記憶體以及總記憶體用量"""
+        in_use = self._memory_in_use_keys()
+        self.memory_manager.touch(*in_use, ('video_frame',))
+        self.memory_manager.enforce(protected=in_use)
+
+        data_resident = 0
+        data_mapped = 0
+        self.points_list.blockSignals(True)  # 只改文字，不觸發勾選事件
+        for i, file_info in enumerate(self.loaded_points_files):
+            data = file_info['data']
+            if data is None:
+                item_text = f"{file_info['filename']} ({file_info['frame_count']} frames, not loaded)"
+            else:
+                resident = self.memory_manager.last_size(('points', i)) + self.memory_manager.last_size(('projection', 'points', i))
+                data_resident += resident
+                item_text = f"{file_info['filename']} ({file_info['frame_count']} frames, {format_bytes(resident)} in RAM"
+                if is_memory_mapped(data):
+                    data_mapped += data.nbytes
+                    item_text += f", {format_bytes(data.nbytes)} mapped"
+                item_text += ")"
+            item = self.points_list.item(i)
+            if item is not None and item.text() != item_text:
+                item.setText(item_text)
+        self.points_list.blockSignals(False)
+
+        tracked = sum(row['bytes'] for row in self.memory_manager.snapshot())
+        text = f"Memory: {format_bytes(tracked)} of {format_bytes(self.memory_manager.budget_bytes)} budget"
+        text += f" (3D data {format_bytes(data_resident)}"
+        if data_mapped:
+            text += f", {format_bytes(data_mapped)} mapped"
+        text += ")"
+        process_bytes = process_memory_bytes()
+        if process_bytes is not None:
+            text += f" | Process: {format_bytes(process_bytes)}"
+        self.memory_label.setText(text)
+        if self.memory_panel is not None and self.memory_panel.isVisible():
+            self.memory_panel.refresh()
+
+    def show_memory_panel(self):
+        """顯示記憶體用量面板 (各快取的常駐記憶體、預算設定)"""
+        if self.memory_panel is None:
+            self.memory_panel = MemoryPanel(self.memory_manager, self)
+            self.memory_panel.budget_changed.connect(self.set_memory_budget)
+            self.memory_panel.trim_requested.connect(self.free_unused_memory)
+        self.memory_panel.show()
+        self.memory_panel.raise_()
+        self.update_memory_readout()
+
+    def set_memory_budget(self, budget_mb):
+        self.memory_manager.budget_bytes = budget_mb * 1024 * 1024
+        print(f"Memory budget set to {budget_mb} MB")
+        self.update_memory_readout()
+
+    def free_unused_memory(self):
+        """立即釋放所有不在畫面上使用的可重建資料"""
+        self.memory_manager.enforce(protected=self._memory_in_use_keys(), budget_bytes=0)
+        self.update_memory_readout()
 
     def update_pixel2d_list(self):
         self.pixel2d_listwidget.clear()
@@ -635,11 +806,90 @@ class ProjectionWindow3(QMainWindow):
                 self.visible_pixel2d_files.discard(i)
             self.update_frame()
     
+    def _register_points_memory(self, index):
+        """向記憶體管理登記第 index 個3D資料檔案的資料與投影快取"""
+        file_info = self.loaded_points_files[index]
+        key = ('points', index)
+        self.memory_manager.register(key, "3D data", file_info['filename'],
+                                     lambda: [file_info['data']], lambda: self._evict_points_data(index))
+        self.memory_manager.register(('projection',) + key, "Projections", file_info['filename'],
+                                     lambda: [self.projection_cache.peek(key)],
+                                     lambda: self.projection_cache.invalidate(key))
+
+    def _evict_points_data(self, index):
+        """釋放3D資料 (下次使用時由 _ensure_points_loaded 從 mmap / CSV 快取重新載入)"""
+        file_info = self.loaded_points_files[index]
+        if self.points3d is file_info['data']:
+            self.points3d = None
+        file_info['data'] = None
+        self.projection_cache.invalidate(('points', index))
+
+    def _evict_cached_frame(self):
+        """丟棄已解碼的影格，需要時重新解碼"""
+        if hasattr(self.player, 'cached_frame'):
+            self.player.cached_frame = None
+
+    def _memory_in_use_keys(self):
+        """目前畫面使用中、不可釋放的資料"""
+        keys = set()
+        for index in self.visible_points_files:
+            keys.update({('points', index), ('projection', 'points', index)})
+        if 0 <= self.current_points_index < len(self.loaded_points_files):
+            keys.add(('points', self.current_points_index))
+        if self.raw_mocap_data is not None and self.show_raw_mocap_points:
+            keys.add(('projection', 'raw_mocap'))
+        return keys
+
+    def _update_max_frame_3d(self):
+        """依目前已登記的3D資料 (與真實影片) 重新計算 max_frame_3d，並調整虛擬影片的長度"""
+        counts = [file_info['frame_count'] for file_info in self.loaded_points_files] + [self.raw_mocap_frame_count]
+        if self.player is not None and not isinstance(self.player, BlackVideoPlayer):
+            counts.append(self.player.frame_count)
+        self.max_frame_3d = max(counts)
+        if isinstance(self.player, BlackVideoPlayer) and self.player.frame_count != self.max_frame_3d:
+            print(f"Resizing virtual black video to {self.max_frame_3d} frames")
+            self.player.frame_count = self.max_frame_3d
+            self.player.current_frame = min(self.player.current_frame, max(0, self.max_frame_3d - 1))
+
+    def _ensure_points_loaded(self, index):
+        """
+        回傳第 index 個3D資料檔案的資料，延遲載入的檔案在此時才讀取。
+        :raises ValueError / OSError: 讀取失敗時
+        """
+        file_info = self.loaded_points_files[index]
+        if file_info['data'] is None:
+            QApplication.setOverrideCursor(Qt.WaitCursor)
+            try:
+                data = load_points_array(file_info['full_path'])
+            finally:
+                QApplication.restoreOverrideCursor()
+            estimated_frames = file_info['frame_count']
+            file_info['data'] = data
+            file_info['shape'] = data.shape
+            file_info['frame_count'] = data.shape[0]
+            self.memory_manager.touch(('points', index))
+            if index == self.current_points_index:
+                self.points3d = data
+                self.points_frame_count = data.shape[0]
+            if data.shape[0] != estimated_frames:
+                # 檔頭估計的幀數與實際不同 (例如 CSV 中有引號內的換行)，重新計算總幀數
+                print(f"{file_info['filename']}: {data.shape[0]} frames (estimated {estimated_frames})")
+                self._update_max_frame_3d()
+        return file_info['data']
+
     def on_points_checkbox_changed(self, item):
         """當使用者勾選或取消勾選3D資料檔案時"""
         index = self.points_list.row(item)
         if 0 <= index < len(self.loaded_points_files):
             if item.checkState() == Qt.Checked:
+                try:
+                    self._ensure_points_loaded(index)
+                except Exception as e:
+                    QMessageBox.critical(self, "Error", f"Failed to load 3D data:\n{str(e)}")
+                    self.points_list.blockSignals(True)
+                    item.setCheckState(Qt.Unchecked)
+                    self.points_list.blockSignals(False)
+                    return
                 self.visible_points_files.add(index)
                 print(f"Enabled 3D data: {self.loaded_points_files[index]['filename']}")
             else:
@@ -648,6 +898,7 @@ class ProjectionWindow3(QMainWindow):
             
             # 立即更新幀顯示
             self.update_frame()
+            self.update_memory_readout()
 
     def on_points_file_double_clicked(self, item):
         """當使用者雙擊3D資料檔案時，切換為當前激活檔案"""
@@ -656,9 +907,14 @@ class ProjectionWindow3(QMainWindow):
 
         index = self.points_list.row(item)
         if 0 <= index < len(self.loaded_points_files):
+            try:
+                data = self._ensure_points_loaded(index)
+            except Exception as e:
+                QMessageBox.critical(self, "Error", f"Failed to load 3D data:\n{str(e)}")
+                return
             self.current_points_index = index
             file_info = self.loaded_points_files[index]
-            self.points3d = file_info['data']
+            self.points3d = data
             self.points_frame_count = file_info['frame_count']
             self.loaded_points_filename = file_info['filename']
             self.frame_offset = 0
@@ -686,7 +942,8 @@ class ProjectionWindow3(QMainWindow):
         # 更新原始 Mocap 資料的詳細資訊標籤
         if self.raw_mocap_data is not None:
             self.raw_mocap_file_details_label.setText(
-                f"{os.path.basename(self.raw_mocap_filename)} ({self.raw_mocap_frame_count} frames)"
+                f"{os.path.basename(self.raw_mocap_filename)} ({self.raw_mocap_frame_count} frames"
+                f"{', streaming' if isinstance(self.raw_mocap_data, StreamingRawMocapData) else ''})"
             )
         else:
             self.raw_mocap_file_details_label.setText("Not Loaded")
@@ -697,6 +954,7 @@ class ProjectionWindow3(QMainWindow):
             self.player.next_frame()
             if self.player.current_frame >= self.player.frame_count - 1:
                 self.player.is_playing = False
+                self.is_playing = False
                 self.btn_toggle.setText("Play")
                 self.timer.stop()
         
@@ -726,13 +984,14 @@ class ProjectionWindow3(QMainWindow):
         
         # Map 3D points onto the frame if available
         # Drawing primary 3D data (either raw mocap or currently selected from loaded_points_files)
-        if self.extrinsics is not None and (
+        if (self.camera is not None and (
             self.points3d is not None
             or self.visible_points_files
             or (self.raw_mocap_data is not None and self.show_raw_mocap_points)
-            or self.visible_pixel2d_files
-        ):  # Only draw if there's *any* data to draw
-            frame_bgr = self.draw_3d_points_and_skeleton(frame_bgr, self.player.current_frame, bgr=True)
+        )) or self.visible_pixel2d_files:  # Only draw if there's *any* data to draw (pixel 2D needs no camera)
+            frame_bgr = self.draw_3d_points_and_skeleton(frame_bgr, self.player.current_frame, bgr=True, display_scale=self._display_scale)
+            self.draw_picked_joint(frame_bgr, self.player.current_frame)
+        self._pick_index = None  # 畫面已更新，點選用的空間索引需重建
 
         # Convert processed frame back to RGB (if it was BGR, for QImage)
         # 虛擬視頻的frame_bgr已經是BGR，直接使用
@@ -766,6 +1025,7 @@ class ProjectionWindow3(QMainWindow):
         # Compute letterbox offsets (if needed later for click mapping, etc.)
         pixmap_width = self._cached_pixmap.width()
         pixmap_height = self._cached_pixmap.height()
+        self._display_scale = pixmap_width / w if w else 1.0
         label_width = self.video_label.width()
         label_height = self.video_label.height()
         self._video_offset_x = max(0, (label_width - pixmap_width) // 2)
@@ -785,8 +1045,8 @@ class ProjectionWindow3(QMainWindow):
         offset_y = self._video_offset_y + 10
         self.info_label.move(offset_x, offset_y)
 
-        # Update 3D visualization panel
-        self.update_3d_visualization_panel(self.player.current_frame)
+        # Update 3D visualization panel (只在可見時更新，播放時節流)
+        self.request_3d_visualization_update(self.player.current_frame)
 
     def change_offset(self, value):
         self.frame_offset = value
@@ -801,6 +1061,8 @@ class ProjectionWindow3(QMainWindow):
             self.btn_toggle.setText("Play")
             self.is_playing = False
             self.player.is_playing = False  # added: stop player playback
+            # 暫停時立即畫出最後一幀，確保 3D 面板與影片一致
+            self.request_3d_visualization_update(self.player.current_frame)
         else:
             if self.player.frame_count > 0: # 只有有幀數才允許播放
                 self.timer.start(1000 // int(self.player.fps))
@@ -835,10 +1097,7 @@ class ProjectionWindow3(QMainWindow):
             self.update_frame()
 
     def format_time(self, seconds):
-        hours = int(seconds // 3600)
-        minutes = int((seconds % 3600) // 60)
-        secs = int(seconds % 60)
-        return f"{hours:02}:{minutes:02}:{secs:02}"
+        return format_timestamp(seconds)
     
         # --- new helper ---
     def locate_frame(self):
@@ -906,108 +1165,144 @@ class ProjectionWindow3(QMainWindow):
             self.locate_time()
         elif event.key() == Qt.Key_Z:
             self.copy_offset()
+        elif event.key() == Qt.Key_I:
+            self.set_export_in_point()
+        elif event.key() == Qt.Key_O:
+            self.set_export_out_point()
         else:
             super().keyPressEvent(event)
 
     def closeEvent(self, event):
+        for task in (self._export_task, self._load_task):
+            if task is not None:
+                task.cancel()
+                task.wait()
         if self.player is not None:
             self.player.release()
         event.accept()
         
-    def _load_camera_parameters(self, intrinsics_path, extrinsics_path):
-        """載入指定的相機內外參數檔案"""
-        # 加載內參
-        if os.path.exists(intrinsics_path):
-            try:
-                with open(intrinsics_path, 'r') as fp:
-                    data = json.load(fp)
-                self.intrinsics = data
-                self.loaded_intrinsics_filename = os.path.basename(intrinsics_path)
-                print(f"Loaded Intrinsics from {intrinsics_path}")
-            except Exception as e:
-                print(f"Failed to load intrinsics: {str(e)}")
-                self.intrinsics = None
-                self.loaded_intrinsics_filename = ""
-        else:
-            print(f"Intrinsics file not found: {intrinsics_path}")
-            self.intrinsics = None
+    def _use_camera_model(self, name):
+        """切換到快取中指定名稱的相機參數 (不重新解析 JSON)"""
+        camera = self.camera_models.get(name)
+        self._pending_intrinsics = None
+        if camera is None:
+            print(f"Camera parameters not found for perspective: {name}")
+            self.camera = None
             self.loaded_intrinsics_filename = ""
-        
-        # 加載外參
-        if os.path.exists(extrinsics_path):
-            try:
-                with open(extrinsics_path, 'r') as fp:
-                    data = json.load(fp)
-                self.extrinsics = data
-                best_ext = np.array(data["best_extrinsic"])
-                rotation_3x3 = best_ext[:, :3]
-                translation_vec = best_ext[:, 3].reshape(3,1)
-                self.rvec, _ = cv2.Rodrigues(rotation_3x3)
-                self.tvec = translation_vec
-                self.loaded_extrinsics_filename = os.path.basename(extrinsics_path)
-                print(f"Loaded Extrinsics from {extrinsics_path}")
-            except Exception as e:
-                print(f"Failed to load extrinsics: {str(e)}")
-                self.extrinsics = None
-                self.rvec = None
-                self.tvec = None
-                self.loaded_extrinsics_filename = ""
-        else:
-            print(f"Extrinsics file not found: {extrinsics_path}")
-            self.extrinsics = None
-            self.rvec = None
-            self.tvec = None
             self.loaded_extrinsics_filename = ""
+        else:
+            self.camera = camera
+            self.loaded_intrinsics_filename = os.path.basename(camera.intrinsics_path) if camera.intrinsics_path else ""
+            self.loaded_extrinsics_filename = os.path.basename(camera.extrinsics_path) if camera.extrinsics_path else ""
+            print(f"Switched to camera '{name}'")
 
         # 更新UI顯示
         self.update_loaded_files_label()
         self.update_frame()
 
     def update_camera_parameters(self):
-        """更新相机内外参数 - 使用预设的绝对路径"""
-        intrinsics_path = "data/intrinsic_middle.json"
-        extrinsics_path = "data/extrinsics_middle.json"
+        """切換到middle視角的相機內外參數"""
         self.active_pixel2d_view = "center"
-        self._load_camera_parameters(intrinsics_path, extrinsics_path)
+        self._use_camera_model("middle")
 
-    
     def update_camera_parameters_left(self):
         """切換到left視角的相機內外參數"""
-        intrinsics_path = "data/intrinsic_left.json"
-        extrinsics_path = "data/extrinsics_left.json"
         self.active_pixel2d_view = "left"
-        self._load_camera_parameters(intrinsics_path, extrinsics_path)
+        self._use_camera_model("left")
+
+    def evaluate_candidate_extrinsics(self):
+        """用目前的3D資料與 Pixel 2D 資料評估校正檔中所有候選外參，並可直接切換"""
+        if self.camera is None or len(self.camera.candidate_extrinsics) == 0:
+            QMessageBox.warning(self, "Warning", "Current camera has no candidate extrinsics.")
+            return
+        if self.points3d is None and 0 <= self.current_points_index < len(self.loaded_points_files):
+            try:
+                self._ensure_points_loaded(self.current_points_index)
+            except Exception as e:
+                QMessageBox.critical(self, "Error", f"Failed to load 3D data:\n{str(e)}")
+                return
+        if self.points3d is None:
+            QMessageBox.warning(self, "Warning", "Please load 3D data first.")
+            return
+        pixel2d = None
+        for i in sorted(self.visible_pixel2d_files):
+            pixel2d = self.loaded_pixel2d_files[i].get(self.active_pixel2d_view)
+            if pixel2d is not None:
+                break
+        if pixel2d is None:
+            QMessageBox.warning(self, "Warning", f"Please load and show Pixel 2D data for the '{self.active_pixel2d_view}' view first.")
+            return
+
+        try:
+            mean_errors, matched = score_candidate_extrinsics(self.camera, self.points3d, pixel2d, self.frame_offset)
+        except ValueError as e:
+            QMessageBox.critical(self, "Error", str(e))
+            return
+
+        # 第一個選項回到 best_extrinsic，其餘依 clip error 由小到大排列
+        order = list(np.argsort(mean_errors))
+        items = ["best_extrinsic (calibration)"] + format_candidate_scores(self.camera, mean_errors)
+        print(f"Scored {len(mean_errors)} candidate extrinsics over {matched} matched points")
+        item, ok = QInputDialog.getItem(
+            self, "Candidate Extrinsics",
+            f"Mean reprojection error against Pixel 2D ({matched} points):",
+            items, 1, False
+        )
+        if not ok:
+            return
+        index = items.index(item)
+        candidate = None if index == 0 else int(order[index - 1])
+        self.camera = self.camera.with_candidate(candidate)
+        print(f"Using extrinsic: {'best_extrinsic' if candidate is None else f'candidate #{candidate}'}")
+        self.update_frame()
 
     def on_skeleton_checkbox_changed(self, state):
         self.show_skeleton = state == Qt.Checked
         self.update_frame()
 
-    def export_video(self):
+    def on_trails_checkbox_changed(self, state):
+        self.show_joint_trails = state == Qt.Checked
+        self.update_frame()
+
+    def on_trail_length_changed(self, value):
+        self.trail_length = value
+        self.update_frame()
+
+    def _prepare_video_export(self, title):
+        """
+        Collect the export source (video or virtual black frames) and ask for the output path.
+        :return: dict with video_path (None for the virtual video), fps, width, height,
+                 total_frames and save_path, or None if the export should not start.
+        """
         if not self.player or not self.recent_video_filename:
             QMessageBox.warning(self, "Warning", "Please load a video or 3D data first.")
-            return
+            return None
+        if self._export_task is not None:
+            QMessageBox.warning(self, "Warning", "A video export is already running.")
+            return None
         
         # 如果是虚拟视频，直接创建新的黑视频
         if isinstance(self.player, BlackVideoPlayer):
             video_name = "virtual_black_video"
+            video_path = None
             fps = self.player.fps
             width = self.player.width
             height = self.player.height
             total_frames = self.player.frame_count
-            is_virtual = True
         else:
             # 生成导出文件名
             video_name = self.recent_video_filename
+            video_path = self.loaded_video_path
             # 用cap读取原始帧，保证分辨率和像素排列不变
-            cap = cv2.VideoCapture(self.loaded_video_path)
+            cap = cv2.VideoCapture(video_path)
             if not cap.isOpened():
                 QMessageBox.warning(self, "Error", "Cannot open video file for export.")
-                return
+                return None
             fps = self.player.fps
             width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
             height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
             total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            is_virtual = False
+            cap.release()
 
         # 获取所有勾选的3D点文件名
         showing_files = [self.loaded_points_files[i]['filename'] for i in sorted(self.visible_points_files) if 0 <= i < len(self.loaded_points_files)]
@@ -1015,249 +1310,638 @@ class ProjectionWindow3(QMainWindow):
         skeleton_status = 'true' if self.show_skeleton else 'false'
         default_name = f"exported_{video_name}+{showing_files_str}+{skeleton_status}.mp4"
 
-        save_path, _ = QFileDialog.getSaveFileName(self, "Export Video", default_name, "MP4 Files (*.mp4)")
+        save_path, _ = QFileDialog.getSaveFileName(self, title, default_name, "MP4 Files (*.mp4)")
         if not save_path:
-            if not is_virtual: cap.release() # 如果是实际视频，退出前释放cap
+            return None
+
+        ranges = self._export_frame_ranges(total_frames)
+        if not ranges:
+            QMessageBox.warning(self, "Warning", "The export ranges contain no frames of this video.")
+            return None
+        per_range = False
+        if len(ranges) > 1:
+            answer = QMessageBox.question(
+                self, "Export Ranges",
+                f"{len(ranges)} export ranges.\nYes: write one file per range\nNo: write one concatenated file",
+                QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel, QMessageBox.Yes
+            )
+            if answer == QMessageBox.Cancel:
+                return None
+            per_range = answer == QMessageBox.Yes
+
+        # 每個輸出檔對應的 (路徑, [(start, end), ...])，只解碼範圍內的幀
+        if per_range:
+            outputs = [(range_output_path(save_path, label), [(start, end)]) for start, end, label in ranges]
+            target = f"{len(outputs)} files ({os.path.basename(outputs[0][0])}, ...)"
+        else:
+            outputs = [(save_path, [(start, end) for start, end, _ in ranges])]
+            target = save_path
+        frame_count = sum(end - start for start, end, _ in ranges)
+        print(f"Exporting: fps={fps}, width={width}, height={height}, total_frames={total_frames}, "
+              f"{frame_count} frames in {len(ranges)} range(s)")
+        return {
+            'video_path': video_path, 'fps': fps, 'width': width, 'height': height,
+            'total_frames': total_frames, 'save_path': save_path,
+            'outputs': outputs, 'frame_count': frame_count, 'target': target,
+        }
+
+    def _export_frame_ranges(self, total_frames):
+        """匯出範圍 [(start, end_exclusive, label)]：匯入的範圍優先，其次入點/出點，否則整段影片"""
+        if self.export_ranges:
+            return clip_ranges(self.export_ranges, total_frames)
+        if self.export_in_point is not None or self.export_out_point is not None:
+            start = self.export_in_point if self.export_in_point is not None else 0
+            end = self.export_out_point + 1 if self.export_out_point is not None else total_frames
+            return clip_ranges([(start, end, f"frames_{start}_{end - 1}")], total_frames)
+        return [(0, total_frames, "all")]
+
+    def _describe_export_ranges(self):
+        if self.export_ranges:
+            return f"Export ranges: {len(self.export_ranges)} imported"
+        start = self.export_in_point if self.export_in_point is not None else "start"
+        end = self.export_out_point if self.export_out_point is not None else "end"
+        return f"Export range: {start} - {end}"
+
+    def set_export_in_point(self):
+        """以目前幀作為匯出入點"""
+        if not self.player:
             return
+        self.export_in_point = self.player.current_frame
+        if self.export_out_point is not None and self.export_out_point < self.export_in_point:
+            self.export_out_point = None
+        self.export_ranges = []
+        self.statusBar().showMessage(self._describe_export_ranges())
+        print(self._describe_export_ranges())
+
+    def set_export_out_point(self):
+        """以目前幀作為匯出出點 (包含此幀)"""
+        if not self.player:
+            return
+        self.export_out_point = self.player.current_frame
+        if self.export_in_point is not None and self.export_in_point > self.export_out_point:
+            self.export_in_point = None
+        self.export_ranges = []
+        self.statusBar().showMessage(self._describe_export_ranges())
+        print(self._describe_export_ranges())
+
+    def clear_export_ranges(self):
+        self.export_in_point = None
+        self.export_out_point = None
+        self.export_ranges = []
+        self.statusBar().showMessage("Export range: whole video")
+
+    def import_export_ranges(self):
+        """從 DataCollection Excel 的 Repetition N Start/End 欄位匯入匯出範圍"""
+        excel_path, _ = QFileDialog.getOpenFileName(self, "Select DataCollection Excel", "", "Excel Files (*.xlsx *.xls)")
+        if not excel_path:
+            return
+        try:
+            sheets = repetition_sheet_names(excel_path)
+            sheet, ok = QInputDialog.getItem(self, "Select Sheet", "Game sheet:", sheets, 0, False)
+            if not ok:
+                return
+            ranges = load_repetition_ranges(excel_path, sheet)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to read export ranges:\n{str(e)}")
+            return
+        if not ranges:
+            QMessageBox.warning(self, "Warning", f"No Repetition Start/End values found in sheet '{sheet}'.")
+            return
+        self.export_ranges = ranges
+        self.statusBar().showMessage(self._describe_export_ranges())
+        print(f"Imported {len(ranges)} export ranges from {os.path.basename(excel_path)} [{sheet}]")
 
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(save_path, fourcc, fps, (width, height))
-
-        # print(f"Exporting: {self.recent_video_filename}")
-        print(f"Exporting: fps={fps}, width={width}, height={height}, total_frames={total_frames}")
-
-        progress = QProgressDialog("Exporting video...", "Cancel", 0, total_frames, self)
+    def _start_export_task(self, run_export, maximum, target):
+        """Run run_export(progress_callback, is_canceled) on a BackgroundTask with a progress dialog."""
+        progress = QProgressDialog("Exporting video...", "Cancel", 0, maximum, self)
         progress.setWindowModality(Qt.WindowModal)
         progress.setMinimumDuration(0)
+        progress.setAutoClose(False)
+        progress.setAutoReset(False)
         progress.setValue(0)
 
-        # 保存当前帧
-        original_frame = self.player.current_frame
-        was_playing = self.is_playing
-        self.is_playing = False
-        self.player.is_playing = False
+        task = BackgroundTask(run_export, self)
+        task.progress.connect(progress.setValue)
+        progress.canceled.connect(task.cancel)
 
-        for frame_idx in range(total_frames):
-            if is_virtual:
-                frame = np.zeros((height, width, 3), dtype=np.uint8) # 黑色背景
+        def on_finished(result):
+            canceled = task.is_canceled()  # 關閉進度視窗本身也會送出 canceled
+            progress.close()
+            if canceled:
+                print(f"Export canceled: {target}")
             else:
-                ret, frame = cap.read()
-                if not ret:
+                QMessageBox.information(self, "Export Finished", f"Video exported to {target}")
+
+        def on_failed(message):
+            progress.close()
+            QMessageBox.critical(self, "Error", f"Failed to export video:\n{message}")
+
+        def on_done():
+            self._export_task = None
+            task.deleteLater()
+
+        task.succeeded.connect(on_finished)
+        task.failed.connect(on_failed)
+        task.finished.connect(on_done)
+        self._export_task = task
+        task.start()
+
+    def export_video(self):
+        export = self._prepare_video_export("Export Video")
+        if export is None:
+            return
+
+        # 匯出在背景執行緒進行：讀取 → 多執行緒繪製 → 依序寫入
+        # 繪製狀態先做成快照，匯出期間 GUI 仍可操作而不影響輸出
+        renderer = self.build_overlay_renderer()
+        encoder = dict(self.encoder_options)
+        width, height, total_frames = export['width'], export['height'], export['total_frames']
+
+        def run_export(progress_callback, is_canceled):
+            written = 0
+            for path, frame_ranges in export['outputs']:
+                frames = iter_range_frames(export['video_path'], frame_ranges, width, height)
+                written += export_overlay_video(frames, renderer, path, export['fps'], (width, height), total_frames,
+                                                progress_callback=lambda n, base=written: progress_callback(base + n),
+                                                is_canceled=is_canceled, encoder=encoder)
+                if is_canceled():
                     break
-            
-            # frame 是 BGR 格式，直接在 frame 上绘制骨架
-            self.player.current_frame = frame_idx
-            frame_bgr = self.draw_3d_points_and_skeleton(frame, frame_idx, bgr=True)
-            # 画timer和帧号
-            current_time = frame_idx / fps
-            total_time = total_frames / fps
-            timer_text = f"{self.format_time(current_time)} / {self.format_time(total_time)}"
-            frame_text = f"Frame: {frame_idx} / {total_frames}"
-            cv2.putText(frame_bgr, timer_text, (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (255,255,255), 2)
-            cv2.putText(frame_bgr, frame_text, (20, 80), cv2.FONT_HERSHEY_SIMPLEX, 1, (255,255,255), 2)
-            
-            out.write(frame_bgr)
-            progress.setValue(frame_idx)
-            QCoreApplication.processEvents()
-            if progress.wasCanceled():
-                break
-        
-        if not is_virtual: cap.release()
-        out.release()
-        progress.close()
-        # 恢复 current_frame
-        self.player.current_frame = original_frame
-        self.update_frame()
-        self.is_playing = was_playing
-        self.player.is_playing = was_playing
-        QMessageBox.information(self, "Export Finished", f"Video exported to {save_path}")
-
-    def draw_points_and_skeleton_on_frame(self, frame_bgr, pts3d, color, draw_skeleton=True, NeedProjection=True):
-        """Helper function to draw points and skeleton for a given 3D points array and color"""
-        if self.rvec is not None and self.tvec is not None:
-            if self.intrinsics is not None:
-                cam_mtx = np.array(self.intrinsics["camera_matrix"])
+            return written
+
+        self._start_export_task(run_export, export['frame_count'], export['target'])
+
+    def export_video_segments(self):
+        """分段平行匯出：每個行程各自 seek 讀取、繪製並編碼一段，最後不重新編碼串接；中斷後重新匯出到同一路徑會略過已完成的分段"""
+        export = self._prepare_video_export("Export Video (Parallel Segments)")
+        if export is None:
+            return
+        renderer = self.build_overlay_renderer()
+        encoder = dict(self.encoder_options)
+
+        def run_export(progress_callback, is_canceled):
+            outputs = export['outputs']
+            for i, (path, frame_ranges) in enumerate(outputs):
+                def on_progress(done, total, i=i):
+                    progress_callback(int(100 * (i + done / total) / len(outputs)))
+                finished = export_overlay_segments(export['video_path'], renderer, path, export['fps'],
+                                                   (export['width'], export['height']), export['total_frames'],
+                                                   progress_callback=on_progress, is_canceled=is_canceled,
+                                                   encoder=encoder, frame_ranges=frame_ranges)
+                if not finished:
+                    return False
+            return True
+
+        self._start_export_task(run_export, 100, export['target'])
+
+    def export_keypoints_2d(self):
+        """匯出所有已載入 3D 資料的 2D 投影 (frames, joints, 2) 與可見遮罩，以影片幀號為索引"""
+        if self.camera is None:
+            QMessageBox.warning(self, "Warning", "Please load camera parameters first.")
+            return
+        datasets = []
+        for file_index, file_info in enumerate(self.loaded_points_files):
+            try:
+                points_data = self._ensure_points_loaded(file_index)
+            except Exception as e:
+                QMessageBox.critical(self, "Error", f"Failed to load {file_info['filename']}:\n{str(e)}")
+                return
+            datasets.append({
+                'name': file_info['filename'], 'points': points_data,
+                'projected': self.projection_cache.get(('points', file_index), points_data, self.camera),
+            })
+        streaming = isinstance(self.raw_mocap_data, StreamingRawMocapData)
+        if self.raw_mocap_data is not None:
+            names, joint_indices = self.get_current_raw_mocap_joint_indices()
+            if streaming:
+                # 串流資料在匯出時逐段讀取與投影，不建立整段的 3D/2D 陣列
+                points, projected = self.raw_mocap_data.frames(joint_indices), None
             else:
-                cam_mtx = np.array(self.extrinsics["camera_matrix"])
-            dcoeff_ex = np.array(self.extrinsics["dist_coeffs"])
-            
-            # Filter out NaN points before projection to avoid errors
-            valid_pts_mask = ~np.isnan(pts3d).any(axis=1)
-            valid_pts3d = pts3d[valid_pts_mask]
+                points = self.raw_mocap_data.data_array[:, joint_indices]
+                projected = self._raw_mocap_projection()[:, joint_indices]
+            datasets.append({
+                'name': f"raw_{os.path.basename(self.raw_mocap_filename)}", 'points': points,
+                'projected': projected, 'joint_names': names,
+            })
+        if not datasets:
+            QMessageBox.warning(self, "Warning", "No 3D data loaded.")
+            return
 
-            if valid_pts3d.shape[0] == 0: # If no valid points, return early
-                return frame_bgr
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        save_path, _ = QFileDialog.getSaveFileName(
+            self, "Export 2D Keypoints", f"keypoints2d_{self.camera.name}_{timestamp}.npz",
+            "NPZ Files (*.npz);;NPY Files (*.npy)"
+        )
+        if not save_path:
+            return
+        if os.path.splitext(save_path)[1].lower() not in ('.npz', '.npy'):
+            save_path += '.npz'
 
-            if NeedProjection:
-                projected, _ = cv2.projectPoints(valid_pts3d.reshape(-1, 1, 3), self.rvec, self.tvec, cam_mtx, dcoeff_ex)
-                projected = projected.squeeze().astype(int)
+        if self.player is not None:
+            size = (self.player.width, self.player.height) if isinstance(self.player, BlackVideoPlayer) else \
+                (int(self.player.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.player.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+            frame_count = self.player.frame_count
+        else:
+            size, frame_count = (1920, 1080), None
+        start = time.perf_counter()
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            if streaming:
+                # 輸出陣列暫存在輸出檔旁的資料夾 (memmap)，寫入完成後刪除
+                with tempfile.TemporaryDirectory(prefix="keypoints_", dir=os.path.dirname(os.path.abspath(save_path))) as work_dir:
+                    written = export_keypoints(save_path, datasets, self.camera, size, self.frame_offset, frame_count, work_dir)
             else:
-                projected = pts3d[:, :2]
-                projected = projected.astype(int)
-            
-            # 畫點
-            for pt in projected:
-                x, y = pt
-                if 0 <= x < frame_bgr.shape[1] and 0 <= y < frame_bgr.shape[0]:
-                    cv2.circle(frame_bgr, (x, y), 4, color, -1)
-            
-            # 畫骨架 (僅當 draw_skeleton 為 True 且 show_skeleton 勾選時)
-            if draw_skeleton and self.show_skeleton:
-                num_joints = pts3d.shape[0]
-                joint_pairs = JOINT_PAIRS_MAP.get(num_joints) # 從映射表中獲取骨架連接對
-                if joint_pairs:
-                    for joint_pair in joint_pairs:
-                        # Ensure both joints in the pair are valid (not NaN)
-                        if valid_pts_mask[joint_pair[0]] and valid_pts_mask[joint_pair[1]]:
-                            pt1 = projected[np.where(valid_pts_mask)[0] == joint_pair[0]][0] # Get projected index for original joint_pair[0]
-                            pt2 = projected[np.where(valid_pts_mask)[0] == joint_pair[1]][0] # Get projected index for original joint_pair[1]
-                            x1, y1 = pt1
-                            x2, y2 = pt2
-                            if (0 <= x1 < frame_bgr.shape[1] and 0 <= y1 < frame_bgr.shape[0] and
-                                0 <= x2 < frame_bgr.shape[1] and 0 <= y2 < frame_bgr.shape[0]):
-                                line_color = tuple(int(c * 0.7) for c in color) # Darker shade for lines
-                                cv2.line(frame_bgr, (x1, y1), (x2, y2), line_color, 2)
+                written = export_keypoints(save_path, datasets, self.camera, size, self.frame_offset, frame_count)
+        except Exception as e:
+            QApplication.restoreOverrideCursor()
+            QMessageBox.critical(self, "Error", f"Failed to export 2D keypoints:\n{str(e)}")
+            return
+        QApplication.restoreOverrideCursor()
+        print(f"Exported 2D keypoints of {len(datasets)} datasets in {time.perf_counter() - start:.2f}s: {written}")
+        QMessageBox.information(self, "Export Finished", "2D keypoints exported to:\n" + "\n".join(written))
+
+    def edit_encoder_settings(self):
+        """設定匯出影片的編碼器 (有 ffmpeg 時使用，否則以 OpenCV mp4v 匯出)"""
+        dialog = EncoderSettingsDialog(self.encoder_options, self)
+        if dialog.exec_() == dialog.Accepted:
+            self.encoder_options = dialog.options()
+            print(f"Encoder settings: {self.encoder_options}")
+
+    def export_3d_view_animation(self):
+        """以多行程離屏渲染匯出 3D 檢視動畫 (使用快速 3D 檢視的視角)"""
+        if not self.player:
+            QMessageBox.warning(self, "Warning", "Please load a video or 3D data first.")
+            return
+        datasets = []
+        for file_index in sorted(self.visible_points_files):
+            if 0 <= file_index < len(self.loaded_points_files):
+                file_info = self.loaded_points_files[file_index]
+                datasets.append({
+                    'points': file_info['data'],
+                    'color': file_info['color'],
+                    'joint_pairs': JOINT_PAIRS_MAP.get(file_info['data'].shape[1]) if self.show_skeleton else None,
+                })
+        if self.raw_mocap_data is not None and self.show_raw_mocap_points:
+            _, joint_indices = self.get_current_raw_mocap_joint_indices()
+            if isinstance(self.raw_mocap_data, StreamingRawMocapData):
+                # 串流資料以 joint 子集的檢視傳入，寫入暫存 .npy 時逐段讀取
+                points = self.raw_mocap_data.frames(joint_indices)
+            else:
+                points = self.raw_mocap_data.data_array[:, joint_indices]
+            datasets.append({'points': points, 'color': (255, 255, 255)})
+        if not datasets:
+            QMessageBox.warning(self, "Warning", "No visible 3D data to export.")
+            return
+
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        save_path, _ = QFileDialog.getSaveFileName(self, "Export 3D View Animation", f"exported_3d_view_{timestamp}.mp4", "MP4 Files (*.mp4)")
+        if not save_path:
+            return
+
+        progress = QProgressDialog("Exporting 3D view...", "Cancel", 0, 100, self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+        progress.setValue(0)
+
+        def on_progress(done, total):
+            progress.setMaximum(total)
+            progress.setValue(done)
+            QCoreApplication.processEvents()
+
+        try:
+            finished = export_3d_animation(
+                datasets, self.skeleton_view_3d.camera, self.player.frame_count, save_path,
+                fps=self.player.fps, frame_offset=self.frame_offset,
+                progress_callback=on_progress, is_canceled=progress.wasCanceled, encoder=self.encoder_options,
+            )
+        except Exception as e:
+            progress.close()
+            QMessageBox.critical(self, "Error", f"Failed to export 3D view:\n{str(e)}")
+            return
+        progress.close()
+        if finished:
+            QMessageBox.information(self, "Export Finished", f"3D view exported to {save_path}")
+
+    def draw_points_and_skeleton_on_frame(self, frame_bgr, pts3d, color, draw_skeleton=True, NeedProjection=True, lod_cell_size=1):
+        """Helper function to draw points and skeleton for a given 3D points array and color.
+        lod_cell_size > 1 clusters points closer than that many pixels (level of detail)."""
+        if self.camera is not None:
+            pts = self.camera.project(pts3d) if NeedProjection else pts3d
+            joint_pairs = JOINT_PAIRS_MAP.get(pts3d.shape[0]) if draw_skeleton and self.show_skeleton else None
+            draw_points_and_skeleton(frame_bgr, pts, color, joint_pairs, lod_cell_size)
         return frame_bgr
 
-    def draw_3d_points_and_skeleton(self, frame_bgr, frame_idx, bgr=False):
-        """在frame_bgr上繪製所有勾選的3D點和骨架，frame_idx為當前幀號。bgr=True表示frame_bgr已經是BGR格式。"""
+    def build_overlay_renderer(self, frame_idx=None):
+        """
+        Snapshot the current overlay settings (visible datasets, camera projection, offset,
+        skeleton and trail options) into an OverlayRenderer.
+        The snapshot only references cached arrays, so building one per frame is cheap and
+        it stays valid for a background export while the GUI keeps changing.
+
+        :param frame_idx: Video frame the renderer is built for. Streaming raw mocap then only
+                          projects the frames this frame draws (current frame and trail);
+                          None projects the whole sequence (exports).
+        """
+        layers = []
+        # 在 3D 資料前面先畫 pixel (不需要相機參數)
+        for i in self.visible_pixel2d_files:
+            arr = self.loaded_pixel2d_files[i].get(self.active_pixel2d_view)
+            if arr is not None:
+                layers.append({
+                    'points': arr, 'color': PIXEL2D_COLOR,
+                    'joint_pairs': JOINT_PAIRS_MAP.get(arr.shape[1]) if self.show_skeleton else None,
+                })
+        # 3D 資料需要相機參數才能投影
+        if self.camera is None:
+            return OverlayRenderer(layers, self.trail_length)
+
+        # 繪製所有勾選的 NPY/CSV 檔案 (使用整段序列的投影快取)
+        for file_index in self.visible_points_files:
+            if 0 <= file_index < len(self.loaded_points_files):
+                file_info = self.loaded_points_files[file_index]
+                points_data = file_info['data']
+                layers.append({
+                    'points': self.projection_cache.get(('points', file_index), points_data, self.camera),
+                    'color': file_info['color'], 'frame_offset': self.frame_offset,
+                    # 對於 NPY/CSV 檔案，根據 skeleton_checkbox 決定是否繪製骨架
+                    'joint_pairs': JOINT_PAIRS_MAP.get(points_data.shape[1]) if self.show_skeleton else None,
+                    'trails': self.show_joint_trails,
+                })
+
+        # 繪製原始 Mocap 資料 (如果已載入並勾選顯示)
+        if self.raw_mocap_data is not None and self.show_raw_mocap_points:
+            _, joint_indices = self.get_current_raw_mocap_joint_indices()
+            start = 0
+            if frame_idx is not None and isinstance(self.raw_mocap_data, StreamingRawMocapData):
+                current_idx = frame_idx + self.frame_offset
+                start = max(0, current_idx - self.trail_length + 1 if self.show_joint_trails else current_idx)
+                points = self._raw_mocap_projection(start, current_idx + 1)
+            else:
+                points = self._raw_mocap_projection()
+            layers.append({
+                'points': points,
+                'color': RAW_MOCAP_COLOR, 'frame_offset': self.frame_offset - start,
+                'joint_indices': joint_indices, 'trails': self.show_joint_trails,
+                'lod': self.raw_mocap_lod_enabled, 'valid_bits': self.raw_mocap_data.valid_bits[start:],
+            })
+        return OverlayRenderer(layers, self.trail_length)
+
+    def draw_3d_points_and_skeleton(self, frame_bgr, frame_idx, bgr=False, display_scale=1.0):
+        """在frame_bgr上繪製所有勾選的3D點和骨架，frame_idx為當前幀號。bgr=True表示frame_bgr已經是BGR格式。
+        display_scale < 1 表示畫面縮小顯示，原始 Mocap 點會依比例合併 (匯出時維持 1.0)。"""
         # 如果不是BGR格式，先轉BGR
         if not bgr:
             frame_bgr = cv2.cvtColor(frame_bgr, cv2.COLOR_RGB2BGR)
-        
-        # 在 draw_3d_points_and_skeleton 前面加上 pixel
-        for i in self.visible_pixel2d_files:
-            data = self.loaded_pixel2d_files[i]
-            arr = data.get(self.active_pixel2d_view)
-            if arr is not None and 0 <= frame_idx < arr.shape[0]:
-                pts2d = arr[frame_idx]
-                self.draw_points_and_skeleton_on_frame(frame_bgr, pts2d, (34, 139, 230), draw_skeleton=self.show_skeleton, NeedProjection=False)
-
-        if self.extrinsics is not None:
-            current_idx = frame_idx + self.frame_offset
-
-            # 繪製所有勾選的 NPY/CSV 檔案
-            for file_index in self.visible_points_files:
-                if 0 <= file_index < len(self.loaded_points_files):
-                    file_info = self.loaded_points_files[file_index]
-                    points_data = file_info['data']
-                    color = file_info['color']
-                    if 0 <= current_idx < points_data.shape[0]:
-                        pts3d = points_data[current_idx]
-                        # 對於 NPY/CSV 檔案，根據 skeleton_checkbox 決定是否繪製骨架
-                        self.draw_points_and_skeleton_on_frame(frame_bgr, pts3d, color, draw_skeleton=self.show_skeleton)
-            
-            # 繪製原始 Mocap 資料 (如果已載入並勾選顯示)
-            if self.raw_mocap_data is not None and self.show_raw_mocap_points:
-                if 0 <= current_idx < self.raw_mocap_frame_count:
-                    joint_names = self.get_current_raw_mocap_joint_names()
-                    pts3d_raw_mocap = self.raw_mocap_data.get_joints_by_names(current_idx, joint_names)
-                    self.draw_points_and_skeleton_on_frame(frame_bgr, pts3d_raw_mocap, (255, 255, 255), draw_skeleton=False)
+        return self.build_overlay_renderer(frame_idx).render(frame_bgr, frame_idx, display_scale)
 
-        return frame_bgr
+    def _raw_mocap_projection(self, start=None, end=None):
+        """
+        Projected raw mocap frames [start, end) as [frames, N, 2] (the whole sequence when start is None).
+        In-memory data slices the whole-sequence projection cache; streaming data only projects
+        the requested frames, and its whole-sequence projection (needed by exports) is written
+        chunk by chunk to a memory-mapped file in the store.
+        """
+        if start is None:
+            if not isinstance(self.raw_mocap_data, StreamingRawMocapData):
+                return self.projection_cache.get(('raw_mocap',), self.raw_mocap_data.data_array, self.camera)
+            QApplication.setOverrideCursor(Qt.WaitCursor)
+            try:
+                return self.projection_cache.get(('raw_mocap',), self.raw_mocap_data.data_array, self.camera,
+                                                 lambda camera, _: self.raw_mocap_data.project_to_file(camera))
+            finally:
+                QApplication.restoreOverrideCursor()
+        if isinstance(self.raw_mocap_data, StreamingRawMocapData):
+            return project_sequence(self.camera, self.raw_mocap_data.get_frames(start, end))
+        return self._raw_mocap_projection()[max(0, start):end]
 
     def load_folder(self):
-        """載入資料夾中的所有 NPY/CSV 檔案"""
+        """
+        在背景執行緒中平行登記資料夾中的所有 NPY/CSV 檔案，每一批更新一次列表與畫面。
+        只讀取檔頭，資料在第一次勾選時才載入。
+        """
+        if self._load_task is not None:
+            QMessageBox.warning(self, "Load Folder", "A folder is already being loaded.")
+            return
         folder_path = QFileDialog.getExistingDirectory(self, "Select 3D Data Folder")
         if not folder_path:
             return
+        paths = find_data_files(folder_path)
+        if not paths:
+            QMessageBox.information(self, "Load Folder", f"No 3D data files found in {os.path.basename(folder_path)}.")
+            return
 
-        loaded_count = 0
-        for root, _, files in os.walk(folder_path):
-            for file in files:
-                file_path = os.path.join(root, file)
-                if file.lower().endswith(('.npy', '.csv')):
-                    # 透過 load_folder 載入的檔案預設為不可見
-                    self.load_points(filename=file_path, is_visible_by_default=False)
-                    loaded_count += 1
-        
-        QMessageBox.information(self, "Load Folder", f"Finished loading {loaded_count} 3D data files from {os.path.basename(folder_path)}.")
-        self.update_points_list() # 確保列表是最新的
-        self.update_frame()
+        progress = QProgressDialog(f"Loading {len(paths)} files...", "Cancel", 0, len(paths), self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+        progress.setAutoClose(False)
+        progress.setAutoReset(False)
+        progress.setValue(0)
 
-    def load_raw_mocap_data(self):
+        loaded = []
+        failed = []
+
+        def run_load(progress_callback, is_canceled):
+            # 只讀取檔頭 (形狀與幀數)，資料在第一次勾選時才載入
+            return load_files_parallel(paths, load_fn=read_points_metadata, batch_callback=task.partial_result.emit,
+                                       progress_callback=progress_callback, is_canceled=is_canceled)
+
+        def on_batch(batch):
+            # 在 GUI 執行緒中加入一批檔案；透過 load_folder 載入的檔案預設為不可見
+            for path, metadata, error in batch:
+                if error is not None:
+                    print(f"Failed to load {path}: {error}")
+                    failed.append(os.path.basename(path))
+                    continue
+                self._add_points_data(path, None, is_visible_by_default=False, shape=metadata['shape'])
+                loaded.append(path)
+            self.update_points_list()
+            self.update_loaded_files_label()
+            self.update_frame()
+            if loaded:
+                self.toggle_panel_visibility(self.right_panel_container_widget, True)
+                self.action_toggle_3d_data.setChecked(True)
+
+        def on_finished(result):
+            canceled = task.is_canceled()  # 關閉進度視窗本身也會送出 canceled
+            progress.close()
+            message = f"Finished loading {len(loaded)} 3D data files from {os.path.basename(folder_path)}."
+            if canceled:
+                message = f"Loading canceled: {len(loaded)} of {len(paths)} files loaded from {os.path.basename(folder_path)}."
+            if failed:
+                message += f"\n\nFailed to load {len(failed)} files:\n" + "\n".join(failed[:10])
+                if len(failed) > 10:
+                    message += "\n..."
+            QMessageBox.information(self, "Load Folder", message)
+
+        def on_failed(message):
+            progress.close()
+            QMessageBox.critical(self, "Error", f"Failed to load folder:\n{message}")
+
+        def on_done():
+            self._load_task = None
+            task.deleteLater()
+
+        task = BackgroundTask(run_load, self)
+        task.progress.connect(progress.setValue)
+        task.partial_result.connect(on_batch)
+        progress.canceled.connect(task.cancel)
+        task.succeeded.connect(on_finished)
+        task.failed.connect(on_failed)
+        task.finished.connect(on_done)
+        self._load_task = task
+        task.start()
+
+    def clear_data_cache(self):
+        """刪除 CSV 解析結果的 .npy 快取與 raw mocap 串流資料 (下次開啟 CSV 時會重新解析)，目前開啟的串流資料保留"""
+        reply = QMessageBox.question(self, "Clear 3D Data Cache",
+                                     f"Delete all cached CSV arrays in\n{POINTS_CACHE_DIR}\n"
+                                     f"and raw mocap streaming stores in\n{MOCAP_STORE_DIR}?",
+                                     QMessageBox.Yes | QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+        removed, freed = clear_points_cache()
+        keep = [self.raw_mocap_data.store_path] if isinstance(self.raw_mocap_data, StreamingRawMocapData) else []
+        removed_stores, freed_stores = clear_mocap_stores(keep=keep)
+        QMessageBox.information(self, "Clear 3D Data Cache",
+                                f"Removed {removed} cache files and {removed_stores} streaming stores "
+                                f"({format_bytes(freed + freed_stores)}).")
+
+    def load_raw_mocap_data(self, streaming=None):
         """
         載入原始 mocap CSV 檔案，遵循舊版 projection_window.py 的邏輯。
         將資料載入到 self.raw_mocap_data (RawMocapData 物件)。
+
+        :param streaming: True 以串流模式載入 (見 mocap_stream.py)，None 表示檔案大於
+                          STREAMING_MIN_CSV_BYTES 時自動使用串流模式
         """
         filename, _ = QFileDialog.getOpenFileName(self, "Select Raw Mocap CSV", "", "CSV Files (*.csv)")
         if filename:
+            if streaming is None:
+                streaming = os.path.getsize(filename) >= STREAMING_MIN_CSV_BYTES
+            if streaming:
+                self._load_raw_mocap_streaming(filename)
+                return
             try:                
-                # 讀取整個 CSV 檔案來處理多行標頭
-                # 第三行 (索引2) 包含 Type (Bone, Time etc.)
-                # 第四行 (索引3) 包含 Name (Skeleton 001:Hip, Time (Seconds) etc.)
-                # 第五行 (索引4) 包含 ID (1, etc.)
-                # 第六行 (索引5) 包含 Rotation, Position
-                # 第七行（索引6）包含Axis(X/Y/Z)
-                raw_df = pd.read_csv(filename, header=[1, 2, 3, 4, 5], low_memory=False)
-                # === 2) 只保留 Position 的 X/Y/Z ===
-                pos = raw_df.xs("Position", level=3, axis=1)   # 取出 Axis == 'Position'
-                # === 3) 把欄位重新命名成   f"{ID}:{Name}({Type})_<axis>" ===
-                new_cols = []
-                for col in pos.columns:
-                    Type, Name, ID, axis = col         # 依序對應多層索引
-                    joint = f"{ID}:{Name}({Type})"
-                    new_cols.append(f"{joint}_{axis}") # 例如  '1:Skeleton 001:Hip(Bone)_X'
-                pos.columns = new_cols
-                
-                type_list = list(pos.iloc[0].index)
-                self.raw_mocap_data = RawMocapData(pos, type_list)
-                self.left_panel_container_widget.show() # Make the left panel visible
+                # Motive CSV 的多行標頭 (Type / Name / ID / Rotation,Position / Axis) 只解析一次，
+                # 數值部分只讀取 Position 的 X/Y/Z 欄位，直接轉成 float32 (見 motive_csv.py)
+                # 欄位名稱為 f"{ID}:{Name}({Type})_<axis>"，例如 '1:Skeleton 001:Hip(Bone)_X'
+                column_names, positions = read_motive_positions(filename)
+                pos = pd.DataFrame(positions, columns=column_names, copy=False)
+
+                type_list = column_names
+                self._set_raw_mocap_data(RawMocapData(pos, type_list), filename)
+            except Exception as e:
+                QMessageBox.critical(self, "Error", f"Failed to load Raw Mocap data: {str(e)}")
+
+    def _load_raw_mocap_streaming(self, filename):
+        """
+        在背景執行緒中把 Motive CSV 轉換成分塊的磁碟資料 (只在第一次或檔案變更時)，
+        完成後以 StreamingRawMocapData 載入，記憶體中只保留播放位置附近的幀。
+        """
+        if self._load_task is not None:
+            QMessageBox.warning(self, "Load Raw Mocap", "Another file is already being loaded.")
+            return
+        progress = QProgressDialog(f"Converting {os.path.basename(filename)} for streaming...", "Cancel", 0, 100, self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+        progress.setAutoClose(False)
+        progress.setAutoReset(False)
+        progress.setValue(0)
+        # 目前開啟的串流資料不可在轉換後被刪除
+        keep = [self.raw_mocap_data.store_path] if isinstance(self.raw_mocap_data, StreamingRawMocapData) else []
+
+        def run_load(progress_callback, is_canceled):
+            return load_streaming_mocap(filename, progress_callback=progress_callback, is_canceled=is_canceled, keep=keep)
+
+        def on_loaded(data):
+            progress.close()
+            if data is None:
+                print(f"Streaming conversion of {filename} canceled")
+                return
+            try:
+                self._set_raw_mocap_data(data, filename)
+            except Exception as e:
+                QMessageBox.critical(self, "Error", f"Failed to load Raw Mocap data: {str(e)}")
+
+        def on_failed(message):
+            progress.close()
+            QMessageBox.critical(self, "Error", f"Failed to load Raw Mocap data: {message}")
+
+        def on_done():
+            self._load_task = None
+            task.deleteLater()
+
+        task = BackgroundTask(run_load, self)
+        task.progress.connect(progress.setValue)
+        progress.canceled.connect(task.cancel)
+        task.succeeded.connect(on_loaded)
+        task.failed.connect(on_failed)
+        task.finished.connect(on_done)
+        self._load_task = task
+        task.start()
+
+    def _set_raw_mocap_data(self, data, filename):
+        """Show newly loaded raw mocap data (RawMocapData or StreamingRawMocapData) in the GUI."""
+        if isinstance(self.raw_mocap_data, StreamingRawMocapData):
+            self.raw_mocap_data.close()  # 停止舊資料的預讀執行緒
+        self.raw_mocap_data = data
+        self.projection_cache.invalidate(('raw_mocap',))  # 舊資料的整段投影不再需要
+        self.left_panel_container_widget.show() # Make the left panel visible
                 
-                joint_names = self.raw_mocap_data.get_joint_names()
-                self.raw_mocap_joint_list.clear() # Clear existing items
+        joint_names = self.raw_mocap_data.get_joint_names()
+        self.raw_mocap_joint_list.clear() # Clear existing items
                 
-                # Block signals temporarily to prevent on_raw_mocap_joint_checkbox_changed from firing
-                self.raw_mocap_joint_list.blockSignals(True) 
+        # Block signals temporarily to prevent on_raw_mocap_joint_checkbox_changed from firing
+        self.raw_mocap_joint_list.blockSignals(True) 
                 
-                # Determine initial checked state based on the currently active radio button
-                # If Custom mode is active, default to Skeleton 001 for initial load
-                for name in joint_names:
-                    item = QListWidgetItem(name)
-                    item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
-                    if "Skeleton 001" in name:
-                        item.setCheckState(Qt.Checked)
-                    else:
-                        item.setCheckState(Qt.Unchecked)
-                    self.raw_mocap_joint_list.addItem(item)
+        # Determine initial checked state based on the currently active radio button
+        # If Custom mode is active, default to Skeleton 001 for initial load
+        for name in joint_names:
+            item = QListWidgetItem(name)
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            if "Skeleton 001" in name:
+                item.setCheckState(Qt.Checked)
+            else:
+                item.setCheckState(Qt.Unchecked)
+            self.raw_mocap_joint_list.addItem(item)
                 
-                self.raw_mocap_joint_list.blockSignals(False) # Re-enable signals
+        self.raw_mocap_joint_list.blockSignals(False) # Re-enable signals
 
-                self.raw_mocap_filename = filename
-                self.raw_mocap_frame_count = self.raw_mocap_data.get_total_frame()
+        self.raw_mocap_filename = filename
+        self.raw_mocap_frame_count = self.raw_mocap_data.get_total_frame()
                 
-                if self.raw_mocap_frame_count > self.max_frame_3d:
-                    self.max_frame_3d = self.raw_mocap_frame_count
-                # 如果沒有載入視頻，或者正在使用虛擬視頻播放器，則創建新虛擬視頻播放器
-                if self.player is None or isinstance(self.player, BlackVideoPlayer):
-                    self.max_frame_3d = self.raw_mocap_frame_count
-                    if self.player is not None:
-                        self.player.release()
-                    print(f"Creating virtual black video with {self.max_frame_3d} frame for raw mocap data")
-                    self.player = BlackVideoPlayer(frame_count=self.max_frame_3d)
-                    self.recent_video_filename = "Virtual Black Video (Raw Mocap)"
-                    self.recent_video_path = "Virtual Black Video (Raw Mocap)"
+        if self.raw_mocap_frame_count > self.max_frame_3d:
+            self.max_frame_3d = self.raw_mocap_frame_count
+        # 如果沒有載入視頻，或者正在使用虛擬視頻播放器，則創建新虛擬視頻播放器
+        if self.player is None or isinstance(self.player, BlackVideoPlayer):
+            self.max_frame_3d = self.raw_mocap_frame_count
+            if self.player is not None:
+                self.player.release()
+            print(f"Creating virtual black video with {self.max_frame_3d} frame for raw mocap data")
+            self.player = BlackVideoPlayer(frame_count=self.max_frame_3d)
+            self.recent_video_filename = "Virtual Black Video (Raw Mocap)"
+            self.recent_video_path = "Virtual Black Video (Raw Mocap)"
 
-                self.update_loaded_files_label()
-                self.update_frame()
-                # Toggle visibility of Joint - Mocap and 3D - Mocap panels when loaded
-                self.toggle_panel_visibility(self.left_panel_container_widget, True)
-                self.action_toggle_joint_mocap.setChecked(True)
-                self.toggle_panel_visibility(self.three_d_visualization_container_widget, True)
-                self.action_toggle_3d_mocap.setChecked(True)
+        self.update_loaded_files_label()
+        self.update_frame()
+        # Toggle visibility of Joint - Mocap and 3D - Mocap panels when loaded
+        self.toggle_panel_visibility(self.left_panel_container_widget, True)
+        self.action_toggle_joint_mocap.setChecked(True)
+        self.toggle_panel_visibility(self.three_d_visualization_container_widget, True)
+        self.action_toggle_3d_mocap.setChecked(True)
                 
-                # Force select 'Select All Raw Mocap Joints' as default mode after loading
-                self.radio_show_all_raw_mocap.setChecked(True)
-                self.on_raw_mocap_display_mode_changed()
-                self.update_selected_joints_count_label() # Call here after load
-            except Exception as e:
-                QMessageBox.critical(self, "Error", f"Failed to load Raw Mocap data: {str(e)}")
+        # Force select 'Select All Raw Mocap Joints' as default mode after loading
+        self.radio_show_all_raw_mocap.setChecked(True)
+        self.on_raw_mocap_display_mode_changed()
+        self.update_selected_joints_count_label() # Call here after load
 
     def on_raw_mocap_points_checkbox_changed(self, state):
         """當原始 Mocap 點顯示勾選框狀態改變時"""
         self.show_raw_mocap_points = state == Qt.Checked
         self._update_raw_mocap_display_state() # 呼叫輔助函數來更新UI和畫面
-        self.update_3d_visualization_panel(self.player.current_frame) # Update the 3D visualization panel
+
+    def on_raw_mocap_lod_checkbox_changed(self, state):
+        self.raw_mocap_lod_enabled = state == Qt.Checked
+        self.update_frame()
 
     def on_raw_mocap_display_mode_changed(self):
         # 根據選中的 Radio Button 設定模式，並更新關節點列表的勾選狀態和啟用狀態
@@ -1315,6 +1999,7 @@ class ProjectionWindow3(QMainWindow):
 
     def _update_raw_mocap_display_state(self):
         """更新原始 Mocap 點的顯示狀態，並觸發畫面重繪。"""
+        self._raw_mocap_selection = None  # 模式或勾選可能已改變
         enable_modes = self.show_raw_mocap_points and (self.raw_mocap_data is not None)
         self.radio_show_all_raw_mocap.setEnabled(enable_modes)
         self.radio_show_skeleton001_raw_mocap.setEnabled(enable_modes)
@@ -1344,33 +2029,269 @@ class ProjectionWindow3(QMainWindow):
             return names
         return [] # Default empty list if no mode is selected
 
-    def update_3d_visualization_panel(self, frame_idx):
-        """Update the 3D visualization panel with current raw mocap data."""
-        self.ax_3d.cla() # Clear current axes
+    def get_current_raw_mocap_joint_indices(self):
+        """
+        回傳目前模式下的 (joint 名稱 list, data_array 中的 index array)。
+        結果會快取到模式、勾選或原始 Mocap 資料改變為止，每幀只需一次 NumPy gather。
+        """
+        cached = self._raw_mocap_selection
+        if cached is not None and cached[0] is self.raw_mocap_data:
+            return cached[1], cached[2]
+        names, indices = [], []
+        if self.raw_mocap_data is not None:
+            for name in self.get_current_raw_mocap_joint_names():
+                index = self.raw_mocap_data.get_joint_indices(name)
+                if index is not None:
+                    names.append(name)
+                    indices.append(index)
+        indices = np.array(indices, dtype=np.intp)
+        indices.setflags(write=False)  # 快取共用，避免被呼叫端修改
+        self._raw_mocap_selection = (self.raw_mocap_data, names, indices)
+        return names, indices
+
+    ########## Joint Picking ##########
+    def _build_pick_index(self):
+        """建立目前幀所有可見資料集投影點的空間索引"""
+        frame_idx = self.player.current_frame
+        current_idx = frame_idx + self.frame_offset
+        points, blocks = [], []  # blocks: (dataset key, dataset name, joint names or None, 3D points or None)
+
+        if self.camera is not None:
+            for file_index in sorted(self.visible_points_files):
+                if 0 <= file_index < len(self.loaded_points_files):
+                    file_info = self.loaded_points_files[file_index]
+                    points_data = file_info['data']
+                    if 0 <= current_idx < points_data.shape[0]:
+                        projected_seq = self.projection_cache.get(('points', file_index), points_data, self.camera)
+                        points.append(projected_seq[current_idx])
+                        blocks.append((('points', file_index), file_info['filename'], None, points_data[current_idx]))
+
+            if self.raw_mocap_data is not None and self.show_raw_mocap_points and 0 <= current_idx < self.raw_mocap_frame_count:
+                names, joint_indices = self.get_current_raw_mocap_joint_indices()
+                points.append(self._raw_mocap_projection(current_idx, current_idx + 1)[0, joint_indices])
+                blocks.append((('raw_mocap', joint_indices), os.path.basename(self.raw_mocap_filename), names,
+                               self.raw_mocap_data.get_joints_by_indices(current_idx, joint_indices)))
+
+        for i in sorted(self.visible_pixel2d_files):
+            data = self.loaded_pixel2d_files[i]
+            arr = data.get(self.active_pixel2d_view)
+            if arr is not None and 0 <= frame_idx < arr.shape[0]:
+                points.append(arr[frame_idx, :, :2])
+                blocks.append((('pixel2d', i), data.name, None, None))
+
+        cell_size = PICK_RADIUS_SCREEN_PX / max(self._display_scale, 1e-6)
+        all_points = np.concatenate(points) if points else np.zeros((0, 2))
+        self._pick_index = GridIndex(all_points, cell_size)
+        self._pick_block_starts = np.cumsum([0] + [len(p) for p in points])
+        self._pick_blocks = blocks
+
+    def pick_joint_at(self, label_x, label_y):
+        """
+        找出影片標籤座標 (label_x, label_y) 附近最近的關節。
+        :return: dict (dataset, joint, name, xyz, pixel) 或 None
+        """
+        if self.player is None:
+            return None
+        if self._pick_index is None:
+            self._build_pick_index()
+        # 扣除 letterbox 偏移並換算回原始幀像素座標
+        x = (label_x - self._video_offset_x) / self._display_scale
+        y = (label_y - self._video_offset_y) / self._display_scale
+        hit = self._pick_index.nearest(x, y)
+        if hit is None:
+            return None
+        index, _ = hit
+        block = int(np.searchsorted(self._pick_block_starts, index, side='right')) - 1
+        key, dataset_name, joint_names, points3d = self._pick_blocks[block]
+        local = index - self._pick_block_starts[block]
+        joint = local
+        if key[0] == 'raw_mocap':
+            # raw mocap 以 data_array 中的 index 記錄，切換顯示模式後仍可追蹤
+            key, joint = ('raw_mocap',), key[1][local]
+        return {
+            'key': key,
+            'joint': int(joint),
+            'dataset': dataset_name,
+            'name': joint_names[local] if joint_names else f"Joint {joint}",
+            'xyz': None if points3d is None else points3d[local],
+            'pixel': self._pick_index.points[index],
+        }
+
+    def format_picked_joint(self, pick):
+        text = f"{pick['name']} ({pick['dataset']})  pixel=({pick['pixel'][0]:.1f}, {pick['pixel'][1]:.1f})"
+        if pick['xyz'] is not None:
+            x, y, z = pick['xyz']
+            text += f"  xyz=({x:.4f}, {y:.4f}, {z:.4f})"
+        return text
+
+    def eventFilter(self, obj, event):
+        if obj is self.video_label and self.player is not None:
+            if event.type() == QEvent.MouseMove:
+                pick = self.pick_joint_at(event.pos().x(), event.pos().y())
+                if pick is not None:
+                    self.statusBar().showMessage(self.format_picked_joint(pick))
+                else:
+                    self.statusBar().clearMessage()
+            elif event.type() == QEvent.MouseButtonPress and event.button() == Qt.LeftButton:
+                pick = self.pick_joint_at(event.pos().x(), event.pos().y())
+                if pick is not None:
+                    self.picked_joint = (pick['key'], pick['joint'])
+                    self.picked_joint_label.setText(f"Selected: {self.format_picked_joint(pick)}")
+                    self.picked_joint_label.show()
+                    print(f"Picked joint: {self.format_picked_joint(pick)}")
+                else:
+                    self.picked_joint = None
+                    self.picked_joint_label.hide()
+                self.update_frame()
+        return super().eventFilter(obj, event)
+
+    def draw_picked_joint(self, frame_bgr, frame_idx):
+        """在目前選取的關節位置畫出標記圈，隨播放持續追蹤"""
+        if self.picked_joint is None or self.camera is None:
+            return frame_bgr
+        key, joint = self.picked_joint
+        current_idx = frame_idx + self.frame_offset
+        pt = None
+        if key[0] == 'points' and key[1] < len(self.loaded_points_files):
+            points_data = self.loaded_points_files[key[1]]['data']
+            if points_data is not None and 0 <= current_idx < points_data.shape[0]:
+                pt = self.projection_cache.get(key, points_data, self.camera)[current_idx, joint]
+        elif key[0] == 'raw_mocap' and self.raw_mocap_data is not None:
+            if 0 <= current_idx < self.raw_mocap_frame_count:
+                pt = self._raw_mocap_projection(current_idx, current_idx + 1)[0, joint]
+        elif key[0] == 'pixel2d' and key[1] < len(self.loaded_pixel2d_files):
+            arr = self.loaded_pixel2d_files[key[1]].get(self.active_pixel2d_view)
+            if arr is not None and 0 <= frame_idx < arr.shape[0]:
+                pt = arr[frame_idx, joint, :2]
+        if pt is not None and np.isfinite(pt).all():
+            cv2.circle(frame_bgr, (int(pt[0]), int(pt[1])), 10, (0, 255, 255), 2)
+        return frame_bgr
+
+    def _init_3d_visualization_panel(self):
+        """建立 3D 面板的固定元素與持續使用的 artists (之後每幀只更新資料)"""
         self.ax_3d.set_xlabel('X')
         self.ax_3d.set_ylabel('Y')
         self.ax_3d.set_zlabel('Z')
-        self.ax_3d.set_title(f"Raw Mocap 3D - Frame {frame_idx}")
 
         # Set fixed axis limits similar to visualization.py
         self.ax_3d.set_xlim([-1, 1])
         self.ax_3d.set_ylim([0, 1.8])
         self.ax_3d.set_zlim([0, 1])
 
+        # animated=True: 這些 artists 不畫進背景，只在 blit 時更新
+        self._scatter_3d = self.ax_3d.scatter([], [], [], color='blue', s=10, animated=True)
+        self._title_3d = self.ax_3d.set_title("Raw Mocap 3D", animated=True)
+        self._3d_background = None
+
+    def _on_3d_canvas_draw(self, event):
+        """完整重繪後快取背景，並把動態 artists 畫回去"""
+        self._3d_background = self.canvas_3d.copy_from_bbox(self.figure_3d.bbox)
+        self._draw_3d_animated_artists()
+
+    def _draw_3d_animated_artists(self):
+        # 單獨繪製 3D scatter 前需先依目前視角做投影
+        try:
+            self._scatter_3d.do_3d_projection()
+        except TypeError:
+            self._scatter_3d.do_3d_projection(self.canvas_3d.get_renderer())  # matplotlib < 3.5
+        self.ax_3d.draw_artist(self._scatter_3d)
+        self.figure_3d.draw_artist(self._title_3d)
+
+    def request_3d_visualization_update(self, frame_idx):
+        """
+        要求更新 3D 面板。面板隱藏時略過；暫停時立即更新；
+        播放時把請求合併到 timer，最多以 panel_3d_max_fps 的頻率更新。
+        """
+        if not self.three_d_visualization_container_widget.isVisible():
+            self._3d_panel_timer.stop()
+            self._3d_panel_pending_frame = None
+            return
+        self._3d_panel_pending_frame = frame_idx
+        if not self.is_playing or self.panel_3d_max_fps <= 0:
+            self._3d_panel_timer.stop()
+            self._flush_3d_visualization_update()
+            return
+        if not self._3d_panel_timer.isActive():
+            elapsed = time.perf_counter() - self._3d_panel_last_update
+            delay_ms = max(0, int((1.0 / self.panel_3d_max_fps - elapsed) * 1000))
+            self._3d_panel_timer.start(delay_ms)
+
+    def _flush_3d_visualization_update(self):
+        if self._3d_panel_pending_frame is None:
+            return
+        frame_idx = self._3d_panel_pending_frame
+        self._3d_panel_pending_frame = None
+        self._3d_panel_last_update = time.perf_counter()
+        self.update_3d_visualization_panel(frame_idx)
+
+    def set_3d_panel_max_fps(self):
+        """設定播放時 3D 面板的最高更新頻率 (0 = 每幀更新)"""
+        value, ok = QInputDialog.getInt(
+            self, "3D Panel Update Rate", "Max updates per second during playback (0 = every frame):",
+            value=self.panel_3d_max_fps, min=0, max=120
+        )
+        if ok:
+            self.panel_3d_max_fps = value
+
+    def set_software_3d_view(self, enabled):
+        """切換 3D 面板使用軟體渲染檢視或 matplotlib"""
+        self.use_software_3d_view = enabled
+        self.canvas_3d.setVisible(not enabled)
+        self.skeleton_view_3d.setVisible(enabled)
+        if self.player is not None:
+            self.request_3d_visualization_update(self.player.current_frame)
+
+    def build_3d_scene(self, frame_idx):
+        """收集目前幀所有可見的3D資料集，格式同 software_renderer.render_scene"""
+        current_idx = frame_idx + self.frame_offset
+        datasets = []
+        for file_index in sorted(self.visible_points_files):
+            if 0 <= file_index < len(self.loaded_points_files):
+                file_info = self.loaded_points_files[file_index]
+                points_data = file_info['data']
+                if 0 <= current_idx < points_data.shape[0]:
+                    pts3d = points_data[current_idx]
+                    datasets.append({
+                        'points': pts3d,
+                        'color': file_info['color'],
+                        'joint_pairs': JOINT_PAIRS_MAP.get(pts3d.shape[0]) if self.show_skeleton else None,
+                    })
+        if self.raw_mocap_data is not None and self.show_raw_mocap_points:
+            if 0 <= current_idx < self.raw_mocap_frame_count:
+                _, joint_indices = self.get_current_raw_mocap_joint_indices()
+                _, valid_pts3d = self.raw_mocap_data.get_valid_joints(current_idx, joint_indices)
+                datasets.append({
+                    'points': valid_pts3d,
+                    'color': (255, 255, 255),
+                })
+        return datasets
+
+    def update_3d_visualization_panel(self, frame_idx):
+        """Update the 3D visualization panel with current raw mocap data."""
+        if self.use_software_3d_view:
+            self.skeleton_view_3d.set_scene(self.build_3d_scene(frame_idx), title=f"3D - Frame {frame_idx}")
+            return
+
+        self._title_3d.set_text(f"Raw Mocap 3D - Frame {frame_idx}")
+
+        valid_pts3d = np.zeros((0, 3))
         if self.raw_mocap_data is not None and self.show_raw_mocap_points:
             current_idx = frame_idx + self.frame_offset
             if 0 <= current_idx < self.raw_mocap_frame_count:
-                joint_names = self.get_current_raw_mocap_joint_names()
-                pts3d_raw_mocap = self.raw_mocap_data.get_joints_by_names(current_idx, joint_names)
-                
-                # Filter out NaN points for plotting
-                valid_pts_mask = ~np.isnan(pts3d_raw_mocap).any(axis=1)
-                valid_pts3d = pts3d_raw_mocap[valid_pts_mask]
+                # 只取有效的關節 (以 RawMocapData 的有效遮罩過濾，不必逐幀掃描 NaN)
+                _, joint_indices = self.get_current_raw_mocap_joint_indices()
+                _, valid_pts3d = self.raw_mocap_data.get_valid_joints(current_idx, joint_indices)
 
-                if valid_pts3d.shape[0] > 0:
-                    self.ax_3d.scatter(valid_pts3d[:, 0], valid_pts3d[:, 1], valid_pts3d[:, 2], color='blue', s=10)
+        self._scatter_3d._offsets3d = (valid_pts3d[:, 0], valid_pts3d[:, 1], valid_pts3d[:, 2])
 
-        self.canvas_3d.draw()
+        if self._3d_background is None:
+            # 尚未完整繪製過 (例如面板剛顯示)，排程一次完整重繪
+            self.canvas_3d.draw_idle()
+            return
+        # Blitting: 還原背景，只重畫點與標題
+        self.canvas_3d.restore_region(self._3d_background)
+        self._draw_3d_animated_artists()
+        self.canvas_3d.blit(self.figure_3d.bbox)
 
     def on_scroll(self, event):
         # This method is called when the scroll wheel is used
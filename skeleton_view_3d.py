@@ -0,0 +1,80 @@
+import cv2
+from PyQt5.QtWidgets import QWidget, QSizePolicy
+from PyQt5.QtGui import QImage, QPainter
+from PyQt5.QtCore import Qt
+from software_renderer import OrbitCamera, render_scene
+
+# 與 ProjectionWindow3.on_scroll 相同的縮放係數
+ZOOM_FACTOR = 0.9
+# 每拖曳一個像素旋轉的角度
+ORBIT_DEGREES_PER_PIXEL = 0.4
+
+
+class SkeletonView3D(QWidget):
+    def __init__(self, parent=None):
+        """
+        Software-rendered 3D view of all visible datasets.
+        Left-drag orbits the camera, the mouse wheel zooms.
+        """
+        super().__init__(parent)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.setMinimumSize(200, 200)
+        self.camera = OrbitCamera()
+        self.title = ""
+        self._datasets = []
+        self._image = None
+        self._last_mouse_pos = None
+
+    def set_scene(self, datasets, title=""):
+        """
+        Replace the rendered datasets and redraw.
+        :param datasets: Same format as software_renderer.render_scene.
+        """
+        self._datasets = datasets
+        self.title = title
+        self._render_scene()
+
+    def _render_scene(self):
+        """Render the datasets into the cached image (not QWidget.render, which still grabs the widget)."""
+        w, h = self.width(), self.height()
+        if w <= 0 or h <= 0:
+            return
+        image = render_scene(self._datasets, self.camera, w, h)
+        if self.title:
+            cv2.putText(image, self.title, (10, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        self._image = QImage(rgb.data, w, h, 3 * w, QImage.Format_RGB888).copy()
+        self.update()
+
+    def paintEvent(self, event):
+        if self._image is None:
+            return
+        painter = QPainter(self)
+        painter.drawImage(0, 0, self._image)
+        painter.end()
+
+    def resizeEvent(self, event):
+        self._render_scene()
+        super().resizeEvent(event)
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self._last_mouse_pos = event.pos()
+
+    def mouseMoveEvent(self, event):
+        if self._last_mouse_pos is not None and event.buttons() & Qt.LeftButton:
+            delta = event.pos() - self._last_mouse_pos
+            self._last_mouse_pos = event.pos()
+            self.camera.orbit(-delta.x() * ORBIT_DEGREES_PER_PIXEL, delta.y() * ORBIT_DEGREES_PER_PIXEL)
+            self._render_scene()
+
+    def mouseReleaseEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self._last_mouse_pos = None
+
+    def wheelEvent(self, event):
+        if event.angleDelta().y() > 0:
+            self.camera.zoom(ZOOM_FACTOR)
+        elif event.angleDelta().y() < 0:
+            self.camera.zoom(1 / ZOOM_FACTOR)
+        self._render_scene()
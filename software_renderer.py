@@ -0,0 +1,118 @@
+import cv2
+import numpy as np
+from overlay_drawing import stamp_points, MAX_PIXEL_COORD
+
+# 背景與地面網格顏色 (BGR)
+BACKGROUND_COLOR = (40, 40, 40)
+GRID_COLOR = (90, 90, 90)
+NEAR_PLANE = 0.05
+
+
+class OrbitCamera:
+    def __init__(self, target=(0.0, 0.9, 0.5), azimuth=-60.0, elevation=20.0, distance=4.0, fov=45.0):
+        """
+        Orbit camera looking at `target` in a Y-up world (the Motive convention).
+
+        :param target: World point the camera orbits around.
+        :param azimuth: Horizontal angle in degrees.
+        :param elevation: Vertical angle in degrees, clamped to (-89, 89).
+        :param distance: Distance from the target.
+        :param fov: Vertical field of view in degrees.
+        """
+        self.target = np.asarray(target, dtype=np.float64)
+        self.azimuth = azimuth
+        self.elevation = elevation
+        self.distance = distance
+        self.fov = fov
+
+    def orbit(self, d_azimuth, d_elevation):
+        self.azimuth = (self.azimuth + d_azimuth) % 360.0
+        self.elevation = float(np.clip(self.elevation + d_elevation, -89.0, 89.0))
+
+    def zoom(self, scale_factor):
+        """scale_factor < 1 zooms in, > 1 zooms out (same convention as on_scroll)."""
+        self.distance = float(np.clip(self.distance * scale_factor, 0.1, 100.0))
+
+    def view_matrix(self):
+        """World-to-camera rotation R and translation t (OpenCV axes: x right, y down, z forward)."""
+        az, el = np.radians(self.azimuth), np.radians(self.elevation)
+        offset = np.array([np.cos(el) * np.sin(az), np.sin(el), np.cos(el) * np.cos(az)])
+        eye = self.target + self.distance * offset
+        forward = self.target - eye
+        forward /= np.linalg.norm(forward)
+        right = np.cross(forward, (0.0, 1.0, 0.0))
+        right /= np.linalg.norm(right)
+        down = np.cross(forward, right)
+        R = np.stack([right, down, forward])
+        return R, -R @ eye
+
+    def project(self, points3d, width, height):
+        """
+        Project points [..., 3] to pixel coordinates [..., 2] for an image of the given size.
+        Points behind the near plane become NaN.
+        """
+        R, t = self.view_matrix()
+        cam = np.asarray(points3d, dtype=np.float64) @ R.T + t
+        focal = 0.5 * height / np.tan(np.radians(self.fov) / 2)
+        z = np.where(cam[..., 2] > NEAR_PLANE, cam[..., 2], np.nan)
+        out = np.empty(cam.shape[:-1] + (2,), dtype=np.float64)
+        out[..., 0] = focal * cam[..., 0] / z + width / 2
+        out[..., 1] = focal * cam[..., 1] / z + height / 2
+        return out
+
+
+def _floor_grid_segments(size=4.0, step=0.5):
+    """Line segments [M, 2, 3] of a floor grid on the y = 0 plane."""
+    ticks = np.arange(-size, size + 1e-9, step)
+    segments = []
+    for v in ticks:
+        segments.append([(v, 0.0, -size), (v, 0.0, size)])
+        segments.append([(-size, 0.0, v), (size, 0.0, v)])
+    return np.array(segments, dtype=np.float64)
+
+
+_FLOOR_GRID = _floor_grid_segments()
+
+
+def _draw_segments(image, segments2d, color, thickness):
+    """Draw [M, 2, 2] pixel segments with one cv2.polylines call, skipping invalid ones."""
+    valid = np.isfinite(segments2d).all(axis=(1, 2))
+    if not valid.any():
+        return
+    segments = np.clip(segments2d[valid], -MAX_PIXEL_COORD, MAX_PIXEL_COORD)
+    cv2.polylines(image, list(np.ascontiguousarray(segments, dtype=np.int32)), False, color, thickness)
+
+
+def render_scene(datasets, camera, width, height, show_floor=True, point_radius=3):
+    """
+    Render 3D datasets to a BGR image with NumPy/OpenCV only (no GPU, no Qt).
+
+    :param datasets: Iterable of dicts with keys
+                     'points' ([N, 3] array, NaN for missing joints),
+                     'color' (BGR tuple) and optional 'joint_pairs' (list of (i, j)).
+    :param camera: OrbitCamera.
+    :param width: Image width in pixels.
+    :param height: Image height in pixels.
+    :param show_floor: Draw a grid on the y = 0 plane.
+    :param point_radius: Joint dot radius in pixels.
+    :return: uint8 image [height, width, 3].
+    """
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[:] = BACKGROUND_COLOR
+
+    if show_floor:
+        _draw_segments(image, camera.project(_FLOOR_GRID, width, height), GRID_COLOR, 1)
+
+    for dataset in datasets:
+        pts3d = np.asarray(dataset['points'], dtype=np.float64)
+        if pts3d.size == 0:
+            continue
+        pts2d = camera.project(pts3d, width, height)
+        joint_pairs = dataset.get('joint_pairs')
+        if joint_pairs:
+            pairs = np.asarray(joint_pairs, dtype=int)
+            pairs = pairs[(pairs < len(pts2d)).all(axis=1)]
+            line_color = tuple(int(c * 0.7) for c in dataset['color'])  # Darker shade for lines
+            _draw_segments(image, pts2d[pairs], line_color, 2)
+        stamp_points(image, pts2d, dataset['color'], radius=point_radius)
+    return image
@@ -0,0 +1,60 @@
+import numpy as np
+
+# 網格座標的偏移與跨度，用來把 (cx, cy) 合成單一整數 key
+_CELL_OFFSET = 1 << 20
+_CELL_SPAN = 1 << 21
+
+
+def _cell_keys(cx, cy):
+    cx = np.clip(cx, -_CELL_OFFSET, _CELL_OFFSET - 1) + _CELL_OFFSET
+    cy = np.clip(cy, -_CELL_OFFSET, _CELL_OFFSET - 1) + _CELL_OFFSET
+    return cy * _CELL_SPAN + cx
+
+
+class GridIndex:
+    def __init__(self, points2d, cell_size):
+        """
+        Uniform grid over 2D points for nearest-point lookups.
+        Points are bucketed by cell and stored sorted by cell key, so a query only looks at
+        the 3x3 cells around the cursor with a few binary searches.
+
+        :param points2d: Array [N, 2] of pixel coordinates; NaN rows are ignored.
+        :param cell_size: Cell edge length in pixels; also the default search radius.
+        """
+        self.points = np.asarray(points2d, dtype=np.float64).reshape(-1, 2)
+        self.cell_size = float(max(cell_size, 1e-6))
+        valid = np.flatnonzero(np.isfinite(self.points).all(axis=1))
+        cells = np.floor(self.points[valid] / self.cell_size).astype(np.int64)
+        keys = _cell_keys(cells[:, 0], cells[:, 1])
+        order = np.argsort(keys, kind='stable')
+        self._sorted_keys = keys[order]
+        self._sorted_indices = valid[order]
+
+    def __len__(self):
+        return len(self._sorted_indices)
+
+    def nearest(self, x, y, max_distance=None):
+        """
+        Return (index, distance) of the point nearest to (x, y), or None if no point lies
+        within max_distance (defaults to cell_size, the largest radius the 3x3 search covers).
+        """
+        if max_distance is None or max_distance > self.cell_size:
+            max_distance = self.cell_size
+        if len(self._sorted_keys) == 0:
+            return None
+        cx = int(np.floor(x / self.cell_size))
+        cy = int(np.floor(y / self.cell_size))
+        neighbour_x, neighbour_y = np.meshgrid(np.arange(cx - 1, cx + 2), np.arange(cy - 1, cy + 2))
+        keys = _cell_keys(neighbour_x.ravel(), neighbour_y.ravel())
+        lo = np.searchsorted(self._sorted_keys, keys, side='left')
+        hi = np.searchsorted(self._sorted_keys, keys, side='right')
+        candidates = [self._sorted_indices[a:b] for a, b in zip(lo, hi) if b > a]
+        if not candidates:
+            return None
+        candidates = np.concatenate(candidates)
+        diff = self.points[candidates] - (x, y)
+        dist = np.hypot(diff[:, 0], diff[:, 1])
+        best = int(np.argmin(dist))
+        if dist[best] > max_distance:
+            return None
+        return int(candidates[best]), float(dist[best])
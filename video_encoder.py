@@ -0,0 +1,131 @@
+import shutil
+import subprocess
+import cv2
+import numpy as np
+
+# 預設編碼設定：H.264、CRF 23 (視覺上接近無損，檔案遠小於 mp4v)
+DEFAULT_CODEC = 'libx264'
+DEFAULT_PRESET = 'veryfast'
+DEFAULT_CRF = 23
+DEFAULT_THREADS = 0  # 0 = 由 ffmpeg 自動決定
+# 找不到 ffmpeg 時改用 cv2.VideoWriter 的 fourcc
+FALLBACK_FOURCC = 'mp4v'
+CODEC_CHOICES = ['libx264', 'libx265', 'mpeg4']
+PRESET_CHOICES = ['ultrafast', 'superfast', 'veryfast', 'faster', 'fast', 'medium', 'slow', 'slower', 'veryslow']
+
+
+def encoder_options(codec=DEFAULT_CODEC, preset=DEFAULT_PRESET, crf=DEFAULT_CRF, threads=DEFAULT_THREADS):
+    """Encoder settings as a plain (picklable) dict, passed through to VideoEncoder."""
+    return {'codec': codec, 'preset': preset, 'crf': crf, 'threads': threads}
+
+
+def add_encoder_arguments(parser):
+    """Add --codec/--preset/--crf/--threads to an argparse parser."""
+    parser.add_argument('--codec', type=str, default=DEFAULT_CODEC,
+                        help=f'ffmpeg video codec (default {DEFAULT_CODEC}; falls back to OpenCV {FALLBACK_FOURCC} without ffmpeg)')
+    parser.add_argument('--preset', type=str, default=DEFAULT_PRESET,
+                        help=f'Encoder speed preset (default {DEFAULT_PRESET})')
+    parser.add_argument('--crf', type=int, default=DEFAULT_CRF,
+                        help=f'Constant rate factor, lower = better quality and larger files (default {DEFAULT_CRF})')
+    parser.add_argument('--threads', type=int, default=DEFAULT_THREADS,
+                        help='Encoder threads (0 = auto)')
+    return parser
+
+
+def encoder_options_from_args(args):
+    return encoder_options(args.codec, args.preset, args.crf, args.threads)
+
+
+def ffmpeg_available():
+    return shutil.which('ffmpeg') is not None
+
+
+class VideoEncoder:
+    def __init__(self, output_path, fps, size, codec=DEFAULT_CODEC, preset=DEFAULT_PRESET, crf=DEFAULT_CRF,
+                 threads=DEFAULT_THREADS, use_ffmpeg=None):
+        """
+        Drop-in replacement for cv2.VideoWriter that pipes raw BGR frames into a local ffmpeg process.
+        Falls back to cv2.VideoWriter (mp4v) when ffmpeg is not installed.
+
+        :param output_path: Target video path.
+        :param fps: Frame rate.
+        :param size: (width, height) of the frames passed to write().
+        :param codec: ffmpeg encoder name, e.g. libx264, libx265, h264_nvenc.
+        :param preset: Encoder preset (None to omit).
+        :param crf: Constant rate factor (None to omit).
+        :param threads: Encoder threads, 0 lets ffmpeg decide.
+        :param use_ffmpeg: Force (True) or disable (False) the ffmpeg backend; None = use it when available.
+        """
+        self.output_path = output_path
+        self.size = (int(size[0]), int(size[1]))
+        self._process = None
+        self._writer = None
+        if use_ffmpeg is None:
+            use_ffmpeg = ffmpeg_available()
+
+        if use_ffmpeg:
+            width, height = self.size
+            cmd = [
+                'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
+                '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f'{width}x{height}', '-r', f'{fps}',
+                '-i', '-', '-an', '-c:v', codec,
+            ]
+            if preset:
+                cmd += ['-preset', preset]
+            if crf is not None:
+                cmd += ['-crf', str(crf)]
+            cmd += ['-threads', str(threads)]
+            # yuv420p 需要偶數寬高，奇數時補一列/一行
+            if width % 2 or height % 2:
+                cmd += ['-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2']
+            cmd += ['-pix_fmt', 'yuv420p', output_path]
+            self._process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+            self.backend = 'ffmpeg'
+        else:
+            self._writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*FALLBACK_FOURCC), fps, self.size)
+            self.backend = 'opencv'
+
+    def isOpened(self):
+        if self._process is not None:
+            return self._process.poll() is None
+        return self._writer.isOpened()
+
+    def write(self, frame):
+        if self._writer is not None:
+            self._writer.write(frame)
+            return
+        if frame.shape[1::-1] != self.size:
+            raise ValueError(f"Frame size {frame.shape[1::-1]} does not match encoder size {self.size}")
+        try:
+            self._process.stdin.write(np.ascontiguousarray(frame, dtype=np.uint8).data)
+        except BrokenPipeError:
+            stderr = self._close_process()
+            self._process = None
+            raise IOError(f"ffmpeg stopped while writing {self.output_path}: {stderr}")
+
+    def _close_process(self):
+        """Close stdin, wait for ffmpeg and return its error output."""
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+        stderr = self._process.stderr.read().decode(errors='replace').strip()
+        self._process.wait()
+        return stderr
+
+    def release(self):
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+        elif self._process is not None:
+            process = self._process
+            stderr = self._close_process()
+            self._process = None
+            if process.returncode != 0:
+                raise IOError(f"ffmpeg failed to encode {self.output_path}: {stderr}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
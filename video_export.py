@@ -0,0 +1,193 @@
+import os
+import queue
+import threading
+import cv2
+import numpy as np
+from overlay_drawing import draw_frame_info
+from video_encoder import VideoEncoder
+
+# 每個佇列最多暫存的幀數；讀取、繪製、寫入之間的緩衝上限
+DEFAULT_QUEUE_SIZE = 16
+# 阻塞操作的逾時 (秒)，讓執行緒能定期檢查是否已取消
+_POLL_INTERVAL = 0.1
+_END = object()
+
+
+def iter_video_frames(video_path, start=0, end=None):
+    """
+    Yield (frame_idx, frame_bgr) for frames [start, end) of a video file, reading sequentially.
+    Stops early at the end of the stream.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Cannot open video file: {video_path}")
+    try:
+        if start > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        frame_idx = start
+        while end is None or frame_idx < end:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame_idx, frame
+            frame_idx += 1
+    finally:
+        cap.release()
+
+
+def iter_black_frames(width, height, start, end):
+    """Yield (frame_idx, black frame) for frames [start, end), for exports without a video."""
+    for frame_idx in range(start, end):
+        yield frame_idx, np.zeros((height, width, 3), dtype=np.uint8)
+
+
+def iter_range_frames(video_path, frame_ranges, width=None, height=None):
+    """
+    Yield (frame_idx, frame_bgr) for each (start, end) range in order, seeking straight to
+    each start so frames outside the ranges are never decoded.
+    Without video_path, black frames of width x height are produced instead.
+    """
+    for start, end in frame_ranges:
+        if video_path:
+            yield from iter_video_frames(video_path, start, end)
+        else:
+            yield from iter_black_frames(width, height, start, end)
+
+
+def _put(q, item, stop):
+    """Blocking put that gives up once stop is set. Returns False if it gave up."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=_POLL_INTERVAL)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _get(q, stop):
+    """Blocking get that returns _END once stop is set."""
+    while not stop.is_set():
+        try:
+            return q.get(timeout=_POLL_INTERVAL)
+        except queue.Empty:
+            pass
+    return _END
+
+
+def run_export_pipeline(frames, render_fn, write_fn, num_workers=None, queue_size=DEFAULT_QUEUE_SIZE,
+                        progress_callback=None, is_canceled=None):
+    """
+    Render and write a frame stream with a reader thread, a pool of render threads and an
+    ordered writer (the calling thread), connected by bounded queues.
+    Decoding, drawing and encoding overlap, and OpenCV/NumPy release the GIL for most of
+    the work, so the stages run in parallel.
+
+    :param frames: Iterable of (frame_idx, frame_bgr), consumed by the reader thread.
+    :param render_fn: render_fn(frame_bgr, frame_idx) -> frame to write. Called from several
+                      threads at once, so it must not touch shared mutable state.
+    :param write_fn: write_fn(frame) called in the original frame order.
+    :param num_workers: Number of render threads (defaults to the CPU count).
+    :param queue_size: Capacity of each queue; at most 2 * queue_size + num_workers frames are in flight.
+    :param progress_callback: Called as progress_callback(frames_written) after each write.
+    :param is_canceled: Optional callable; when it returns True the pipeline stops.
+    :return: Number of frames written.
+    """
+    num_workers = max(1, num_workers or os.cpu_count() or 1)
+    read_queue = queue.Queue(queue_size)
+    done_queue = queue.Queue(queue_size)
+    # 限制尚未寫出的幀數，避免某一幀特別慢時重排緩衝無限增長
+    in_flight = threading.Semaphore(2 * queue_size + num_workers)
+    stop = threading.Event()
+    errors = []
+
+    def reader():
+        try:
+            for seq, (frame_idx, frame) in enumerate(frames):
+                while not in_flight.acquire(timeout=_POLL_INTERVAL):
+                    if stop.is_set():
+                        return
+                if not _put(read_queue, (seq, frame_idx, frame), stop):
+                    return
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            for _ in range(num_workers):
+                _put(read_queue, _END, stop)
+
+    def renderer():
+        try:
+            while True:
+                item = _get(read_queue, stop)
+                if item is _END:
+                    break
+                seq, frame_idx, frame = item
+                if not _put(done_queue, (seq, render_fn(frame, frame_idx)), stop):
+                    return
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            _put(done_queue, _END, stop)
+
+    threads = [threading.Thread(target=reader, name="export-reader", daemon=True)]
+    threads += [threading.Thread(target=renderer, name=f"export-render-{i}", daemon=True) for i in range(num_workers)]
+    for thread in threads:
+        thread.start()
+
+    pending = {}
+    next_seq = 0
+    finished_workers = 0
+    try:
+        while finished_workers < num_workers:
+            if is_canceled is not None and is_canceled():
+                break
+            item = _get(done_queue, stop)
+            if item is _END:
+                if stop.is_set():
+                    break
+                finished_workers += 1
+                continue
+            seq, frame = item
+            pending[seq] = frame
+            # 依原始順序寫出
+            while next_seq in pending:
+                write_fn(pending.pop(next_seq))
+                next_seq += 1
+                in_flight.release()
+                if progress_callback is not None:
+                    progress_callback(next_seq)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+    return next_seq
+
+
+def export_overlay_video(frames, renderer, output_path, fps, size, total_frames, num_workers=None,
+                         progress_callback=None, is_canceled=None, encoder=None):
+    """
+    Write frames with the overlay, timer and frame number drawn on them to an mp4.
+
+    :param frames: Iterable of (frame_idx, frame_bgr), see iter_video_frames / iter_black_frames.
+    :param renderer: overlay_drawing.OverlayRenderer snapshot.
+    :param output_path: Target .mp4 path.
+    :param fps: Output frame rate (also used for the timer text).
+    :param size: (width, height) of the frames.
+    :param total_frames: Frame count shown in the timer text.
+    :param encoder: Optional video_encoder.encoder_options dict (defaults to libx264 via ffmpeg).
+    :return: Number of frames written.
+    """
+    def render(frame, frame_idx):
+        renderer.render(frame, frame_idx)
+        return draw_frame_info(frame, frame_idx, total_frames, fps)
+
+    out = VideoEncoder(output_path, fps, size, **(encoder or {}))
+    try:
+        return run_export_pipeline(frames, render, out.write, num_workers,
+                                   progress_callback=progress_callback, is_canceled=is_canceled)
+    finally:
+        out.release()